@@ -1,4 +1,65 @@
-from .sermon_core import *
-from .sermon_create import *
-from .sermon_extract import *
-from .sermon_utils import *
+# __init__.py
+# The names of the package are imported when they are first used, so "import Sermon" (and the command line
+# for --help or the tools that do not make a presentation) does not load python-docx, python-pptx, lxml and PIL.
+import importlib
+
+# The public names, by the module that defines them
+_EXPORTS = {
+    "sermon_bible": ["BOOKS", "BOOK_NAMES", "BOOK_NUMBERS", "BibleIndex", "INDEX_HEADER", "INDEX_MAGIC",
+                     "INDEX_RECORD", "SKIPPED_OSIS_ELEMENTS", "VERSE_RANGE_REGEX"],
+    "sermon_booklet": ["BookletRenderer"],
+    "sermon_core": ["Sermon"],
+    "sermon_create": ["SermonCreate"],
+    "sermon_document": ["DocumentView", "IMAGE_EMBED_XPATH", "ParagraphView", "SectionResult"],
+    "sermon_extract": ["EXTRACTION_SETTINGS", "READING_SETTINGS", "SermonExtract"],
+    "sermon_fields": ["BANK_ACCOUNT_REGEX", "FieldMatches", "FieldScanner", "MONTH_NUMBERS"],
+    "sermon_fragment_cache": ["CACHE_VERSION", "ENTRY_FILENAME", "FragmentCache"],
+    "sermon_hymn_library": ["HYMN_TITLE_REGEX", "HymnLibrary", "SCHEMA", "VERSE_REGEX"],
+    "sermon_images": ["ImageOptimiser"],
+    "sermon_lint": ["DocumentLinter", "ERROR", "LintProblem", "WARNING"],
+    "sermon_manifest": ["SlideManifest"],
+    "sermon_media_store": ["MEDIA_PREFIX", "MediaStore"],
+    "sermon_merge": ["BACK_RELATIONSHIP_TYPES", "DeckMerger", "FIRST_MASTER_ID", "MEDIA_FOLDER",
+                     "NUMBERED_PARTNAME_REGEX"],
+    "sermon_parallel": ["ParallelRenderer"],
+    "sermon_pipeline": ["END_OF_SECTIONS", "SermonPipeline"],
+    "sermon_plan": ["SlidePlanner"],
+    "sermon_provenance": ["PAGINATED_SECTION_TAGS", "SlideProvenance", "SlideSource", "WHITESPACE_REGEX"],
+    "sermon_slide_snapshot": ["SlideSnapshot"],
+    "sermon_slimming": ["TemplateSlimmer"],
+    "sermon_spool": ["CLAIMED", "DONE", "FAILED", "PENDING", "RECORDS", "WORK", "WorkQueue"],
+    "sermon_styles": ["BULLET_SUCCESSORS", "BULLET_TAGS", "CONTENT_PLACEHOLDER_TYPES", "LIST_STYLE_SUCCESSORS",
+                      "TITLE_PLACEHOLDER_TYPES", "TemplateStyles"],
+    "sermon_template": ["TemplateSnapshot"],
+    "sermon_utils": ["SermonUtils"],
+    "sermon_variants": ["VariantRenderer"],
+    "sermon_writer": ["DEFAULT_STORED_CONTENT_TYPES", "DETERMINISTIC_DATE_TIME", "PackageWriter",
+                      "StreamingPackageWriter", "ZIP_DEFLATED", "ZIP_STORED", "ZipStream"],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    """
+    Imports the module of a public name when the name is first used.
+
+    Args:
+        name (str): The name.
+
+    Returns:
+        object: The value of the name.
+    """
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_MODULES[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """
+    Returns the names of the package, including the ones that are not imported yet.
+    """
+    return sorted(set(globals()) | set(_MODULES))
@@ -1,7 +1,221 @@
 # main.py
-from .sermon_core import Sermon
+import argparse
+import os
+import sys
+from .settings import Settings
+
+
+def parse_arguments():
+    """
+    Parses the command line arguments.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+    parser = argparse.ArgumentParser(description="Creates PowerPoint presentations from Word documents with an order of service.")
+    parser.add_argument("word_files", nargs="*",
+                        help="The Word documents to process (default: the default_word_filename setting).")
+    parser.add_argument("--output-dir", help="The directory for the presentations, created if needed (default: next to the Word documents).")
+    parser.add_argument("--pipelined", action="store_true", default=None,
+                        help="Extract the sections while the slides are created.")
+    parser.add_argument("--workers", type=int, help="The number of processes that render the slides.")
+    parser.add_argument("--streaming", action="store_true", default=None,
+                        help="Write the slides to the presentation file while they are created.")
+    parser.add_argument("--deterministic", action="store_true", default=None,
+                        help="Write the same presentation file for the same input, with a manifest of its slides.")
+    parser.add_argument("--sources", action="store_true",
+                        help="Write the map of the slides to the paragraphs of the Word document next to the "
+                             "presentation (as with the provenance-write setting).")
+    parser.add_argument("--variants", nargs="*", metavar="NAME",
+                        help="Create a presentation for each variant of the variants setting (or only the variants named), "
+                             "from one reading of the Word document.")
+    parser.add_argument("--booklet", action="store_true",
+                        help="The Word document has several services: create a presentation for each service.")
+    parser.add_argument("--booklet-merged", action="store_true", default=None,
+                        help="With --booklet, create one presentation with all services.")
+    parser.add_argument("--plan", action="store_true",
+                        help="Write the plan of the slides (layouts, texts, images) of each Word document as JSON "
+                             "next to its presentation, without making the presentation.")
+    parser.add_argument("--lint", action="store_true",
+                        help="Check the Word documents without making presentations, and report the problems "
+                             "(with --booklet, documents with several services).")
+    parser.add_argument("--merge", metavar="PRESENTATION",
+                        help="Merge the presentations given on the command line (instead of Word documents), in that "
+                             "order, into this presentation, and stop.")
+    parser.add_argument("--spool", metavar="DIRECTORY",
+                        help="A spool directory shared by several machines: the Word documents are added to it as jobs; "
+                             "without Word documents, its jobs are rendered until it is empty.")
+    parser.add_argument("--spool-follow", action="store_true",
+                        help="With --spool, keep waiting for new jobs when the spool directory is empty.")
+    parser.add_argument("--collect-media-garbage", action="store_true",
+                        help="Remove the images that no archived presentation uses from the media store, and stop.")
+    parser.add_argument("--build-bible-index", metavar="OSIS_FILE",
+                        help="Make the Bible index (bible-index_filename) from an OSIS XML file, and stop.")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Processes the Word documents given on the command line, one after the other.
+    """
+    arguments = parse_arguments()
+    if arguments.collect_media_garbage:
+        collect_media_garbage()
+        return
+    if arguments.build_bible_index:
+        build_bible_index(arguments.build_bible_index)
+        return
+    if arguments.lint:
+        if not lint(arguments):
+            sys.exit(1)
+        return
+    if arguments.merge:
+        merge(arguments)
+        return
+    if arguments.spool:
+        spool(arguments)
+        return
+    # python-docx and python-pptx are only loaded when presentations are made
+    from .sermon_core import Sermon
+    if not arguments.word_files:
+        process(Sermon(), arguments)
+        return
+
+    for word_filename in arguments.word_files:
+        sermon = Sermon()
+        sermon.set_word_filename(word_filename, arguments.output_dir)
+        process(sermon, arguments)
+
+
+def process(sermon, arguments):
+    """
+    Creates the presentation of a Word document, its variants (with --variants), or the presentations
+    of its services (with --booklet), or writes the plan of its slides (with --plan).
+
+    Args:
+        sermon (Sermon): The sermon with the Word document.
+        arguments (argparse.Namespace): The arguments.
+    """
+    if arguments.plan:
+        sermon.plan_sermon()
+        return
+    if arguments.sources:
+        sermon.settings.settings["provenance-write"] = True
+    if arguments.booklet:
+        sermon.process_booklet(merged=arguments.booklet_merged, workers=arguments.workers,
+                               streaming=arguments.streaming, deterministic=arguments.deterministic)
+        return
+    if arguments.variants is None:
+        sermon.process_sermon(pipelined=arguments.pipelined, workers=arguments.workers,
+                              streaming=arguments.streaming, deterministic=arguments.deterministic)
+        return
+    variants = sermon.settings.get_setting("variants", {})
+    if arguments.variants:
+        unknown = [name for name in arguments.variants if name not in variants]
+        if unknown:
+            print(f"Error: unknown variants: {', '.join(unknown)}.")
+            return
+        variants = {name: variants[name] for name in arguments.variants}
+    sermon.process_variants(variants, streaming=arguments.streaming, deterministic=arguments.deterministic)
+
+
+def lint(arguments):
+    """
+    Checks the Word documents given on the command line, and prints their problems.
+
+    Args:
+        arguments (argparse.Namespace): The arguments.
+
+    Returns:
+        bool: True if no document has errors.
+    """
+    from .sermon_lint import DocumentLinter, ERROR
+    settings = Settings(os.path.dirname(os.path.abspath(__file__)))
+    linter = DocumentLinter(settings)
+    word_files = arguments.word_files or [settings.get_setting("default_word_filename")]
+    error_count = warning_count = 0
+    for word_filename in word_files:
+        for problem in linter.lint_file(word_filename, arguments.booklet):
+            print(linter.format_problem(word_filename, problem))
+            if problem.level == ERROR:
+                error_count += 1
+            else:
+                warning_count += 1
+    print(f"Checked {len(word_files)} documents: {error_count} errors, {warning_count} warnings.")
+    return error_count == 0
+
+
+def merge(arguments):
+    """
+    Merges the presentations given on the command line into one presentation.
+
+    Args:
+        arguments (argparse.Namespace): The arguments.
+    """
+    from .sermon_merge import DeckMerger
+    if not arguments.word_files:
+        print("Error: no presentations to merge.")
+        return
+    settings = Settings(os.path.dirname(os.path.abspath(__file__)))
+    deterministic = arguments.deterministic
+    if deterministic is None:
+        deterministic = settings.get_setting("writer-deterministic", False)
+    slide_count = DeckMerger(settings).merge(arguments.word_files, arguments.merge, deterministic)
+    print(f"Merged {len(arguments.word_files)} presentations ({slide_count} slides) into '{arguments.merge}'.")
+
+
+def spool(arguments):
+    """
+    Adds the Word documents given on the command line to the spool directory, or, without Word documents,
+    renders the jobs of the spool directory.
+
+    Args:
+        arguments (argparse.Namespace): The arguments.
+    """
+    from .sermon_spool import WorkQueue
+    queue = WorkQueue(Settings(os.path.dirname(os.path.abspath(__file__))), arguments.spool)
+    if arguments.word_files:
+        for word_filename in arguments.word_files:
+            print(f"Added job '{queue.submit(word_filename)}' to '{arguments.spool}'.")
+        return
+    rendered = queue.work(follow=arguments.spool_follow, pipelined=arguments.pipelined, workers=arguments.workers,
+                          streaming=arguments.streaming, deterministic=arguments.deterministic)
+    print(f"Rendered {rendered} jobs from '{arguments.spool}'.")
+
+
+def collect_media_garbage():
+    """
+    Removes the images that no archived presentation and no variant uses from the media store of the settings.
+    """
+    from .sermon_media_store import MediaStore
+    settings = Settings(os.path.dirname(os.path.abspath(__file__)))
+    media_store_directory = settings.get_setting("media_store-directory", "")
+    if not media_store_directory:
+        print("Error: no media store is configured (media_store-directory).")
+        return
+    media_store = MediaStore(media_store_directory)
+    grace_seconds = settings.get_setting("media_store-gc_grace_seconds", 3600)
+    removed_count, removed_bytes = media_store.collect_garbage(grace_seconds)
+    print(f"Removed {removed_count} images ({removed_bytes} bytes) from '{media_store.directory}'.")
+
+
+def build_bible_index(osis_filename):
+    """
+    Makes the Bible index of the settings from an OSIS XML file.
+
+    Args:
+        osis_filename (str): The path of the OSIS file.
+    """
+    from .sermon_bible import BibleIndex
+    settings = Settings(os.path.dirname(os.path.abspath(__file__)))
+    index_filename = settings.get_setting("bible-index_filename", "")
+    if not index_filename:
+        print("Error: no Bible index is configured (bible-index_filename).")
+        return
+    verse_count = BibleIndex.build(osis_filename, index_filename)
+    print(f"Wrote {verse_count} verses to '{index_filename}'.")
+
 
 # Main execution
 if __name__ == "__main__":
-    sermon = Sermon()
-    sermon.process_sermon()
\ No newline at end of file
+    main()
@@ -0,0 +1,286 @@
+# sermon_benchmark.py
+import io
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import timeit
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+from .sermon_fields import FieldScanner, MONTH_NUMBERS
+from .sermon_writer import PackageWriter
+from .settings import Settings
+
+# Sample section texts, in the form produced by the extraction of a real order of service
+SAMPLE_INTRO_TEXT = "\n".join([
+    "Viering 5 januari 2025",
+    "Aanvang 10.00 uur",
+    "Voorganger:",
+    "ds. Elly van Kuijk-Spaans",
+    "Thema: “Zaaien: een gids voor beginners”",
+    "Orgelspel voor de dienst door Martin van der Bent: Prelude in C",
+])
+SAMPLE_OFFERING_TEXT = "\n".join([
+    "1ste (rode zak) Diaconie: Voedselbank Walcheren",
+    "NL12 ABCD 0123 4567 89",
+    "2de (blauwe zak) Vereniging Koorkerk",
+])
+SAMPLE_OUTRO_LINES = [
+    "Zegen",
+    "Orgelspel: Toccata en fuga in d",
+    "Volgende vieringen/activiteiten:",
+    "12-jan\t10.00 uur\tds. Jansen",
+]
+# A line of the output of python -X importtime: self and cumulative time (microseconds) and the module
+IMPORT_TIME_REGEX = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|\s*(.+)$")
+
+
+class SermonBenchmark:
+    """
+    Measures the performance of parts of the Sermon package.
+    Run with: python3 -m Sermon.sermon_benchmark
+    """
+
+    def __init__(self, repeat=5, number=2000):
+        """
+        Initializes the SermonBenchmark.
+
+        Args:
+            repeat (int, optional): How many times each measurement is repeated (the best time is reported). Defaults to 5.
+            number (int, optional): How many calls are timed per measurement. Defaults to 2000.
+        """
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        self.settings = Settings(current_dir)
+        self.repeat = repeat
+        self.number = number
+
+    def time_function(self, function, number=None):
+        """
+        Returns the best time of one call of a function, in microseconds.
+        """
+        number = number or self.number
+        best = min(timeit.repeat(function, repeat=self.repeat, number=number))
+        return best / number * 1e6
+
+    def create_sample_presentation(self, slide_count=40):
+        """
+        Creates a presentation with text and a (different) photo-like JPEG image on every slide.
+
+        Args:
+            slide_count (int, optional): The number of slides. Defaults to 40.
+
+        Returns:
+            pptx.presentation.Presentation: The presentation.
+        """
+        prs = Presentation()
+        for index in range(slide_count):
+            slide = prs.slides.add_slide(prs.slide_layouts[1])
+            slide.shapes.title.text = f"Psalm {index}, vers 1 en 2"
+            slide.placeholders[1].text = "\n".join(SAMPLE_OUTRO_LINES * 4)
+            image = Image.effect_noise((400, 300), 20 + index).convert("RGB")
+            image_stream = io.BytesIO()
+            image.save(image_stream, format="JPEG", quality=85)
+            image_stream.seek(0)
+            slide.shapes.add_picture(image_stream, Inches(1), Inches(1), Inches(4), Inches(3))
+        return prs
+
+    def legacy_field_search(self):
+        """
+        The field extraction as it was done before the FieldScanner: one re.search per field,
+        with the regexes formatted from the settings on every call. Kept as the reference for the benchmark.
+        """
+        get = self.settings.get_setting
+        fields = {}
+        # intro
+        month_numbers = {"januari": "1", "februari": "2", "maart": "3", "april": "4", "mei": "5", "juni": "6",
+                         "juli": "7", "augustus": "8", "september": "9", "oktober": "10", "november": "11",
+                         "december": "12"}
+        date_label = get("word-intro-date_label")
+        date_lines = [l for l in SAMPLE_INTRO_TEXT.split("\n") if date_label in l]
+        if date_lines:
+            fields["date"] = date_lines[0].split(date_label)[1].strip()
+            fields["month"] = month_numbers.get(fields["date"].split()[1])
+        time_match = re.search(r"(\d{1,2}\.\d{2}\suur)", SAMPLE_INTRO_TEXT)
+        if time_match:
+            fields["time"] = time_match.group(1)
+        parson_match = re.search(rf"{get('word-intro-parson_text')}\s*\n\s*(.+)", SAMPLE_INTRO_TEXT)
+        if parson_match:
+            fields["parson"] = parson_match.group(1).strip()
+        theme_match = re.search(rf"{get('word-intro-theme_text')}\s*“([^“”]+)”", SAMPLE_INTRO_TEXT)
+        if theme_match:
+            fields["theme"] = theme_match.group(1).strip()
+        organist_match = re.search(rf"{get('word-intro-organplayer_text')}\s+(.+):\s+(.+)", SAMPLE_INTRO_TEXT)
+        if organist_match:
+            fields["organist"] = organist_match.group(1).strip()
+            fields["performed_piece"] = organist_match.group(2).strip()
+        # offering
+        first_part = SAMPLE_OFFERING_TEXT.split(get("word-offering-blue_bag_text"))[0]
+        bank_match = re.search(r"([A-Z]{2}\d{2}\s[A-Z]{4}\s\d{4}\s\d{4}\s\d{2})", first_part)
+        if bank_match:
+            fields["bank_account_number"] = bank_match.group(1).strip()
+        goal_match = re.search(
+            rf"1ste \({get('word-offering-red_bag_text')}\)\s*{get('word-offering-diaconie_text')}\s*(.*?)(?=\n|$)",
+            SAMPLE_OFFERING_TEXT)
+        if goal_match:
+            fields["offering_goal"] = goal_match.group(1).strip()
+        # outro
+        organ_text = get("word-outro-organ_text")
+        next_sermon_text = get("word-outro-next_sermon_text")
+        for line in SAMPLE_OUTRO_LINES:
+            if organ_text in line:
+                performed_piece_match = re.search(rf"{organ_text}\s*(.+)", line.strip())
+                if performed_piece_match:
+                    fields["performed_piece"] = performed_piece_match.group(1).strip()
+            if next_sermon_text.lower() in line.lower():
+                fields["next_sermon"] = True
+        return fields
+
+    def field_scanner_search(self, scanner):
+        """
+        The field extraction with a FieldScanner, for the same texts as legacy_field_search.
+        """
+        fields = {}
+        intro_fields = scanner.scan("intro", SAMPLE_INTRO_TEXT)
+        fields["date"] = intro_fields["date"].strip()
+        fields["month"] = MONTH_NUMBERS.get(fields["date"].split()[1])
+        for name in ("time", "parson", "theme", "organist", "performed_piece"):
+            if name in intro_fields:
+                fields[name] = intro_fields[name].strip()
+        offering_fields = scanner.scan("offering", SAMPLE_OFFERING_TEXT)
+        if offering_fields.positions["bank_account_number"] < offering_fields.positions["blue_bag"]:
+            fields["bank_account_number"] = offering_fields["bank_account_number"].strip()
+        fields["offering_goal"] = offering_fields["offering_goal"].strip()
+        for line in SAMPLE_OUTRO_LINES:
+            outro_fields = scanner.scan("outro", line)
+            if "performed_piece" in outro_fields:
+                fields["performed_piece"] = outro_fields["performed_piece"].strip()
+            if "next_sermon" in outro_fields:
+                fields["next_sermon"] = True
+        return fields
+
+    def benchmark_field_scanner(self):
+        """
+        Compares the FieldScanner with the previous per-field regex searches.
+
+        Returns:
+            dict: The times per call in microseconds ("legacy", "field_scanner", "field_scanner_compile").
+        """
+        scanner = FieldScanner(self.settings)
+        return {
+            "legacy": self.time_function(self.legacy_field_search),
+            "field_scanner": self.time_function(lambda: self.field_scanner_search(scanner)),
+            "field_scanner_compile": self.time_function(lambda: FieldScanner(self.settings)),
+        }
+
+    def benchmark_save(self):
+        """
+        Compares saving a presentation by python-pptx with the PackageWriter.
+        Both write a file in the same temporary folder, so the times include the same kind of disk writes.
+
+        Returns:
+            dict: The times per save in milliseconds ("python-pptx", "package_writer").
+        """
+        prs = self.create_sample_presentation()
+        writer = PackageWriter(self.settings)
+        with tempfile.TemporaryDirectory() as directory:
+            pptx_filename = os.path.join(directory, "python-pptx.pptx")
+            writer_filename = os.path.join(directory, "package_writer.pptx")
+            return {
+                "python-pptx": self.time_function(lambda: prs.save(pptx_filename), number=5) / 1000,
+                "package_writer": self.time_function(lambda: writer.save(prs, writer_filename), number=5) / 1000,
+            }
+
+    def measure_import_time(self, module):
+        """
+        Imports a module in a new Python interpreter with -X importtime.
+
+        Args:
+            module (str): The module, e.g. "Sermon.main".
+
+        Returns:
+            dict: (self, cumulative) import time in microseconds, by module name.
+        """
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=os.path.dirname(package_dir), capture_output=True, text=True, check=True)
+        times = {}
+        for line in result.stderr.splitlines():
+            match = IMPORT_TIME_REGEX.match(line)
+            if match:
+                times[match.group(3).strip()] = (int(match.group(1)), int(match.group(2)))
+        return times
+
+    def benchmark_startup(self, module=None):
+        """
+        Measures the import time of the command line (the best of the repeats).
+
+        Args:
+            module (str, optional): The module to import. Defaults to the main module of the package.
+
+        Returns:
+            tuple: (module, import times per module, see measure_import_time).
+        """
+        module = module or f"{__package__ or 'Sermon'}.main"
+        runs = [self.measure_import_time(module) for _ in range(self.repeat)]
+        return module, min(runs, key=lambda times: times[module][1])
+
+    def check_startup_budget(self, startup=None):
+        """
+        Checks the import time of the command line against the "startup-import_budget_ms" setting, and that
+        none of the "startup-forbidden_modules" (python-docx, python-pptx, lxml, PIL) is imported at startup.
+
+        Args:
+            startup (tuple, optional): (module, import times) as returned by benchmark_startup.
+                                       Defaults to None (measure the startup).
+
+        Returns:
+            tuple: (import time in milliseconds, list of the problems found).
+        """
+        module, times = startup if startup is not None else self.benchmark_startup()
+        total = times[module][1] / 1000
+        budget = self.settings.get_setting("startup-import_budget_ms", 60)
+        forbidden = self.settings.get_setting("startup-forbidden_modules", ["docx", "pptx", "lxml", "PIL"])
+        problems = []
+        if total > budget:
+            problems.append(f"importing {module} takes {total:.1f} ms, the budget is {budget} ms")
+        for name in times:
+            if name.split(".")[0] in forbidden:
+                problems.append(f"{name} is imported at startup")
+        return total, problems
+
+    def run_startup(self):
+        """
+        Prints the import time of the command line per module, and checks the budget.
+
+        Returns:
+            bool: True if the startup is within the budget.
+        """
+        module, times = self.benchmark_startup()
+        print(f"Import time of {module}, milliseconds (self, cumulative), slowest first:")
+        for name, (self_time, cumulative_time) in sorted(times.items(), key=lambda item: -item[1][1])[:15]:
+            print(f"  {name:<40}{self_time / 1000:10.1f}{cumulative_time / 1000:10.1f}")
+        total, problems = self.check_startup_budget((module, times))
+        for problem in problems:
+            print(f"Error: {problem}")
+        return not problems
+
+    def run(self):
+        """
+        Runs all benchmarks and prints the results.
+        """
+        print("Field extraction (intro, offering and outro), microseconds per document:")
+        for name, value in self.benchmark_field_scanner().items():
+            print(f"  {name:<24}{value:10.1f}")
+        print("Save of a presentation with 40 slides with images, milliseconds:")
+        for name, value in self.benchmark_save().items():
+            print(f"  {name:<24}{value:10.1f}")
+        self.run_startup()
+
+
+if __name__ == "__main__":
+    # with --startup, only the startup is measured, and the exit status is 1 when it is over the budget
+    if "--startup" in sys.argv[1:]:
+        sys.exit(0 if SermonBenchmark().run_startup() else 1)
+    SermonBenchmark().run()
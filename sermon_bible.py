@@ -0,0 +1,251 @@
+# sermon_bible.py
+import mmap
+import os
+import re
+import struct
+import xml.etree.ElementTree as ElementTree
+
+# The start of an index file
+INDEX_MAGIC = b"SBIBLE1\0"
+# The number of verses, after the magic
+INDEX_HEADER = struct.Struct("<8sI")
+# Per verse: book, chapter, verse, offset and length of the text (in bytes, after the records)
+INDEX_RECORD = struct.Struct("<HHHxxII")
+
+# The books of the Bible: their OSIS id and the (lowercase) names used in the order of service
+BOOKS = (
+    ("Gen", "genesis"), ("Exod", "exodus"), ("Lev", "leviticus"), ("Num", "numeri"),
+    ("Deut", "deuteronomium"), ("Josh", "jozua"), ("Judg", "richteren", "rechters"), ("Ruth", "ruth"),
+    ("1Sam", "1 samuel"), ("2Sam", "2 samuel"), ("1Kgs", "1 koningen"), ("2Kgs", "2 koningen"),
+    ("1Chr", "1 kronieken"), ("2Chr", "2 kronieken"), ("Ezra", "ezra"), ("Neh", "nehemia"),
+    ("Esth", "esther", "ester"), ("Job", "job"), ("Ps", "psalmen", "psalm"), ("Prov", "spreuken"),
+    ("Eccl", "prediker"), ("Song", "hooglied"), ("Isa", "jesaja"), ("Jer", "jeremia"),
+    ("Lam", "klaagliederen"), ("Ezek", "ezechiel", "ezechiël"), ("Dan", "daniel", "daniël"),
+    ("Hos", "hosea"), ("Joel", "joel", "joël"), ("Amos", "amos"), ("Obad", "obadja"), ("Jonah", "jona"),
+    ("Mic", "micha"), ("Nah", "nahum"), ("Hab", "habakuk"), ("Zeph", "sefanja", "zefanja"),
+    ("Hag", "haggai", "haggaï"), ("Zech", "zacharia"), ("Mal", "maleachi"),
+    ("Matt", "mattheus", "matteüs", "matteus", "matthéüs"), ("Mark", "marcus", "markus"),
+    ("Luke", "lucas", "lukas"), ("John", "johannes"), ("Acts", "handelingen"), ("Rom", "romeinen"),
+    ("1Cor", "1 korintiers", "1 korintiërs", "1 corinthiers", "1 corinthiërs"),
+    ("2Cor", "2 korintiers", "2 korintiërs", "2 corinthiers", "2 corinthiërs"),
+    ("Gal", "galaten"), ("Eph", "efeziers", "efeziërs"), ("Phil", "filippenzen"), ("Col", "kolossenzen", "colossenzen"),
+    ("1Thess", "1 tessalonicenzen", "1 thessalonicenzen"), ("2Thess", "2 tessalonicenzen", "2 thessalonicenzen"),
+    ("1Tim", "1 timoteus", "1 timoteüs", "1 timotheus", "1 timotheüs"),
+    ("2Tim", "2 timoteus", "2 timoteüs", "2 timotheus", "2 timotheüs"),
+    ("Titus", "titus"), ("Phlm", "filemon"), ("Heb", "hebreeen", "hebreeën"), ("Jas", "jakobus", "jacobus"),
+    ("1Pet", "1 petrus"), ("2Pet", "2 petrus"), ("1John", "1 johannes"), ("2John", "2 johannes"),
+    ("3John", "3 johannes"), ("Jude", "judas"), ("Rev", "openbaring"),
+)
+# The number of a book (its position in BOOKS) by its OSIS id
+BOOK_NUMBERS = {book[0]: number for number, book in enumerate(BOOKS)}
+# The book names, longest first (so "1 johannes" is found before "johannes")
+BOOK_NAMES = sorted(((name, number) for number, book in enumerate(BOOKS) for name in book[1:]),
+                    key=lambda item: -len(item[0]))
+
+# A verse or a range of verses, optionally into a next chapter: "1", "1-5", "28-3:4"
+VERSE_RANGE_REGEX = re.compile(r"(\d+)(?:\s*[-–]\s*(\d+)(?:\s*:\s*(\d+))?)?")
+# The OSIS elements whose text is not part of the verses
+SKIPPED_OSIS_ELEMENTS = {"note", "title", "reference"}
+
+
+class BibleIndex:
+    """
+    A Bible text in a compact index file, memory-mapped, to fill reading sections without pasted text.
+
+    The index is made once from an OSIS XML file (see build). It has a table of fixed-size records,
+    sorted by book, chapter and verse, followed by the UTF-8 text of the verses. A verse range is
+    found by a binary search in the table and read directly from the mapped file.
+    """
+
+    def __init__(self, filename):
+        """
+        Initializes the BibleIndex, and maps the index file.
+
+        Args:
+            filename (str): The path of the index file (see build).
+        """
+        self.filename = filename
+        with open(filename, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.verse_count = INDEX_HEADER.unpack_from(self.data, 0)
+        if magic != INDEX_MAGIC:
+            self.data.close()
+            raise ValueError(f"'{filename}' is not a Bible index")
+        self.text_offset = INDEX_HEADER.size + self.verse_count * INDEX_RECORD.size
+
+    @staticmethod
+    def get_verse_id(osis_id):
+        """
+        Returns the book number, chapter and verse of an OSIS verse id.
+
+        Args:
+            osis_id (str): The OSIS id, e.g. "Rom.2.1" (of several ids, the first is used).
+
+        Returns:
+            tuple: (book, chapter, verse), or None if the book is not known.
+        """
+        parts = osis_id.split()[0].split(".")
+        if len(parts) != 3 or parts[0] not in BOOK_NUMBERS:
+            return None
+        return BOOK_NUMBERS[parts[0]], int(parts[1]), int(parts[2])
+
+    @classmethod
+    def read_osis(cls, osis_filename):
+        """
+        Reads the verses of an OSIS XML file. Both verse containers and milestones (sID/eID) are supported;
+        notes and titles are left out.
+
+        Args:
+            osis_filename (str): The path of the OSIS file.
+
+        Returns:
+            dict: The text of each verse, by (book, chapter, verse).
+        """
+        verses = {}
+        current = [None]
+
+        def add_text(text):
+            if text and current[0] is not None:
+                verses.setdefault(current[0], []).append(text)
+
+        def read_element(element):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "verse" and element.get("eID"):
+                current[0] = None
+            elif tag == "verse" and element.get("sID"):
+                current[0] = cls.get_verse_id(element.get("osisID") or element.get("sID"))
+            elif tag == "verse" and element.get("osisID"):
+                previous, current[0] = current[0], cls.get_verse_id(element.get("osisID"))
+                add_text(element.text)
+                for child in element:
+                    read_element(child)
+                current[0] = previous
+            elif tag not in SKIPPED_OSIS_ELEMENTS:
+                add_text(element.text)
+                for child in element:
+                    read_element(child)
+            add_text(element.tail)
+
+        read_element(ElementTree.parse(osis_filename).getroot())
+        return {verse_id: " ".join("".join(texts).split()) for verse_id, texts in verses.items()}
+
+    @classmethod
+    def build(cls, osis_filename, index_filename):
+        """
+        Makes an index file from an OSIS XML file.
+
+        Args:
+            osis_filename (str): The path of the OSIS file.
+            index_filename (str): The path of the index file.
+
+        Returns:
+            int: The number of verses in the index.
+        """
+        verses = cls.read_osis(osis_filename)
+        records = []
+        texts = []
+        offset = 0
+        for (book, chapter, verse), text in sorted(verses.items()):
+            data = text.encode("utf-8")
+            records.append(INDEX_RECORD.pack(book, chapter, verse, offset, len(data)))
+            texts.append(data)
+            offset += len(data)
+        temporary_filename = f"{index_filename}.{os.getpid()}.tmp"
+        with open(temporary_filename, "wb") as file:
+            file.write(INDEX_HEADER.pack(INDEX_MAGIC, len(records)))
+            file.writelines(records)
+            file.writelines(texts)
+        os.replace(temporary_filename, index_filename)
+        return len(records)
+
+    @staticmethod
+    def parse_reference(reference):
+        """
+        Returns the verse ranges of a reading title.
+
+        Args:
+            reference (str): The title, e.g. "Romeinen 2, vers 1-5", "Romeinen 2:1-5 en 7" or "Psalm 23".
+
+        Returns:
+            list: (first, last) tuples of (book, chapter, verse) keys, or None if the title has no known book.
+        """
+        text = " ".join(reference.lower().split())
+        for name, book in BOOK_NAMES:
+            match = re.search(r"(?<!\w)" + re.escape(name) + r"\s*(\d+)", text)
+            if match:
+                break
+        else:
+            return None
+        chapter = int(match.group(1))
+        rest = re.sub(r"^[\s,:.]*(?:verzen|vers|vs\.?|v\.)?", "", text[match.end():])
+        ranges = []
+        for first_verse, last, last_verse in VERSE_RANGE_REGEX.findall(rest):
+            if last_verse:
+                ranges.append(((book, chapter, int(first_verse)), (book, int(last), int(last_verse))))
+                chapter = int(last)
+            else:
+                ranges.append(((book, chapter, int(first_verse)), (book, chapter, int(last or first_verse))))
+        # without verses, the whole chapter
+        return ranges or [((book, chapter, 0), (book, chapter, 0xFFFF))]
+
+    def get_record(self, index):
+        """
+        Returns a record of the table.
+
+        Args:
+            index (int): The number of the record.
+
+        Returns:
+            tuple: (book, chapter, verse, offset, length).
+        """
+        return INDEX_RECORD.unpack_from(self.data, INDEX_HEADER.size + index * INDEX_RECORD.size)
+
+    def find(self, key):
+        """
+        Returns the number of the first record at or after a verse (a binary search).
+
+        Args:
+            key (tuple): (book, chapter, verse).
+
+        Returns:
+            int: The number of the record (verse_count if all records are before the verse).
+        """
+        low, high = 0, self.verse_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_record(middle)[:3] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_verses(self, reference):
+        """
+        Returns the verses a reading title refers to.
+
+        Args:
+            reference (str): The title of the reading (see parse_reference).
+
+        Returns:
+            list: (verse number, text) tuples, or None if the title refers to no verses in the index.
+        """
+        ranges = self.parse_reference(reference or "")
+        if not ranges:
+            return None
+        verses = []
+        for first, last in ranges:
+            index = self.find(first)
+            while index < self.verse_count:
+                book, chapter, verse, offset, length = self.get_record(index)
+                if (book, chapter, verse) > last:
+                    break
+                start = self.text_offset + offset
+                verses.append((verse, self.data[start:start + length].decode("utf-8")))
+                index += 1
+        return verses or None
+
+    def close(self):
+        """
+        Closes the index file.
+        """
+        self.data.close()
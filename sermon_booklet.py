@@ -0,0 +1,105 @@
+# sermon_booklet.py
+import copy
+import os
+from .sermon_parallel import ParallelRenderer, render_presentations
+
+
+class BookletRenderer:
+    """
+    Creates the presentations of a Word document with several services (e.g. the booklet of Christmas or
+    Easter), in which every service has its own intro ([Be]) up to its own outro ([Ei]).
+
+    The document is read and split into services in one scan (see SermonExtract.extract_services). Every
+    service gets its own presentation ("kerst-1.pptx", "kerst-2.pptx", ...), rendered in worker processes at
+    the same time, with the images optimised once and passed in shared memory (see render_presentations).
+    A merged presentation has the slides of all services in one deck; an image that several services use is
+    stored once in it.
+    """
+
+    def __init__(self, sermon):
+        """
+        Initializes the BookletRenderer.
+
+        Args:
+            sermon (Sermon): The sermon with the Word document (and the settings of the presentations).
+        """
+        self.sermon = sermon
+
+    def get_filename(self, number):
+        """
+        Returns the filename of the presentation of a service.
+
+        Args:
+            number (int): The number of the service in the booklet, from 1.
+
+        Returns:
+            str: The filename, e.g. "kerst-2.pptx".
+        """
+        base, extension = os.path.splitext(self.sermon.powerpoint_filename)
+        return f"{base}-{number}{extension}"
+
+    def run(self, merged=False, workers=None, streaming=False, deterministic=False):
+        """
+        Reads the Word document, and creates the presentations of its services.
+
+        Args:
+            merged (bool, optional): If True, creates one presentation with all services. Defaults to False.
+            workers (int, optional): The number of processes that render services at the same time (or,
+                                     merged, the sections of the services). Defaults to the "booklet-workers"
+                                     setting (0: one per service; merged: no worker processes).
+            streaming (bool, optional): See Sermon.process_sermon. Defaults to False.
+            deterministic (bool, optional): See Sermon.process_sermon. Defaults to False.
+
+        Returns:
+            list: The filenames of the presentations that were created.
+        """
+        sermon = self.sermon
+        sermon.load_word_document()
+        if sermon.word_document is None:
+            return []
+        services = sermon.extract_services(sermon.get_document_view())
+        if not services:
+            print(f"Error: no services found in '{sermon.word_filename}'.")
+            return []
+        print(f"Found {len(services)} services in '{sermon.word_filename}'.")
+        if workers is None:
+            workers = sermon.settings.get_setting("booklet-workers", 0)
+
+        if merged:
+            return self.render_merged([section for sections in services for section in sections], workers,
+                                      streaming, deterministic)
+
+        # every service gets its own settings, also when the services are rendered in this process
+        jobs = [(copy.deepcopy(sermon.settings), sermon.powerpoint_template_filename, sermon.word_filename,
+                 self.get_filename(number), [sermon.image_optimiser.optimise_section(section) for section in sections])
+                for number, sections in enumerate(services, 1)]
+        return render_presentations(sermon.settings, jobs, workers, streaming, deterministic)
+
+    def render_merged(self, sections, workers, streaming, deterministic):
+        """
+        Creates one presentation with the sections of all services.
+
+        Args:
+            sections (list): The extracted sections of all services, in document order.
+            workers (int): If more than 0, the sections are rendered in this number of worker processes
+                           (see ParallelRenderer).
+            streaming (bool): See Sermon.process_sermon.
+            deterministic (bool): See Sermon.process_sermon.
+
+        Returns:
+            list: The filename of the presentation, or an empty list if it could not be created.
+        """
+        sermon = self.sermon
+        sermon.streaming = streaming
+        sermon.deterministic = deterministic
+        sermon.slide_sources = {}
+        sermon.create_powerpoint_presentation()
+        if sermon.powerpoint_presentation is None:
+            return []
+        if workers:
+            ParallelRenderer(sermon, workers).run(sections)
+        else:
+            for section in sections:
+                sermon.process_section(sermon.image_optimiser.optimise_section(section))
+        sermon.finish_presentation()
+        return [sermon.powerpoint_filename] if sermon.powerpoint_presentation is not None else []
@@ -2,9 +2,28 @@
 from docx import Document
 from pptx import Presentation
 import os
+from .sermon_bible import BibleIndex
+from .sermon_booklet import BookletRenderer
 from .sermon_extract import SermonExtract
 from .sermon_create import SermonCreate
 from .sermon_utils import SermonUtils
+from .sermon_document import DocumentView
+from .sermon_fields import FieldScanner
+from .sermon_fragment_cache import FragmentCache
+from .sermon_hymn_library import HymnLibrary
+from .sermon_images import ImageOptimiser
+from .sermon_manifest import SlideManifest
+from .sermon_media_store import MediaStore
+from .sermon_parallel import ParallelRenderer
+from .sermon_pipeline import SermonPipeline
+from .sermon_plan import SlidePlanner
+from .sermon_provenance import SlideProvenance, SlideSource
+from .sermon_slide_snapshot import SlideSnapshot
+from .sermon_slimming import TemplateSlimmer
+from .sermon_styles import TemplateStyles
+from .sermon_template import TemplateSnapshot
+from .sermon_variants import VariantRenderer
+from .sermon_writer import PackageWriter, StreamingPackageWriter
 from .settings import Settings
 
 
@@ -14,16 +33,19 @@ class Sermon(SermonExtract, SermonCreate, SermonUtils):
     from a Word document order of service.
     """
 
-    def __init__(self):
+    def __init__(self, settings=None):
         """
         Initializes the Sermon object
+
+        Args:
+            settings (Settings, optional): The settings to use. Defaults to None (load settings.json).
         """
         # Get the directory of the current file (sermon_core.py)
         current_dir = os.path.dirname(os.path.abspath(__file__))
         # Get the name of the current directory
         current_dir_name = os.path.basename(current_dir)
         # Initialize the settings
-        self.settings = Settings(current_dir)
+        self.settings = settings if settings is not None else Settings(current_dir)
 
         # Construct the full path to the word document
         self.word_filename = os.path.join(current_dir_name, self.settings.get_setting("default_word_filename"))
@@ -31,18 +53,51 @@ class Sermon(SermonExtract, SermonCreate, SermonUtils):
         self.max_reading_lines = self.settings.get_setting("max_reading_lines")
         self.powerpoint_filename = os.path.splitext(self.word_filename)[0] + ".pptx"
         self.word_document = None
+        # read-only view of the Word document, used by the extraction methods
+        self.document_view = None
         self.powerpoint_presentation = None
+        # with streaming, the slides are written to the presentation file as soon as their section is finished
+        self.streaming = False
+        self.streaming_writer = None
+        # with deterministic output, the presentation has the same bytes for the same input, and gets a manifest
+        self.deterministic = False
+        # the section and paragraphs each slide was made from (SlideSource), by slide id
+        self.slide_sources = {}
+        # the map of the slides of the last saved presentation to the paragraphs of the Word document
+        self.slide_provenance = None
+        # True when the text styles are written into the layouts of the template (see prepare_template)
+        self.styles_baked = False
+        # the rendered slides of earlier sections (see prepare_template)
+        self.fragment_cache = None
         # current_paragraph_index is the pointer to the current paragraph in the Word-file
         self.current_paragraph_index = 0
         self.num_paragraphs = 0
         # Define the tags
         self.tags = self.settings.get_tags()
         self.current_tag = None
+        # the label patterns of the intro, offering and outro fields, compiled once
+        self.field_scanner = FieldScanner(self.settings)
+        # the store of optimised images shared by all presentations (no store if the directory is empty)
+        media_store_directory = self.settings.get_setting("media_store-directory", "")
+        self.media_store = MediaStore(media_store_directory) if media_store_directory else None
+        self.image_optimiser = ImageOptimiser(self.settings, self.media_store)
+        # the hymns of earlier services (no library if the filename is empty)
+        hymn_library_filename = self.settings.get_setting("hymn_library-filename", "")
+        self.hymn_library = HymnLibrary(hymn_library_filename) if hymn_library_filename else None
+        # the Bible text for the readings (no index if the filename is empty)
+        self.bible_index = None
+        bible_index_filename = self.settings.get_setting("bible-index_filename", "")
+        if bible_index_filename:
+            try:
+                self.bible_index = BibleIndex(bible_index_filename)
+            except (OSError, ValueError) as e:
+                print(f"An error occurred while opening the Bible index: {e}")
 
     def load_word_document(self):
         """
         Loads the Word document and handles potential errors.
         """
+        self.document_view = None
         try:
             self.word_document = Document(self.word_filename)
         except FileNotFoundError:
@@ -52,87 +107,375 @@ class Sermon(SermonExtract, SermonCreate, SermonUtils):
             print(f"An unexpected error occurred while loading the Word document: {e}")
             self.word_document = None
 
+    def get_document_view(self):
+        """
+        Returns the read-only view of the loaded Word document, and creates it when needed.
+
+        Returns:
+            DocumentView: The view of the Word document, or None if no document is loaded.
+        """
+        if self.document_view is None and self.word_document is not None:
+            self.document_view = DocumentView.from_docx(self.word_document, self.word_filename)
+        return self.document_view
+
     def create_powerpoint_presentation(self):
         """
         Creates an empty PowerPoint presentation with the specified filename.
         """
         try:
+            # find out before the slides are made whether the presentation can be saved
+            self.check_output_filename()
             # Load the template
             # Get the directory of the current file (sermon_core.py)
             current_dir = os.path.dirname(os.path.abspath(__file__))
             template_filename = os.path.join(current_dir, self.powerpoint_template_filename)
-            self.powerpoint_presentation = Presentation(template_filename)
-            self.powerpoint_presentation.save(self.powerpoint_filename)
+            self.powerpoint_presentation = self.load_template(template_filename)
+            self.prepare_template()
+            if self.streaming:
+                self.streaming_writer = StreamingPackageWriter(self.settings, self.powerpoint_filename,
+                                                               deterministic=self.deterministic)
+                self.streaming_writer.open(self.powerpoint_presentation)
         except Exception as e:
             print(f"An unexpected error occurred while creating the PowerPoint presentation: {e}")
             self.powerpoint_presentation = None
 
-    def process_sermon(self):
+    def check_output_filename(self):
+        """
+        Checks that the presentation can be written to self.powerpoint_filename.
+
+        Raises:
+            OSError: If the directory of the presentation does not exist, or the presentation cannot be written.
+        """
+        directory = os.path.dirname(os.path.abspath(self.powerpoint_filename))
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"The directory '{directory}' does not exist.")
+        if not os.access(directory, os.W_OK) or \
+                (os.path.exists(self.powerpoint_filename) and not os.access(self.powerpoint_filename, os.W_OK)):
+            raise PermissionError(f"'{self.powerpoint_filename}' cannot be written.")
+
+    def load_template(self, template_filename):
+        """
+        Loads the PowerPoint template: a copy of its TemplateSnapshot (parsed once per process),
+        or a newly parsed template if the "template-snapshot_enabled" setting is false.
+
+        Args:
+            template_filename (str): The path of the template.
+
+        Returns:
+            pptx.presentation.Presentation: The new presentation.
+        """
+        if self.settings.get_setting("template-snapshot_enabled", True):
+            return TemplateSnapshot.load(template_filename).new_presentation()
+        return Presentation(template_filename)
+
+    def prepare_template(self):
+        """
+        Writes the title and content text styles of the settings into the layouts of the loaded template
+        (unless the "template-bake_styles" setting is false), so the slides inherit them.
+        Creates the fragment cache for this template if the "fragment_cache-enabled" setting is true.
+        """
+        self.styles_baked = self.settings.get_setting("template-bake_styles", True)
+        if self.styles_baked:
+            TemplateStyles(self.settings).apply(self.powerpoint_presentation)
+        if self.settings.get_setting("fragment_cache-enabled", False) and self.fragment_cache is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            self.fragment_cache = FragmentCache(self.settings,
+                                                os.path.join(current_dir, self.powerpoint_template_filename),
+                                                self.settings.get_setting("fragment_cache-directory", "") or None)
+
+    def process_sermon(self, pipelined=None, workers=None, streaming=None, deterministic=None):
         """
         Main method to process the sermon data and create the PowerPoint.
-        Iterates through the paragraphs in the Word document using a while loop
-        and a pointer, identifying start tags and calling the appropriate extraction
-        functions.
+        Iterates through the sections in the Word document, and creates the slides
+        for every section.
+
+        Args:
+            pipelined (bool, optional): If True, the extraction of the sections and the creation of the slides
+                                        run at the same time (see SermonPipeline). Defaults to the
+                                        "pipeline-enabled" setting.
+            workers (int, optional): If more than 0, the slides of hymns, readings and illustrations are rendered
+                                     in this number of worker processes (see ParallelRenderer).
+                                     Defaults to the "parallel-workers" setting.
+            streaming (bool, optional): If True, the slides of each section are written to the presentation file
+                                        as soon as the section is finished (see StreamingPackageWriter).
+                                        Defaults to the "writer-streaming" setting.
+            deterministic (bool, optional): If True, the presentation is written deterministically, with a
+                                            manifest of its slides (see SlideManifest). Defaults to the
+                                            "writer-deterministic" setting.
         """
-        self.load_word_document()
-        if self.word_document is None:
-            return  # Stop processing if there was an error loading the Word document
+        if streaming is None:
+            streaming = self.settings.get_setting("writer-streaming", False)
+        self.streaming = streaming
+        if deterministic is None:
+            deterministic = self.settings.get_setting("writer-deterministic", False)
+        self.deterministic = deterministic
+        self.slide_sources = {}
+        if pipelined is None:
+            pipelined = self.settings.get_setting("pipeline-enabled", False)
+        if workers is None:
+            workers = self.settings.get_setting("parallel-workers", 0)
 
+        if pipelined and not workers:
+            if not SermonPipeline(self).run():
+                return
+        else:
+            self.load_word_document()
+            if self.word_document is None:
+                return  # Stop processing if there was an error loading the Word document
+
+            self.create_powerpoint_presentation()
+            if self.powerpoint_presentation is None:
+                return
+
+            view = self.get_document_view()
+            self.num_paragraphs = len(view)
+
+            if workers:
+                ParallelRenderer(self, workers).run(self.extract_document(view))
+            else:
+                # Extract the sections one by one, and create the slides for each section
+                for section in self.iter_sections(view):
+                    self.process_section(self.image_optimiser.optimise_section(section))
+
+        self.finish_presentation()
+
+    def render_sections(self, sections):
+        """
+        Creates the presentation from sections that were already extracted (with optimised images), and saves it.
+        Used for the variants of a presentation (see VariantRenderer).
+
+        Args:
+            sections (list): The extracted sections (SectionResult objects), in document order.
+        """
+        self.slide_sources = {}
         self.create_powerpoint_presentation()
         if self.powerpoint_presentation is None:
             return
+        for section in sections:
+            self.process_section(section)
+        self.finish_presentation()
 
-        paragraphs = self.word_document.paragraphs
-        self.num_paragraphs = len(paragraphs)
-        self.current_paragraph_index = 0
-
-        # print(self.num_paragraphs)
-
-        while self.current_paragraph_index < self.num_paragraphs:
-            paragraph = self.word_document.paragraphs[self.current_paragraph_index]
-            is_start_tag = False
-            for tag_type, tag_data in self.tags.items():
-                if tag_data["begin"] in paragraph.text:
-                    is_start_tag = True
-
-                    self.current_tag = tag_type
-
-                    # Process the current section
-                    if self.current_tag == "hymn":
-                        title, hymn_data = self.extract_hymn_section(paragraphs[self.current_paragraph_index:])
-                        self.create_hymn_slides(title, hymn_data)
-                    elif self.current_tag == "offering":
-                        offering_data = self.extract_offering_section(paragraphs[self.current_paragraph_index:])
-                        self.create_offering_slides(offering_data)
-                    elif self.current_tag == "intro":
-                        intro_data = self.extract_intro_section(paragraphs[self.current_paragraph_index:])
-                        self.current_paragraph_index += 1
-                        self.create_intro_slides(intro_data, "slide-layout-intro-1")
-                        self.create_intro_slides(intro_data, "slide-layout-intro-2")
-                        self.create_intro_slides(intro_data, "slide-layout-intro-2", True)
-                        self.create_empty_slide()
-                    elif self.current_tag == "reading":
-                        title, reading_data = self.extract_reading_section(paragraphs[self.current_paragraph_index:])
-                        # print(reading_data)
-                        self.create_reading_slides(title, reading_data)
-                    elif self.current_tag == "outro":
-                        date, parson, performed_piece = self.extract_outro_section(paragraphs[self.current_paragraph_index:])
-                        # print(date, parson)
-                        self.create_outro_slides(date, parson, "slide-layout-outro-1", performed_piece = performed_piece)
-                        self.create_outro_slides(date, parson, "slide-layout-outro-2")
-                    elif self.current_tag == "illustration":
-                        image = self.extract_illustration(paragraphs[self.current_paragraph_index:])
-                        self.create_illustration_slides(image)
-
-            if not is_start_tag:
-                self.current_paragraph_index += 1
-
+    def finish_presentation(self):
+        """
+        Removes the template slide and the unused template parts, saves the presentation and archives it
+        (with a media store and the "media_store-archive_decks" setting).
+        """
         self.remove_slide(self.powerpoint_presentation)
-        self.powerpoint_presentation.save(self.powerpoint_filename)
+        if self.settings.get_setting("slim-enabled", True):
+            self.slim_presentation()
+        self.save_presentation()
         if self.powerpoint_presentation is None:
             return
 
         print(f"PowerPoint presentation '{self.powerpoint_filename}' created successfully.")
+        if self.media_store is not None and self.settings.get_setting("media_store-archive_decks", False):
+            name = self.media_store.archive_deck(self.powerpoint_filename, self.word_filename)
+            print(f"PowerPoint presentation archived as '{name}' in '{self.media_store.directory}'.")
+
+    def process_variants(self, variants=None, workers=None, streaming=None, deterministic=None):
+        """
+        Reads the Word document once, and creates a presentation for each variant (see VariantRenderer).
+
+        Args:
+            variants (dict, optional): The settings of each variant, by name. Defaults to the "variants" setting.
+            workers (int, optional): The number of processes that render variants at the same time.
+                                     Defaults to the "variants-workers" setting (0: one per variant).
+            streaming (bool, optional): See process_sermon. Defaults to the "writer-streaming" setting.
+            deterministic (bool, optional): See process_sermon. Defaults to the "writer-deterministic" setting.
+
+        Returns:
+            list: The filenames of the presentations that were created.
+        """
+        if streaming is None:
+            streaming = self.settings.get_setting("writer-streaming", False)
+        if deterministic is None:
+            deterministic = self.settings.get_setting("writer-deterministic", False)
+        return VariantRenderer(self, variants).run(workers, streaming, deterministic)
+
+    def process_booklet(self, merged=None, workers=None, streaming=None, deterministic=None):
+        """
+        Reads a Word document with several services, and creates a presentation for each service, or one
+        merged presentation (see BookletRenderer).
+
+        Args:
+            merged (bool, optional): If True, creates one presentation with all services.
+                                     Defaults to the "booklet-merged" setting.
+            workers (int, optional): The number of processes that render services at the same time.
+                                     Defaults to the "booklet-workers" setting (0: one per service).
+            streaming (bool, optional): See process_sermon. Defaults to the "writer-streaming" setting.
+            deterministic (bool, optional): See process_sermon. Defaults to the "writer-deterministic" setting.
+
+        Returns:
+            list: The filenames of the presentations that were created.
+        """
+        if merged is None:
+            merged = self.settings.get_setting("booklet-merged", False)
+        if streaming is None:
+            streaming = self.settings.get_setting("writer-streaming", False)
+        if deterministic is None:
+            deterministic = self.settings.get_setting("writer-deterministic", False)
+        return BookletRenderer(self).run(merged, workers, streaming, deterministic)
+
+    def plan_sermon(self):
+        """
+        Reads the Word document, and writes the plan of its slides next to the presentation, without making the
+        presentation (see SlidePlanner).
+
+        Returns:
+            dict: The plan, or None if the Word document could not be loaded.
+        """
+        self.load_word_document()
+        if self.word_document is None:
+            return None
+        plan = SlidePlanner(self).write(self.iter_sections(self.get_document_view()), self.powerpoint_filename)
+        print(f"Plan of {plan['slide_count']} slides written to '{SlidePlanner.get_filename(self.powerpoint_filename)}'.")
+        return plan
+
+    def slim_presentation(self):
+        """
+        Removes the layouts, masters and media of the template that the slides do not use,
+        and reports the number of bytes saved.
+        """
+        removed_parts, removed_bytes = TemplateSlimmer().slim(self.powerpoint_presentation)
+        if removed_parts:
+            print(f"Removed {removed_parts} unused template parts ({removed_bytes} bytes) "
+                  f"from '{self.powerpoint_filename}'.")
+
+    def set_word_filename(self, word_filename, output_dir=None):
+        """
+        Sets the Word document to process, and the name of the PowerPoint presentation to create.
+
+        Args:
+            word_filename (str): The path to the Word document.
+            output_dir (str, optional): The directory of the presentation; it is created if it does not exist.
+                                        Defaults to None (next to the Word document).
+        """
+        self.word_filename = word_filename
+        self.powerpoint_filename = os.path.splitext(word_filename)[0] + ".pptx"
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            self.powerpoint_filename = os.path.join(output_dir, os.path.basename(self.powerpoint_filename))
+
+    def save_presentation(self):
+        """
+        Saves the presentation to self.powerpoint_filename, with the PackageWriter
+        (unless the "writer-enabled" setting is false and the output is not deterministic).
+        With streaming, the rest of the presentation is written and the file is closed.
+        Deterministic output also gets its manifest. The map of the slides to the paragraphs is kept in
+        self.slide_provenance, and written next to the presentation with the "provenance-write" setting.
+        If the presentation cannot be written, self.powerpoint_presentation is set to None.
+        """
+        writer = self.streaming_writer
+        try:
+            if writer is not None:
+                self.streaming_writer = None
+                writer.close(self.powerpoint_presentation)
+            elif self.deterministic or self.settings.get_setting("writer-enabled", True):
+                writer = PackageWriter(self.settings, deterministic=self.deterministic)
+                writer.save(self.powerpoint_presentation, self.powerpoint_filename)
+            else:
+                self.powerpoint_presentation.save(self.powerpoint_filename)
+
+            if self.deterministic:
+                SlideManifest(writer.content_hashes).write(self.powerpoint_presentation, self.slide_sources,
+                                                           self.powerpoint_filename)
+        except OSError as e:
+            print(f"An error occurred while saving the PowerPoint presentation '{self.powerpoint_filename}': {e}")
+            self.powerpoint_presentation = None
+            return
+
+        self.slide_provenance = SlideProvenance.from_presentation(self.powerpoint_presentation, self.slide_sources,
+                                                                  self.word_filename)
+        if self.settings.get_setting("provenance-write", False):
+            self.slide_provenance.write(self.powerpoint_filename)
+
+    def process_section(self, section):
+        """
+        Creates the slides for one extracted section, and moves the current paragraph index past the section.
+
+        Args:
+            section (SectionResult): The extracted section (see SermonExtract.iter_sections).
+        """
+        self.current_tag = section.tag
+        self.current_paragraph_index = section.end
+        first_new_slide = len(self.powerpoint_presentation.slides)
+        self.create_section_slides(section)
+        self.record_slide_sources(first_new_slide, section)
+        self.flush_slides()
+
+    def record_slide_sources(self, first_new_slide, section):
+        """
+        Remembers the section and the paragraphs the new slides were made from (see SlideProvenance).
+
+        Args:
+            first_new_slide (int): The index of the first slide of the section.
+            section (SectionResult): The section.
+        """
+        slides = list(self.powerpoint_presentation.slides)[first_new_slide:]
+        ranges = SlideProvenance.match_paragraphs(self.document_view, section,
+                                                  [SlideProvenance.get_slide_text(slide) for slide in slides])
+        for slide, (first, last) in zip(slides, ranges):
+            self.slide_sources[slide.slide_id] = SlideSource(section.tag, section.begin, section.end, first, last)
+
+    def flush_slides(self):
+        """
+        With streaming, writes the slides that were created since the previous call to the presentation file.
+        """
+        if self.streaming_writer is not None:
+            self.streaming_writer.flush_slides(self.powerpoint_presentation)
+
+    def create_section_slides(self, section):
+        """
+        Creates the slides for one extracted section.
+
+        Args:
+            section (SectionResult): The extracted section (see SermonExtract.iter_sections).
+        """
+        key = None
+        if self.fragment_cache is not None and \
+                section.tag in self.settings.get_setting("fragment_cache-section_tags", ["hymn", "reading"]):
+            key = self.fragment_cache.get_key(section)
+            snapshots = self.fragment_cache.get(key)
+            if snapshots is not None:
+                # the section was rendered before: copy its slides
+                for snapshot in snapshots:
+                    snapshot.add_to(self.powerpoint_presentation)
+                return
+
+        first_new_slide = len(self.powerpoint_presentation.slides)
+        if section.tag == "hymn":
+            title, hymn_data = section.data
+            self.create_hymn_slides(title, hymn_data)
+        elif section.tag == "offering":
+            self.create_offering_slides(section.data)
+        elif section.tag == "intro":
+            intro_data = section.data
+            self.create_intro_slides(intro_data, "slide-layout-intro-1")
+            self.create_intro_slides(intro_data, "slide-layout-intro-2")
+            self.create_intro_slides(intro_data, "slide-layout-intro-2", True)
+            self.create_empty_slide()
+        elif section.tag == "reading":
+            title, reading_data = section.data
+            self.create_reading_slides(title, reading_data)
+        elif section.tag == "outro":
+            date, parson, performed_piece = section.data
+            self.create_outro_slides(date, parson, "slide-layout-outro-1", performed_piece = performed_piece)
+            self.create_outro_slides(date, parson, "slide-layout-outro-2")
+        elif section.tag == "illustration":
+            self.create_illustration_slides(section.data)
+
+        if self.settings.get_setting("lean-enabled", False):
+            for slide in list(self.powerpoint_presentation.slides)[first_new_slide:]:
+                self.remove_empty_placeholders(slide)
+
+        if key is not None:
+            try:
+                snapshots = [SlideSnapshot.from_slide(slide)
+                             for slide in list(self.powerpoint_presentation.slides)[first_new_slide:]]
+            except ValueError as e:
+                print(f"The slides of a {section.tag} section cannot be cached: {e}")
+            else:
+                self.fragment_cache.put(key, snapshots)
 
     def remove_slide(self, prs):
         """
@@ -26,12 +26,6 @@ class SermonCreate:
             image = image_list[0]
         hymn_parts = [hymn["text"] for hymn in hymn_data if hymn["text"]]
 
-        # Constants and settings
-        template_id = "slide-layout-lied"
-        song_length_first = self.settings.get_setting("powerpoint-hymn-song-length-first")
-        song_length_first_image = self.settings.get_setting("powerpoint-hymn-song-length-first-image")
-        song_length_rest = self.settings.get_setting("powerpoint-hymn-song-length-rest")
-
         # Early exit if no powerpoint.
         if not self.powerpoint_presentation:
             print("Error: PowerPoint presentation not initialized.")
@@ -41,57 +35,74 @@ class SermonCreate:
             print("Warning: No hymn text and image found in hymn_data.")
             return
 
-        #local function to get the number of lines in a string
-        def get_number_lines(string):
-            return len(string.split("\n"))
+        template_id = "slide-layout-lied-image" if image else "slide-layout-lied"
+        for slide_number, slide_text in enumerate(self.plan_hymn_slides(hymn_parts, bool(image))):
+            slide = self.add_slide(template_id)
+            template_id = "slide-layout-lied-no-title"
+            if slide_number == 0:
+                # Add title and image (only on the first slide)
+                if title:
+                    self.set_title(slide, title)
+                if image:
+                    self.replace_image_in_placeholder(slide, image)
+
+            # add hymn-parts to slide
+            for placeholder in slide.placeholders:
+                if placeholder.placeholder_format.type == PP_PLACEHOLDER.BODY:
+                    placeholder.text = slide_text
 
-        original_template_id = template_id
+                    # Set content text appearance
+                    for paragraph in placeholder.text_frame.paragraphs:
+                        self.set_text_appearance(paragraph)
+                    # set the text at the top:
+                    placeholder.text_frame.vertical_anchor = MSO_ANCHOR.TOP
+        self.create_empty_slide()
 
-        is_first_slide = True
+    def plan_hymn_slides(self, hymn_parts, has_image):
+        """
+        Divides the parts (verses) of a hymn over slides: a part is added to the current slide as long as
+        the slide has room for it ("powerpoint-hymn-song-length-*" lines), otherwise it starts a new slide.
+        Plans are kept in the hymn library (if there is one), so a hymn that was sung before is not divided again.
 
-        current_song_length = song_length_first
-        current_length = 0
+        Args:
+            hymn_parts (list): The texts of the parts of the hymn.
+            has_image (bool): True if the first slide shows the image of the hymn.
+
+        Returns:
+            list: The text of each slide.
+        """
+        song_length_first = self.settings.get_setting("powerpoint-hymn-song-length-first")
+        song_length_first_image = self.settings.get_setting("powerpoint-hymn-song-length-first-image")
+        song_length_rest = self.settings.get_setting("powerpoint-hymn-song-length-rest")
+        plan_key = f"{song_length_first_image if has_image else song_length_first}-{song_length_rest}"
+        if self.hymn_library is not None:
+            slide_texts = self.hymn_library.get_plan(hymn_parts, plan_key)
+            if slide_texts is not None:
+                return slide_texts
 
-        if image:
-            template_id = template_id + "-image"
-            current_song_length = song_length_first_image
+        #local function to get the number of lines in a string
+        def get_number_lines(string):
+            return len(string.split("\n"))
 
+        slide_texts = []
+        current_song_length = song_length_first_image if has_image else song_length_first
+        current_length = 0
         for hymn_part in hymn_parts:
             # check if new slide is needed
-            if get_number_lines(hymn_part) + current_length > current_song_length or is_first_slide:
-                slide = self.add_slide(template_id)
-                if not is_first_slide:
+            if get_number_lines(hymn_part) + current_length > current_song_length or not slide_texts:
+                if slide_texts:
                     current_song_length = song_length_rest
+                slide_texts.append("")
 
-            # Add title (only on the first slide)
-            if title and is_first_slide:
-                self.set_title(slide, title)
+            if get_number_lines(hymn_part) + current_length > current_song_length:
+                slide_texts[-1] = hymn_part
+            else:
+                slide_texts[-1] = (slide_texts[-1] + "\n\n" + hymn_part).strip()
+            current_length = get_number_lines(slide_texts[-1])
 
-            is_first_slide = False
-            template_id = original_template_id + "-no-title"
-
-            # add image to slide if it exists
-            if image:
-                # Image creation and formatting
-                # self._add_image_to_slide(image, slide)
-                self.replace_image_in_placeholder(slide, image)
-                image = None
-
-            # add hymn-part to slide
-            for i, placeholder in enumerate(slide.placeholders):
-                if placeholder.placeholder_format.type == PP_PLACEHOLDER.BODY:
-                    if get_number_lines(hymn_part) + current_length > current_song_length:
-                        placeholder.text = hymn_part
-                    else:
-                        placeholder.text = (placeholder.text + "\n\n" + hymn_part).strip()
-                    current_length = get_number_lines(placeholder.text)
-
-                    # Set content text appearance
-                    for paragraph in placeholder.text_frame.paragraphs:
-                        self.set_text_appearance(paragraph)
-                    # set the text at the top:
-                    placeholder.text_frame.vertical_anchor = MSO_ANCHOR.TOP
-        self.create_empty_slide()
+        if self.hymn_library is not None:
+            self.hymn_library.put_plan(hymn_parts, plan_key, slide_texts)
+        return slide_texts
 
     def create_reading_slides(self, title, reading_data):
         """
@@ -165,7 +176,8 @@ class SermonCreate:
 
         # Set the content
         outro_data = {"parson":parson, "date":date}
-        outro_template = self.settings.get_setting("powerpoint-outro_template")
+        # a copy, as fill_template_with_data changes the list
+        outro_template = list(self.settings.get_setting("powerpoint-outro_template"))
         fields = ["date", "parson"]
         content_text = "\n".join(self.fill_template_with_data(fields, outro_data, outro_template))
 
@@ -186,7 +198,8 @@ class SermonCreate:
         slide = self.add_slide("slide-layout-offering")
 
         # Set the content
-        offering_template = self.settings.get_setting("powerpoint-offering_template")
+        # a copy, as fill_template_with_data changes the list
+        offering_template = list(self.settings.get_setting("powerpoint-offering_template"))
         fields = ["offering_goal", "bank_account_number"]
         output = self.fill_template_with_data(fields, offering_data, offering_template)
 
@@ -227,7 +240,8 @@ class SermonCreate:
         self.set_title(slide, title_text, extra_layout_func)
 
         performed_piece = ""
-        intro_template = self.settings.get_setting('powerpoint-intro_template')
+        # a copy, as fill_template_with_data changes the list
+        intro_template = list(self.settings.get_setting('powerpoint-intro_template'))
 
         fields = ["date", "parson", "theme", "organist"]
         intro_template = self.fill_template_with_data(fields, intro_data, intro_template)
@@ -0,0 +1,104 @@
+# sermon_document.py
+from collections import namedtuple
+from docx import Document
+
+# A read-only snapshot of one paragraph of the Word document:
+# - index: the position of the paragraph in the document
+# - text: the text of the paragraph
+# - bold: True if the first run of the paragraph is bold (used to recognise titles)
+# - images: a tuple with the bytes of the inline images in the paragraph
+ParagraphView = namedtuple("ParagraphView", ["index", "text", "bold", "images"])
+
+# The result of one extracted section of the document:
+# - tag: the section type (a key of the "tags" setting, e.g. "hymn")
+# - begin: the index of the paragraph with the begin tag
+# - end: the index of the paragraph where scanning continues after the section
+# - data: the extracted data, in the same form as returned by the extract_* methods
+SectionResult = namedtuple("SectionResult", ["tag", "begin", "end", "data"])
+
+# XPath to the image relationship ids of the inline pictures in a paragraph
+IMAGE_EMBED_XPATH = ("./w:r//w:drawing//wp:inline//a:graphic//a:graphicData//pic:pic//pic:blipFill//a:blip"
+                     "/@r:embed")
+
+
+class DocumentView:
+    """
+    An immutable view of a Word document order of service.
+
+    The view is built once from a python-docx Document and holds only plain, read-only data
+    (text, title-formatting and image bytes per paragraph). Extraction functions read from a view
+    and never change it, so one view can be shared by several threads.
+    """
+
+    __slots__ = ("paragraphs", "name")
+
+    def __init__(self, paragraphs, name=None):
+        """
+        Initializes the DocumentView.
+
+        Args:
+            paragraphs (iterable): The ParagraphView objects of the document, in document order.
+            name (str, optional): A name for the document, e.g. the filename. Defaults to None.
+        """
+        object.__setattr__(self, "paragraphs", tuple(paragraphs))
+        object.__setattr__(self, "name", name)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("DocumentView is immutable")
+
+    @classmethod
+    def from_docx(cls, document, name=None):
+        """
+        Creates a view of a loaded Word document.
+
+        Args:
+            document (docx.document.Document): The Word document.
+            name (str, optional): A name for the document, e.g. the filename. Defaults to None.
+
+        Returns:
+            DocumentView: The view of the document.
+        """
+        related_parts = document.part.related_parts
+        paragraphs = []
+        for index, paragraph in enumerate(document.paragraphs):
+            runs = paragraph.runs
+            images = tuple(related_parts[embed].blob for embed in paragraph._p.xpath(IMAGE_EMBED_XPATH))
+            paragraphs.append(ParagraphView(index, paragraph.text, bool(runs and runs[0].bold), images))
+        return cls(paragraphs, name)
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Loads a Word document and creates a view of it.
+
+        Args:
+            filename (str): The path to the .docx file.
+
+        Returns:
+            DocumentView: The view of the document.
+        """
+        return cls.from_docx(Document(filename), filename)
+
+    def slice(self, begin, end):
+        """
+        Returns a view of a part of the document, e.g. one service of a booklet. The paragraphs are numbered
+        from 0 in the new view, so the extraction methods can scan it as a document of its own.
+
+        Args:
+            begin (int): The index of the first paragraph.
+            end (int): The index after the last paragraph.
+
+        Returns:
+            DocumentView: The view of the paragraphs.
+        """
+        return DocumentView((paragraph._replace(index=index)
+                             for index, paragraph in enumerate(self.paragraphs[begin:end])), self.name)
+
+    def __len__(self):
+        return len(self.paragraphs)
+
+    def __getitem__(self, index):
+        return self.paragraphs[index]
+
+    def __iter__(self):
+        return iter(self.paragraphs)
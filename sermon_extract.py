@@ -1,19 +1,160 @@
 # sermon_extract.py
+import hashlib
 import re
 from datetime import datetime
+from .sermon_document import SectionResult
+from .sermon_fields import MONTH_NUMBERS
+
+# The settings that divide the readings over the slides (see read_reading_section)
+READING_SETTINGS = ("powerpoint-reading-max-characters-per-line", "powerpoint-reading-max-lines-per-sheet")
+
+# The settings (or the beginnings of their names) that are read while the Word document is extracted, instead of
+# when the slides are made: the READING_SETTINGS, the labels of the fields ("word-", see FieldScanner) and the tags,
+# hymn library and Bible index of the sermon. A setting the extraction reads must be in this list, or a variant that
+# overrides it gets the extraction of the sermon (see VariantRenderer).
+EXTRACTION_SETTINGS = READING_SETTINGS + ("word-", "tags", "bible-index_filename", "hymn_library-filename")
 
 class SermonExtract:
     """
     Contains the methods for extracting information from the Word document.
+
+    The read_* methods are the stateless extraction API: they take an immutable DocumentView and
+    the index of the paragraph where a section begins, and return the extracted data together with
+    the index where scanning continues. They only read the settings and never change the instance
+    or the document, so one object can extract several documents concurrently (e.g. in a thread pool).
+    The extract_* methods are the stateful wrappers used by process_sermon-style callers: they read
+    from self.current_paragraph_index and move it past the section.
     """
 
+    def iter_sections(self, view, start=0):
+        """
+        Walks through a document view and extracts every section it finds, in document order.
+
+        Args:
+            view (DocumentView): The document to scan.
+            start (int, optional): The index of the paragraph to start scanning. Defaults to 0.
+
+        Yields:
+            SectionResult: The tag, paragraph span and extracted data of each section.
+        """
+        index = start
+        while index < len(view):
+            paragraph = view[index]
+            for tag_type, tag_data in self.tags.items():
+                if tag_data["begin"] in paragraph.text:
+                    begin = index
+                    data, index = self.read_section(view, index, tag_type)
+                    if tag_type == "intro":
+                        # the intro ends on its end tag, continue at the next paragraph
+                        index += 1
+                    yield SectionResult(tag_type, begin, index, data)
+                    if tag_type == "outro":
+                        # the outro is the last section of the service
+                        return
+
+            # continue with the next paragraph if no section was found (or none could be read)
+            if index == paragraph.index:
+                index += 1
+
+    def extract_document(self, view):
+        """
+        Extracts all sections of a document view.
+
+        Args:
+            view (DocumentView): The document to extract.
+
+        Returns:
+            list: A list of SectionResult objects, in document order.
+        """
+        return list(self.iter_sections(view))
+
+    def split_services(self, view):
+        """
+        Splits a document with several services (e.g. a Christmas booklet) at the begin tags of the intros.
+        The paragraphs before the first intro belong to the first service.
+
+        Args:
+            view (DocumentView): The document to split.
+
+        Returns:
+            list: (index of the first paragraph, DocumentView) tuples, one per service.
+        """
+        begin_tag = self.tags["intro"]["begin"]
+        starts = [paragraph.index for paragraph in view if begin_tag in paragraph.text]
+        if not starts:
+            return [(0, view)]
+        starts[0] = 0
+        ends = starts[1:] + [len(view)]
+        return [(begin, view.slice(begin, end)) for begin, end in zip(starts, ends)]
+
+    def extract_services(self, view):
+        """
+        Extracts the sections of every service of a document. Each service is scanned up to its own outro,
+        so the outro of one service does not end the extraction of the next.
+
+        Args:
+            view (DocumentView): The document to extract.
+
+        Returns:
+            list: A list of SectionResult objects per service (with the paragraph indexes of the document),
+                  leaving out parts without sections.
+        """
+        services = []
+        for offset, service_view in self.split_services(view):
+            sections = [section._replace(begin=section.begin + offset, end=section.end + offset)
+                        for section in self.iter_sections(service_view)]
+            if sections:
+                services.append(sections)
+        return services
+
+    def read_section(self, view, start, section_name):
+        """
+        Extracts one section of a document view.
+
+        Args:
+            view (DocumentView): The document to extract from.
+            start (int): The index of the paragraph with the begin tag of the section.
+            section_name (str): The name of the section (a key in self.tags, e.g. "hymn").
+
+        Returns:
+            tuple: (data, end)
+                   data: The extracted data, as returned by the extract_* method of the section.
+                   end (int): The index of the paragraph where scanning continues.
+        """
+        readers = {
+            "hymn": self.read_hymn_section,
+            "offering": self.read_offering_section,
+            "intro": self.read_intro_section,
+            "reading": self.read_reading_section,
+            "outro": self.read_outro_section,
+            "illustration": self.read_illustration,
+        }
+        if section_name not in readers:
+            raise ValueError(f"The section_name should be one of {readers.keys()}, but is {section_name}")
+        return readers[section_name](view, start)
+
+    def _extract_with_reader(self, reader):
+        """
+        Runs a read_* method on the current document at the current paragraph index,
+        and moves the current paragraph index past the section.
+
+        Args:
+            reader (callable): One of the read_* methods.
+
+        Returns:
+            The extracted data of the section.
+        """
+        data, self.current_paragraph_index = reader(self.get_document_view(), self.current_paragraph_index)
+        return data
+
     def extract_hymn_section(self, paragraphs):
         """
         Extracts the hymn section, including title, and all hymns within the section
         (text and images) from a list of paragraphs.
 
         Args:
-            paragraphs (list): A list of paragraphs (docx.paragraph.Paragraph objects).
+            paragraphs (list): A list of paragraphs, starting at the current paragraph index.
+                               Kept for compatibility, the section is read from the document view.
 
         Returns:
             tuple: (title, hymn_data)
@@ -21,6 +162,20 @@ class SermonExtract:
                    hymn_data (list): A list of dictionaries, where each dictionary represents a
                                      hymn and contains its text and image data.
         """
+        return self._extract_with_reader(self.read_hymn_section)
+
+    def read_hymn_section(self, view, start):
+        """
+        Extracts the hymn section that begins at paragraph start (see extract_hymn_section).
+
+        Args:
+            view (DocumentView): The document to extract from.
+            start (int): The index of the paragraph with the begin tag of the section.
+
+        Returns:
+            tuple: ((title, hymn_data), end)
+        """
+        paragraphs = view[start:]
         hymn_data = []
         title = None
         index = -1
@@ -38,22 +193,30 @@ class SermonExtract:
         def add_line_function(paragraph, current_text, _):
             current_text.append(paragraph.text)
 
-        text = self._extract_section_text("hymn", add_image_function=add_image_function,
-                                   add_line_function=add_line_function, outro_data=outro_data).strip()
-        if outro_data["image"]:
-            paragraph_data = {"text": "", "images": [outro_data["image"]]}
+        text, end = self.read_section_text(view, start, "hymn", add_image_function=add_image_function,
+                                           add_line_function=add_line_function, outro_data=outro_data)
+        text = text.strip()
+        image = outro_data["image"]
+        if image:
+            paragraph_data = {"text": "", "images": [image]}
             hymn_data.append(paragraph_data)
 
-        text = self.remove_title_from_text(text, title)
-
-        split_list = self.split_string_list(text.split("\n"))
-        for hymn in split_list:
-            if len(hymn) == 0:
-                continue
-            paragraph_data = {"text": "\n".join(hymn), "images": []}
+        # a hymn that was sung before with the same text is taken from the hymn library
+        image_hash = hashlib.sha256(image).hexdigest() if image else None
+        hymn_parts = None
+        if self.hymn_library is not None:
+            hymn_parts = self.hymn_library.get_parts(title, text, image_hash)
+        if hymn_parts is None:
+            split_list = self.split_string_list(self.remove_title_from_text(text, title).split("\n"))
+            hymn_parts = ["\n".join(hymn) for hymn in split_list if len(hymn) > 0]
+            if self.hymn_library is not None:
+                self.hymn_library.put_parts(title, text, image_hash, hymn_parts)
+
+        for hymn_part in hymn_parts:
+            paragraph_data = {"text": hymn_part, "images": []}
             hymn_data.append(paragraph_data)
 
-        return title, hymn_data
+        return (title, hymn_data), end
 
     def remove_title_from_text(self, text, title):
         """
@@ -95,7 +258,8 @@ class SermonExtract:
         Extracts the offering section (text) from a list of paragraphs.
 
         Args:
-            paragraphs (list): A list of paragraphs (docx.paragraph.Paragraph objects).
+            paragraphs (list): A list of paragraphs, starting at the current paragraph index.
+                               Kept for compatibility, the section is read from the document view.
 
         Returns:
             tuple: (offering_data)
@@ -103,18 +267,46 @@ class SermonExtract:
                                         represents a part of the offering and contains
                                         its text.
         """
+        return self._extract_with_reader(self.read_offering_section)
+
+    def read_offering_section(self, view, start):
+        """
+        Extracts the offering section that begins at paragraph start (see extract_offering_section).
+
+        Args:
+            view (DocumentView): The document to extract from.
+            start (int): The index of the paragraph with the begin tag of the section.
+
+        Returns:
+            tuple: (offering_data, end)
+        """
         print("extract_offering_section")
         def add_line_function(paragraph, current_text, _):
             cleaned_line = re.sub(r' {5,}', '\n', paragraph.text.strip())
 
             current_text.append(cleaned_line)
-        full_text = self. _extract_section_text("offering", add_line_function = add_line_function)
+        full_text, end = self.read_section_text(view, start, "offering", add_line_function = add_line_function)
         offering_goal, bank_account_number = self.extract_bank_account_number(full_text)
         offering_data = {"offering_goal": offering_goal, "bank_account_number": bank_account_number}
-        return offering_data
+        return offering_data, end
 
     def _extract_section_text(self, section_name, add_line_function=None, outro_data=None, add_image_function=None):
         """
+        Extracts text content from a specified section of the current document, starting at
+        self.current_paragraph_index, and moves self.current_paragraph_index to after the section.
+        See read_section_text for the arguments.
+
+        Returns:
+            str: The extracted text of the section.
+        """
+        text, self.current_paragraph_index = self.read_section_text(
+            self.get_document_view(), self.current_paragraph_index, section_name,
+            add_line_function=add_line_function, outro_data=outro_data, add_image_function=add_image_function)
+        return text
+
+    def read_section_text(self, view, start, section_name, add_line_function=None, outro_data=None,
+                          add_image_function=None):
+        """
         Extracts text content from a specified section within the Word document.
 
         This method identifies the start and end of a named section within the
@@ -123,12 +315,14 @@ class SermonExtract:
         text and for handling images found within paragraphs.
 
         Args:
+            view (DocumentView): The document to extract from.
+            start (int): The index of the paragraph where the search for the section starts.
             section_name (str): The name of the section to extract text from (e.g., "offering").
                                  This name should correspond to a key in the `self.tags` dictionary,
                                  which contains the "begin" and "end" tags for the section.
             add_line_function (callable, optional): A function that processes each line of text
                                                      within the section. It takes three arguments:
-                                                     - paragraph (docx.text.paragraph.Paragraph): The current paragraph object.
+                                                     - paragraph (ParagraphView): The current paragraph.
                                                      - current_text (list): The accumulating list of text lines.
                                                      - outro_data: Additional data passed from the caller.
                                                      Defaults to None. If None, no processing is done on the line.
@@ -140,16 +334,15 @@ class SermonExtract:
                                                       Defaults to None. If None, no image processing is done.
 
         Returns:
-            str: A string containing all the extracted text from the section, with each line separated by a newline character (`\n`).
-                 Returns an empty string if the section is not found or contains no text.
+            tuple: (text, end)
+                   text (str): A string containing all the extracted text from the section, with each line separated
+                               by a newline character (`\n`). An empty string if the section is not found or contains no text.
+                   end (int): The index of the paragraph after the section (the paragraph with the end tag, if any).
 
         Raises:
             ValueError: If the `section_name` is not a valid key in `self.tags`.
 
         Attributes:
-            self.word_document (docx.document.Document): The Word document object.
-            self.current_paragraph_index (int): The index of the current paragraph being processed in the document.
-            self.num_paragraphs (int): The total number of paragraphs in the document.
             self.tags (dict): A dictionary containing start and end tags for each section. Each key is a section name,
                               and each value is another dict containing "begin" and "end" keys with their respective tag strings.
         """
@@ -161,10 +354,10 @@ class SermonExtract:
         index = -1  # Used to look ahead through paragraphs (starts at -1 because it increments before first use)
 
         # Iterate through paragraphs until the end of the document is reached
-        while self.current_paragraph_index + index < self.num_paragraphs - 1:
+        while start + index < len(view) - 1:
             index += 1
             # Get the current paragraph to process
-            paragraph = self.word_document.paragraphs[self.current_paragraph_index + index]
+            paragraph = view[start + index]
 
             # Check if the current paragraph is the start of the section
             if self.tags[section_name]["begin"] in paragraph.text:
@@ -172,10 +365,8 @@ class SermonExtract:
                 # get the text after the section-tag
                 t = paragraph.text.split(self.tags[section_name]["begin"])[-1]
                 if t and add_line_function:
-                    # remove the tag from the text
-                    paragraph.text = t
-                    # Process the part of the text after the tag
-                    add_line_function(paragraph, current_text, outro_data)
+                    # Process the part of the text after the tag (the view itself is not changed)
+                    add_line_function(paragraph._replace(text=t), current_text, outro_data)
                 continue  # Move to the next paragraph
 
             # Check if the current paragraph is the end of the section
@@ -201,25 +392,23 @@ class SermonExtract:
                     add_line_function(paragraph, current_text, outro_data)
 
                 new_index = index
-                if add_image_function and self.paragraph_content_contains_image(paragraph):
-                    # Process images in the paragraph with the add_image_function
-                    # Extract and process the image
-                    add_image_function(self.extract_paragraph_content(paragraph)["images"][0], outro_data)
+                if add_image_function and paragraph.images:
+                    # Process the first image in the paragraph with the add_image_function
+                    add_image_function(paragraph.images[0], outro_data)
 
         # Join the lines together into a single text string separated by newlines
         current_text = "\n".join(current_text)
 
-        # Update the current paragraph index to after the end of the section
-        self.current_paragraph_index = self.current_paragraph_index + new_index
-
-        return current_text
+        # The index of the paragraph after the end of the section
+        return current_text, start + new_index
 
     def extract_intro_section(self, paragraphs):
         """
         Extracts the introduction section (date, time, parson, theme, organist) from a list of paragraphs.
 
         Args:
-            paragraphs (list): A list of paragraphs (docx.paragraph.Paragraph objects).
+            paragraphs (list): A list of paragraphs, starting at the current paragraph index.
+                               Kept for compatibility, the section is read from the document view.
 
         Returns:
             dict: A dictionary containing the extracted information:
@@ -231,44 +420,39 @@ class SermonExtract:
                       "organist": "Martin van der Bent"
                   }
         """
+        return self._extract_with_reader(self.read_intro_section)
+
+    def read_intro_section(self, view, start):
+        """
+        Extracts the introduction section that begins at paragraph start (see extract_intro_section).
+
+        Args:
+            view (DocumentView): The document to extract from.
+            start (int): The index of the paragraph with the begin tag of the section.
+
+        Returns:
+            tuple: (intro_data, end)
+        """
         print("extract_intro_section")
         intro_data = {}
-        current_text = []
 
         def add_line_function(paragraph, current_text, _):
             current_text.append(paragraph.text.strip())
-        intro_text = self. _extract_section_text("intro", add_line_function = add_line_function)
-        current_text = intro_text.split("\n")
+        intro_text, end = self.read_section_text(view, start, "intro", add_line_function = add_line_function)
+
+        # Find all fields of the intro in one pass over the text
+        fields = self.field_scanner.scan("intro", intro_text)
 
-        sermon = self.settings.get_setting('word-intro-date_label')
         # Extract date
-        sermon_date_list = [l for l in current_text if sermon in l]
         date_text = "25 december 2024"
-        if len(sermon_date_list) > 0:
-            l2 = sermon_date_list[0].split(sermon)
-            if len(l2) > 1:
-                date_text = l2[1].strip()
-
-        # Convert month names to numbers
-        month_numbers = {
-            "januari": "1",
-            "februari": "2",
-            "maart": "3",
-            "april": "4",
-            "mei": "5",
-            "juni": "6",
-            "juli": "7",
-            "augustus": "8",
-            "september": "9",
-            "oktober": "10",
-            "november": "11",
-            "december": "12",
-        }
+        if "date" in fields:
+            date_text = fields["date"].strip()
 
         intro_data["date"] = date_text
         if date_text:
             day, month_name, year = date_text.split()
-            month_number = month_numbers.get(month_name.lower())
+            # Convert month names to numbers
+            month_number = MONTH_NUMBERS.get(month_name.lower())
             if month_number:
                 numeric_date_str = f"{day} {month_number} {year}"
                 try:
@@ -278,39 +462,32 @@ class SermonExtract:
                     print(f"Error parsing date: {e}")
 
         # Extract time
-        time_match = re.search(r"(\d{1,2}\.\d{2}\suur)", intro_text)
-        if time_match:
-            intro_data["time"] = time_match.group(1)
+        if "time" in fields:
+            intro_data["time"] = fields["time"]
 
         # Extract parson
-        parson_text = self.settings.get_setting("word-intro-parson_text")
-        parson_match = re.search(rf"{parson_text}\s*\n\s*(.+)", intro_text)
-        if parson_match:
-            intro_data["parson"] = parson_match.group(1).strip()
-
-        # Regex to find "Thema:" and capture the text on the following line(s)
-        theme_text = self.settings.get_setting("word-intro-theme_text")
-        theme_match = re.search(rf"{theme_text}\s*“([^“”]+)”", intro_text)
-        if theme_match:
-            theme = theme_match.group(1).strip()
-            intro_data["theme"] = theme
+        if "parson" in fields:
+            intro_data["parson"] = fields["parson"].strip()
+
+        # The theme is the quoted text after "Thema:"
+        if "theme" in fields:
+            intro_data["theme"] = fields["theme"].strip()
 
         # Extract organ-player and performed piece
-        organ_text = self.settings.get_setting("word-intro-organplayer_text")
-        organist_match = re.search(rf"{organ_text}\s+(.+):\s+(.+)", intro_text)
-        if organist_match:
-            intro_data["organist"] = organist_match.group(1).strip()
-            intro_data["performed_piece"] = organist_match.group(2).strip()
+        if "organist" in fields:
+            intro_data["organist"] = fields["organist"].strip()
+            intro_data["performed_piece"] = fields["performed_piece"].strip()
 
         # print(intro_data)
-        return intro_data
+        return intro_data, end
 
     def extract_reading_section(self, paragraphs):
         """
         Extracts the reading section from a list of paragraphs.
 
         Args:
-            paragraphs (list): A list of paragraphs (docx.paragraph.Paragraph objects).
+            paragraphs (list): A list of paragraphs, starting at the current paragraph index.
+                               Kept for compatibility, the section is read from the document view.
 
         Returns:
             tuple: (title, reading_data)
@@ -319,7 +496,21 @@ class SermonExtract:
                                         represents a part of the reading and contains
                                         its text (and potentially images, though they're not expected here).
         """
+        return self._extract_with_reader(self.read_reading_section)
+
+    def read_reading_section(self, view, start):
+        """
+        Extracts the reading section that begins at paragraph start (see extract_reading_section).
+
+        Args:
+            view (DocumentView): The document to extract from.
+            start (int): The index of the paragraph with the begin tag of the section.
+
+        Returns:
+            tuple: ((title, reading_data), end)
+        """
         print("extract_reading_section")
+        paragraphs = view[start:]
         reading_data = []
         title = None
         index = -1
@@ -331,17 +522,22 @@ class SermonExtract:
         def add_line_function(paragraph, current_text, _):
             cleaned_line = re.sub(r' {5,}', '\n', paragraph.text.strip())
             current_text.append(cleaned_line)
-        full_text = self. _extract_section_text("reading", add_line_function = add_line_function).strip()
+        full_text, end = self.read_section_text(view, start, "reading", add_line_function = add_line_function)
+        full_text = full_text.strip()
         # workaround because the title of the reading sometimes is repeated as the first line of the content
         full_text = self.remove_title_from_text(full_text, title).strip()
 
-        max_characters_per_line = self.settings.get_setting("powerpoint-reading-max-characters-per-line")
-        max_lines_per_sheet = self.settings.get_setting("powerpoint-reading-max-lines-per-sheet")
-        parts = self.split_text_for_powerpoint(full_text, max_characters_per_line, max_lines_per_sheet)
+        max_characters_per_line, max_lines_per_sheet = (self.settings.get_setting(key) for key in READING_SETTINGS)
+        # with a Bible index, the text is taken from the index instead of the pasted text
+        verses = self.bible_index.get_verses(title) if self.bible_index is not None and title else None
+        if verses:
+            parts = self.split_verses_for_powerpoint(verses, max_characters_per_line, max_lines_per_sheet)
+        else:
+            parts = self.split_text_for_powerpoint(full_text, max_characters_per_line, max_lines_per_sheet)
         for part in parts:
             reading_data.append({"text": part})
 
-        return title, reading_data
+        return (title, reading_data), end
 
     def split_text_for_powerpoint(self, text, max_line_length=50, max_lines=14):
         """Splits a long text string into chunks that fit into PowerPoint text boxes.
@@ -392,15 +588,60 @@ class SermonExtract:
 
         return text_chunks
 
+    def split_verses_for_powerpoint(self, verses, max_line_length=50, max_lines=14):
+        """Divides Bible verses over PowerPoint text boxes. Every verse starts on a new line, with its number;
+        a text box ends before a verse that does not fit anymore, unless the verse is longer than a whole text box.
+
+        Args:
+            verses (list): (verse number, text) tuples, see BibleIndex.get_verses.
+            max_line_length (int, optional): The maximum number of characters per line. Defaults to 50.
+            max_lines (int, optional): The maximum number of lines per text box. Defaults to 14.
+
+        Returns:
+            list: A list of strings, where each string is a text chunk that fits in a PowerPoint text box.
+        """
+        text_chunks = []
+        current_chunk_lines = []
+        for number, text in verses:
+            verse_lines = []
+            for chunk in self.split_text_for_powerpoint(f"{number} {text}", max_line_length, max_lines):
+                verse_lines.extend(chunk.split("\n"))
+            if current_chunk_lines and len(current_chunk_lines) + len(verse_lines) > max_lines \
+                    and len(verse_lines) <= max_lines:
+                text_chunks.append("\n".join(current_chunk_lines))
+                current_chunk_lines = []
+            for line in verse_lines:
+                if len(current_chunk_lines) == max_lines:
+                    text_chunks.append("\n".join(current_chunk_lines))
+                    current_chunk_lines = []
+                current_chunk_lines.append(line)
+        if current_chunk_lines:
+            text_chunks.append("\n".join(current_chunk_lines))
+        return text_chunks
+
     def extract_illustration(self, paragraphs):
         """
         Extracts the illustration from the given paragraphs.
 
         Args:
-            paragraphs (list): A list of paragraphs (docx.paragraph.Paragraph objects).
+            paragraphs (list): A list of paragraphs, starting at the current paragraph index.
+                               Kept for compatibility, the section is read from the document view.
+
+        Returns:
+            bytes: The image data, or None if no illustration is found.
+        """
+        return self._extract_with_reader(self.read_illustration)
+
+    def read_illustration(self, view, start):
+        """
+        Extracts the illustration that begins at paragraph start (see extract_illustration).
+
+        Args:
+            view (DocumentView): The document to extract from.
+            start (int): The index of the paragraph with the begin tag of the section.
 
         Returns:
-            tuple: (image_data, image_content_type) or (None, None) if no illustration is found.
+            tuple: (image_data, end)
         """
         print("extract_illustration")
 
@@ -410,8 +651,9 @@ class SermonExtract:
         def add_image_function(image, outro_data):
             outro_data["image"] = image
 
-        self._extract_section_text("illustration", add_image_function=add_image_function, outro_data=outro_data)
-        return outro_data["image"]
+        _, end = self.read_section_text(view, start, "illustration", add_image_function=add_image_function,
+                                        outro_data=outro_data)
+        return outro_data["image"], end
 
 
     def extract_outro_section(self, paragraphs):
@@ -419,10 +661,27 @@ class SermonExtract:
         Extracts the date and parson from the outro section.
 
         Args:
-            paragraphs (list): A list of paragraphs (docx.paragraph.Paragraph objects).
+            paragraphs (list): A list of paragraphs, starting at the current paragraph index.
+                               Kept for compatibility, the section is read from the document view.
+
+        Returns:
+            tuple: (date, parson, performed_piece), with empty strings for the values that are not found.
+        """
+        outro = self._extract_with_reader(self.read_outro_section)
+        #make sure the program will end here
+        self.current_paragraph_index = 200000
+        return outro
+
+    def read_outro_section(self, view, start):
+        """
+        Extracts the outro section that begins at paragraph start (see extract_outro_section).
+
+        Args:
+            view (DocumentView): The document to extract from.
+            start (int): The index of the paragraph with the begin tag of the section.
 
         Returns:
-            tuple: (date, parson) or (None, None) if not found.
+            tuple: ((date, parson, performed_piece), end)
         """
         print("extract_outro_section")
         current_text = []
@@ -432,19 +691,15 @@ class SermonExtract:
             "date_text": "",
             "parson": "",
             "performed_piece": "",
-            "previous_line_is_sermon": False,
-            "organ_text": self.settings.get_setting("word-outro-organ_text"),
-            "next_sermon_text": self.settings.get_setting("word-outro-next_sermon_text")
+            "previous_line_is_sermon": False
         }
 
         # define the function, that will use the closure that is defined in the lines above
         def add_line_function(paragraph, _, outro_data):
-            if outro_data["organ_text"] in paragraph.text:
-                organ_text = outro_data["organ_text"]
-                performed_piece_match = re.search(rf"{organ_text}\s*(.+)", paragraph.text.strip()) # use f-string
-                if performed_piece_match:
-                    outro_data["performed_piece"] = performed_piece_match.group(1).strip()
-            if outro_data["next_sermon_text"].lower() in paragraph.text.lower():
+            fields = self.field_scanner.scan("outro", paragraph.text)
+            if "performed_piece" in fields:
+                outro_data["performed_piece"] = fields["performed_piece"].strip()
+            if "next_sermon" in fields:
                 outro_data["previous_line_is_sermon"] = True
                 return
 
@@ -457,11 +712,9 @@ class SermonExtract:
                     date_text1 = self.format_date(date_text1)
                     outro_data["date_text"] = date_text1
                     outro_data["parson"] = parson1
-        self._extract_section_text("outro", add_line_function = add_line_function, outro_data = outro_data)
-        #make sure the program will end here
-        self.current_paragraph_index = 200000
+        _, end = self.read_section_text(view, start, "outro", add_line_function = add_line_function, outro_data = outro_data)
 
-        return outro_data["date_text"], outro_data["parson"], outro_data["performed_piece"]
+        return (outro_data["date_text"], outro_data["parson"], outro_data["performed_piece"]), end
 
     def extract_bank_account_number(self, text):
         """
@@ -475,30 +728,22 @@ class SermonExtract:
         """
         bank_account_number = ""
         offering_goal = ""
-        # Split the text at the "blauwe zak"
-        blue_bag_text = self.settings.get_setting("word-offering-blue_bag_text")
-        parts = text.split(blue_bag_text)
-        first_part_of_offering_text = parts[0]
+        # Find all fields of the offering in one pass over the text
+        fields = self.field_scanner.scan("offering", text)
 
-        # Regex to find the bank account number (IBAN) in the first part
-        bank_account_regex = "([A-Z]{2}\d{2}\s[A-Z]{4}\s\d{4}\s\d{4}\s\d{2})"
-        bank_number_match = re.search(bank_account_regex, first_part_of_offering_text)
-        if bank_number_match:
-            bank_account_number = bank_number_match.group(1).strip()
+        # The bank account number (IBAN) belongs to the first offering: it is only used if it is before the "blauwe zak"
+        if "bank_account_number" in fields and ("blue_bag" not in fields or
+                                                fields.positions["bank_account_number"] < fields.positions["blue_bag"]):
+            bank_account_number = fields["bank_account_number"].strip()
 
         # Clean the bank account number
         bank_account_number = re.sub(r"[^a-zA-Z0-9]", " ", bank_account_number)  # Replace non-alphanumeric with space
         bank_account_number = re.sub(r"\s{2,}", " ", bank_account_number)  # Replace multiple spaces with one
         bank_account_number = bank_account_number.strip()
 
-        # Regex to find offering goal (text after "1ste (rode zak) Diaconie:")
-        red_bag_text = self.settings.get_setting("word-offering-red_bag_text")
-        diaconie_text = self.settings.get_setting("word-offering-diaconie_text")
-
-        offering_goal_regex = fr"1ste \({red_bag_text}\)\s*{diaconie_text}\s*(.*?)(?=\n|$)"
-        goal_match = re.search(offering_goal_regex, text)
-        if goal_match:
-            offering_goal = goal_match.group(1).strip()
+        # The offering goal is the text after "1ste (rode zak) Diaconie:"
+        if "offering_goal" in fields:
+            offering_goal = fields["offering_goal"].strip()
         return offering_goal, bank_account_number
 
 
@@ -0,0 +1,122 @@
+# sermon_fields.py
+import re
+
+# Dutch month names and their numbers, used to parse the date of the service
+MONTH_NUMBERS = {
+    "januari": "1",
+    "februari": "2",
+    "maart": "3",
+    "april": "4",
+    "mei": "5",
+    "juni": "6",
+    "juli": "7",
+    "augustus": "8",
+    "september": "9",
+    "oktober": "10",
+    "november": "11",
+    "december": "12",
+}
+
+# Regex to find a bank account number (IBAN), e.g. "NL35 TRIO 0788 9579 29"
+BANK_ACCOUNT_REGEX = r"[A-Z]{2}\d{2}\s[A-Z]{4}\s\d{4}\s\d{4}\s\d{2}"
+
+
+class FieldMatches(dict):
+    """
+    The values of the fields found by a FieldScanner (field name -> text),
+    with the start position of each field in the scanned text.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.positions = {}
+
+
+class FieldScanner:
+    """
+    Finds all labelled fields of the intro, offering and outro sections with one call per section.
+
+    The label patterns from settings.json are formatted and compiled once, when the scanner is created,
+    instead of on every extraction. Every field keeps its own compiled regex: the regex engine can then
+    skip through the text with the literal label prefix of the field, which measures faster than one
+    alternation of all fields (see sermon_benchmark.py).
+    """
+
+    def __init__(self, settings):
+        """
+        Initializes the FieldScanner and compiles the patterns of all sections.
+
+        Args:
+            settings (Settings): The settings with the labels of the fields.
+        """
+        # section name -> list of (the compiled regex of a field, the names of its value groups)
+        self.patterns = {}
+        for section_name, fields in self.get_field_patterns(settings).items():
+            self.patterns[section_name] = []
+            for pattern in fields.values():
+                compiled = re.compile(pattern)
+                self.patterns[section_name].append((compiled, tuple(compiled.groupindex)))
+
+    def get_field_patterns(self, settings):
+        """
+        Returns the regex of every field, per section. Each regex has one or more named groups
+        that capture the values of the field.
+
+        The labels that the extraction code has always used as regex fragments (parson, theme,
+        organist, offering texts, outro organ text) are inserted as-is; the labels that were
+        matched as plain text (date label, "blauwe zak", next service) are escaped.
+
+        Args:
+            settings (Settings): The settings with the labels of the fields.
+
+        Returns:
+            dict: section name -> {field name: regex string}.
+        """
+        date_label = re.escape(settings.get_setting("word-intro-date_label"))
+        parson_text = settings.get_setting("word-intro-parson_text")
+        theme_text = settings.get_setting("word-intro-theme_text")
+        organ_player_text = settings.get_setting("word-intro-organplayer_text")
+        blue_bag_text = re.escape(settings.get_setting("word-offering-blue_bag_text"))
+        red_bag_text = settings.get_setting("word-offering-red_bag_text")
+        diaconie_text = settings.get_setting("word-offering-diaconie_text")
+        organ_text = settings.get_setting("word-outro-organ_text")
+        next_sermon_text = re.escape(settings.get_setting("word-outro-next_sermon_text"))
+
+        return {
+            "intro": {
+                "date": rf"{date_label}(?P<date>[^\n]*)",
+                "time": r"(?P<time>\d{1,2}\.\d{2}\suur)",
+                "parson": rf"{parson_text}\s*\n\s*(?P<parson>.+)",
+                "theme": rf"{theme_text}\s*“(?P<theme>[^“”]+)”",
+                "organist": rf"{organ_player_text}\s+(?P<organist>.+):\s+(?P<performed_piece>.+)",
+            },
+            "offering": {
+                "bank_account_number": rf"(?P<bank_account_number>{BANK_ACCOUNT_REGEX})",
+                "blue_bag": rf"(?P<blue_bag>{blue_bag_text})",
+                "offering_goal": rf"1ste \({red_bag_text}\)\s*{diaconie_text}\s*(?P<offering_goal>.*?)(?=\n|$)",
+            },
+            "outro": {
+                "performed_piece": rf"{organ_text}\s*(?P<performed_piece>.+)",
+                "next_sermon": rf"(?P<next_sermon>(?i:{next_sermon_text}))",
+            },
+        }
+
+    def scan(self, section_name, text):
+        """
+        Finds the first occurrence of every field of a section in the text.
+
+        Args:
+            section_name (str): The section whose fields are searched ("intro", "offering" or "outro").
+            text (str): The text of the section.
+
+        Returns:
+            FieldMatches: The values of the fields that were found (value group name -> text).
+        """
+        fields = FieldMatches()
+        for pattern, value_groups in self.patterns[section_name]:
+            match = pattern.search(text)
+            if match:
+                for group in value_groups:
+                    fields[group] = match.group(group)
+                    fields.positions[group] = match.start(group)
+        return fields
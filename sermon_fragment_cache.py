@@ -0,0 +1,226 @@
+# sermon_fragment_cache.py
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from .sermon_slide_snapshot import SlideSnapshot
+
+# Changes when the way slides are rendered (or stored) changes, so older cache entries are not used anymore
+CACHE_VERSION = 2
+
+# The name of the layouts and relationships of the slides in a cache entry on disk
+ENTRY_FILENAME = "entry.json"
+
+
+class FragmentCache:
+    """
+    Keeps the rendered slides of sections (as SlideSnapshot lists), so a section that did not change
+    since an earlier run is copied into the presentation instead of rendered again.
+
+    The key of a section is the SHA-256 of its tag and content (images by their SHA-256), of all
+    settings and of the template file. The cache has a part in memory and (optionally) a folder on disk,
+    each limited in size; the least recently used entries are removed first. The folder can be shared, so an
+    entry on disk holds only data (see write_entry): reading it never runs code.
+    """
+
+    def __init__(self, settings, template_filename, directory=None):
+        """
+        Initializes the FragmentCache.
+
+        Args:
+            settings (Settings): The settings (part of the key, and the size limits).
+            template_filename (str): The PowerPoint template (part of the key).
+            directory (str, optional): The folder of the cache on disk. Defaults to None (only in memory).
+        """
+        self.directory = directory
+        self.memory_limit = settings.get_setting("fragment_cache-memory_bytes", 64 * 1024 * 1024)
+        self.disk_limit = settings.get_setting("fragment_cache-disk_bytes", 512 * 1024 * 1024)
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.lock = threading.Lock()
+
+        style_hash = hashlib.sha256(json.dumps(settings.settings, sort_keys=True).encode("utf-8"))
+        with open(template_filename, "rb") as file:
+            style_hash.update(hashlib.sha256(file.read()).digest())
+        self.style_hash = style_hash.hexdigest()
+
+    def get_key(self, section):
+        """
+        Returns the key of a section.
+
+        Args:
+            section (SectionResult): The extracted section.
+
+        Returns:
+            str: The key (a SHA-256 as hexadecimal digits).
+        """
+        def encode_bytes(value):
+            if isinstance(value, bytes):
+                return hashlib.sha256(value).hexdigest()
+            raise TypeError(f"Cannot encode {type(value)} in a fragment cache key")
+
+        content = json.dumps([CACHE_VERSION, self.style_hash, section.tag, section.data],
+                             default=encode_bytes, sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_size(snapshots):
+        """
+        Returns the (approximate) size of a cache entry.
+
+        Args:
+            snapshots (list): The SlideSnapshot objects.
+
+        Returns:
+            int: The size in bytes.
+        """
+        return sum(len(snapshot.xml) + sum(len(target) for _, _, _, target in snapshot.relationships)
+                   for snapshot in snapshots)
+
+    @staticmethod
+    def write_entry(file, snapshots):
+        """
+        Writes a cache entry as a ZIP archive of data only: the XML of each slide ("slide1.xml", ...), the images
+        by their SHA-256 ("media/...") and ENTRY_FILENAME, the JSON list of the layout and relationships of each slide.
+
+        Args:
+            file: The binary file to write to.
+            snapshots (list): The SlideSnapshot objects.
+        """
+        slides = []
+        image_names = set()
+        with zipfile.ZipFile(file, "w", zipfile.ZIP_STORED) as archive:
+            for number, snapshot in enumerate(snapshots, start=1):
+                xml_name = f"slide{number}.xml"
+                archive.writestr(xml_name, snapshot.xml)
+                relationships = []
+                for rId, reltype, is_external, target in snapshot.relationships:
+                    if not is_external:
+                        image_name = f"media/{hashlib.sha256(target).hexdigest()}"
+                        if image_name not in image_names:
+                            archive.writestr(image_name, target)
+                            image_names.add(image_name)
+                        target = image_name
+                    relationships.append([rId, reltype, is_external, target])
+                slides.append({"xml": xml_name, "layout": snapshot.layout, "relationships": relationships})
+            archive.writestr(ENTRY_FILENAME, json.dumps({"version": CACHE_VERSION, "slides": slides}))
+
+    @staticmethod
+    def read_entry(file):
+        """
+        Reads a cache entry written by write_entry.
+
+        Args:
+            file: The binary file to read from.
+
+        Returns:
+            list: The SlideSnapshot objects.
+
+        Raises:
+            ValueError: If the entry is not a cache entry of this CACHE_VERSION.
+        """
+        snapshots = []
+        with zipfile.ZipFile(file) as archive:
+            entry = json.loads(archive.read(ENTRY_FILENAME))
+            if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION:
+                raise ValueError("Not a fragment cache entry of this version")
+            for slide in entry["slides"]:
+                relationships = []
+                for rId, reltype, is_external, target in slide["relationships"]:
+                    if is_external:
+                        relationships.append((str(rId), str(reltype), True, str(target)))
+                    else:
+                        relationships.append((str(rId), str(reltype), False, archive.read(target)))
+                layout = tuple(slide["layout"]) if slide["layout"] is not None else None
+                snapshots.append(SlideSnapshot(archive.read(slide["xml"]), layout, tuple(relationships)))
+        return snapshots
+
+    def get(self, key):
+        """
+        Returns the rendered slides of a section.
+
+        Args:
+            key (str): The key of the section.
+
+        Returns:
+            list: The SlideSnapshot objects, or None if the section is not in the cache.
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        if self.directory:
+            path = os.path.join(self.directory, key)
+            try:
+                with open(path, "rb") as file:
+                    snapshots = self.read_entry(file)
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                print(f"An error occurred while reading the fragment cache: {e}")
+                return None
+            os.utime(path)  # the modification time is the last use
+            self.put_in_memory(key, snapshots)
+            return snapshots
+        return None
+
+    def put(self, key, snapshots):
+        """
+        Adds the rendered slides of a section to the cache.
+
+        Args:
+            key (str): The key of the section.
+            snapshots (list): The SlideSnapshot objects of the slides of the section.
+        """
+        self.put_in_memory(key, snapshots)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, key)
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as file:
+                self.write_entry(file, snapshots)
+            os.replace(temporary_path, path)
+            self.limit_disk_size()
+
+    def put_in_memory(self, key, snapshots):
+        """
+        Adds an entry to the memory part of the cache, and removes the least recently used entries
+        while the memory part is too large.
+
+        Args:
+            key (str): The key of the section.
+            snapshots (list): The SlideSnapshot objects.
+        """
+        with self.lock:
+            if key in self.memory:
+                return
+            self.memory[key] = snapshots
+            self.memory_size += self.get_size(snapshots)
+            while self.memory_size > self.memory_limit and len(self.memory) > 1:
+                _, removed = self.memory.popitem(last=False)
+                self.memory_size -= self.get_size(removed)
+
+    def limit_disk_size(self):
+        """
+        Removes the least recently used entries from the disk part of the cache while it is too large.
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".tmp"):
+                continue
+            try:
+                status = os.stat(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                continue  # removed by another process
+            entries.append((status.st_mtime, status.st_size, filename))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_size <= self.disk_limit:
+                break
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+            total_size -= size
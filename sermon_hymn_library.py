@@ -0,0 +1,167 @@
+# sermon_hymn_library.py
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+
+# "Psalm 123, vers 1 en 2" -> ("Psalm 123", "1 en 2")
+HYMN_TITLE_REGEX = re.compile(r"^(.*?)[\s,:]*\b(?:verzen|vers|vs\.?|v\.)\s*(.*)$", re.IGNORECASE | re.DOTALL)
+# A verse number or a range of verses ("1", "3-5")
+VERSE_REGEX = re.compile(r"\d+(?:\s*-\s*\d+)?")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hymns (
+    name TEXT NOT NULL,
+    verses TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    title TEXT,
+    parts TEXT NOT NULL,
+    line_counts TEXT NOT NULL,
+    image_hash TEXT,
+    uses INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (name, verses, text_hash)
+);
+CREATE TABLE IF NOT EXISTS plans (
+    parts_hash TEXT NOT NULL,
+    plan_key TEXT NOT NULL,
+    slide_texts TEXT NOT NULL,
+    PRIMARY KEY (parts_hash, plan_key)
+);
+"""
+
+
+class HymnLibrary:
+    """
+    A SQLite database of the hymns of earlier services.
+
+    A hymn is stored by its normalised title ("psalm 123" and verses "1,2") and the SHA-256 of its
+    text and image, with its parts (verses, as split by split_string_list), their line counts and the
+    SHA-256 of its stave image. The division of the parts over slides is stored by the SHA-256 of the
+    parts and the slide lengths. The library is filled while services are processed: when a hymn is
+    sung again with the same text, its parts and slides are looked up instead of computed.
+
+    One connection is shared by the threads of a Sermon (the pipeline extracts in another thread).
+    """
+
+    def __init__(self, filename):
+        """
+        Initializes the HymnLibrary, and creates the database if needed.
+
+        Args:
+            filename (str): The path of the SQLite database.
+        """
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    @staticmethod
+    def normalise_title(title):
+        """
+        Returns the key of a hymn title: the name of the hymn and its verses.
+
+        Args:
+            title (str): The title of the hymn, e.g. "Psalm 123, vers 1 en 2".
+
+        Returns:
+            tuple: (name, verses), e.g. ("psalm 123", "1,2").
+        """
+        title = " ".join((title or "").split())
+        match = HYMN_TITLE_REGEX.match(title)
+        name, verses = (match.group(1), match.group(2)) if match else (title, "")
+        verse_numbers = [re.sub(r"\s", "", verse) for verse in VERSE_REGEX.findall(verses)]
+        return name.strip(" ,:").lower(), ",".join(verse_numbers)
+
+    @staticmethod
+    def get_hash(*texts):
+        """
+        Returns the SHA-256 of some texts.
+
+        Args:
+            *texts (str): The texts.
+
+        Returns:
+            str: The SHA-256, as hexadecimal digits.
+        """
+        return hashlib.sha256("\0".join(texts).encode("utf-8")).hexdigest()
+
+    def get_parts(self, title, text, image_hash=None):
+        """
+        Returns the parts of a known hymn with the same title, text and image.
+
+        Args:
+            title (str): The title of the hymn.
+            text (str): The text of the hymn, as read from the document.
+            image_hash (str, optional): The SHA-256 of the stave image. Defaults to None.
+
+        Returns:
+            list: The texts of the parts, or None if the hymn is not in the library.
+        """
+        name, verses = self.normalise_title(title)
+        key = (name, verses, self.get_hash(text, image_hash or ""))
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT parts FROM hymns WHERE name = ? AND verses = ? AND text_hash = ?", key).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE hymns SET uses = uses + 1 WHERE name = ? AND verses = ? AND text_hash = ?", key)
+        return json.loads(row[0])
+
+    def put_parts(self, title, text, image_hash, parts):
+        """
+        Adds a hymn to the library.
+
+        Args:
+            title (str): The title of the hymn.
+            text (str): The text of the hymn, as read from the document.
+            image_hash (str): The SHA-256 of the stave image, or None.
+            parts (list): The texts of the parts of the hymn.
+        """
+        name, verses = self.normalise_title(title)
+        line_counts = [len(part.split("\n")) for part in parts]
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO hymns (name, verses, text_hash, title, parts, line_counts, image_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, verses, self.get_hash(text, image_hash or ""), title, json.dumps(parts),
+                 json.dumps(line_counts), image_hash))
+
+    def get_plan(self, parts, plan_key):
+        """
+        Returns the division of the parts of a hymn over slides, if it is known.
+
+        Args:
+            parts (list): The texts of the parts of the hymn.
+            plan_key (str): The slide lengths the division was made for.
+
+        Returns:
+            list: The text of each slide, or None if the division is not known.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT slide_texts FROM plans WHERE parts_hash = ? AND plan_key = ?",
+                (self.get_hash(*parts), plan_key)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put_plan(self, parts, plan_key, slide_texts):
+        """
+        Stores the division of the parts of a hymn over slides.
+
+        Args:
+            parts (list): The texts of the parts of the hymn.
+            plan_key (str): The slide lengths the division was made for.
+            slide_texts (list): The text of each slide.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO plans (parts_hash, plan_key, slide_texts) VALUES (?, ?, ?)",
+                (self.get_hash(*parts), plan_key, json.dumps(slide_texts)))
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self.connection.close()
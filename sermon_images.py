@@ -0,0 +1,165 @@
+# sermon_images.py
+import hashlib
+import io
+from PIL import Image
+from .sermon_document import SectionResult
+
+
+class ImageOptimiser:
+    """
+    Downscales the images from the Word document to the resolution they need on the slides.
+
+    Images (e.g. scans of hymn staves) are often much larger than the box they are shown in.
+    An image is only replaced when it has more pixels than needed at the "image-max_dpi" setting
+    for its box ("<setting_id>-image_width" and "<setting_id>-image_height", in inches),
+    and when the result is smaller than the original. The optimiser has no state besides the settings
+    (and the media store), so it can be used from several threads.
+
+    With a MediaStore, the optimised version of each image is kept in the store, and an image that was
+    optimised before (for the same box and resolution, in any document) is taken from there. Without
+    optimisation the images are kept in (and taken from) the store as they are, as the "original" variant.
+    Optimisers can also share a results dictionary (e.g. the variants of one presentation), so an image
+    is optimised once for every box size.
+    """
+
+    def __init__(self, settings, media_store=None, results=None):
+        """
+        Initializes the ImageOptimiser.
+
+        Args:
+            settings (Settings): The settings with the image sizes and the maximum resolution.
+            media_store (MediaStore, optional): The store of optimised images. Defaults to None.
+            results (dict, optional): The optimised images, by SHA-256 of the image and box size, shared
+                                      with other optimisers. Defaults to None.
+        """
+        self.settings = settings
+        # The maximum resolution of the images on the slides, 0 (or missing) disables the optimisation
+        self.max_dpi = settings.get_setting("image-max_dpi", 0)
+        self.media_store = media_store
+        self.results = results
+
+    def optimise(self, image_data, setting_id="hymn"):
+        """
+        Returns the image data, downscaled if the image is larger than needed.
+
+        Args:
+            image_data (bytes): The image data in bytes.
+            setting_id (str, optional): The prefix of the image size settings ("hymn" or "illustration"). Defaults to "hymn".
+
+        Returns:
+            bytes: The optimised image data, or the original image data if it cannot be made smaller.
+        """
+        if not image_data:
+            return image_data
+        if not self.max_dpi:
+            if self.media_store is None:
+                return image_data
+            return self.get_stored(image_data, "original", lambda: image_data)
+        box_width = self.settings.get_setting(setting_id + "-image_width") * self.max_dpi
+        box_height = self.settings.get_setting(setting_id + "-image_height") * self.max_dpi
+        variant = f"{round(box_width)}x{round(box_height)}"
+        if self.results is None:
+            return self.optimise_for_box(image_data, box_width, box_height, variant)
+        key = (hashlib.sha256(image_data).digest(), variant)
+        if key not in self.results:
+            self.results[key] = self.optimise_for_box(image_data, box_width, box_height, variant)
+        return self.results[key]
+
+    def optimise_for_box(self, image_data, box_width, box_height, variant):
+        """
+        Returns the image data, downscaled for a box: taken from the media store (if there is one),
+        or resized (and added to the store).
+
+        Args:
+            image_data (bytes): The image data in bytes.
+            box_width (float): The width of the box in pixels.
+            box_height (float): The height of the box in pixels.
+            variant (str): The name of the box size, e.g. "1200x900".
+
+        Returns:
+            bytes: The optimised image data, or the original image data if it cannot be made smaller.
+        """
+        if self.media_store is None:
+            return self.resize(image_data, box_width, box_height)
+        return self.get_stored(image_data, variant, lambda: self.resize(image_data, box_width, box_height))
+
+    def get_stored(self, image_data, variant, make_variant):
+        """
+        Returns a variant of an image from the media store, and makes it (and adds it to the store) if it is not
+        there yet.
+
+        Args:
+            image_data (bytes): The image data in bytes.
+            variant (str): The name of the variant, e.g. "1200x900".
+            make_variant (callable): Returns the data of the variant.
+
+        Returns:
+            bytes: The data of the variant.
+        """
+        source_digest = self.media_store.get_digest(image_data)
+        digest = self.media_store.get_variant(source_digest, variant)
+        if digest is not None:
+            variant_data = self.media_store.get(digest)
+            if variant_data is not None:
+                return variant_data
+        variant_data = make_variant()
+        self.media_store.set_variant(source_digest, variant, self.media_store.put(variant_data))
+        return variant_data
+
+    def resize(self, image_data, box_width, box_height):
+        """
+        Returns the image data, downscaled to the smallest size that still covers a box.
+
+        Args:
+            image_data (bytes): The image data in bytes.
+            box_width (float): The width of the box in pixels.
+            box_height (float): The height of the box in pixels.
+
+        Returns:
+            bytes: The downscaled image data, or the original image data if it cannot be made smaller.
+        """
+        try:
+            with Image.open(io.BytesIO(image_data)) as image:
+                image_format = image.format
+                if image_format not in ("PNG", "JPEG"):
+                    return image_data
+                # The image must still cover the box (a picture placeholder crops the image to fill it)
+                scale = max(box_width / image.width, box_height / image.height)
+                if scale >= 1:
+                    return image_data
+                if image.mode in ("P", "1"):
+                    # palette images can only be resized with nearest-neighbour, so convert them first
+                    image = image.convert("RGBA")
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                resized = image.resize(size, Image.LANCZOS)
+
+                output = io.BytesIO()
+                if image_format == "JPEG":
+                    resized.save(output, format="JPEG", quality=90, optimize=True)
+                else:
+                    resized.save(output, format="PNG", optimize=True)
+        except Exception as e:
+            print(f"An error occurred while optimising an image: {e}")
+            return image_data
+
+        optimised_data = output.getvalue()
+        return optimised_data if len(optimised_data) < len(image_data) else image_data
+
+    def optimise_section(self, section):
+        """
+        Returns a copy of an extracted section with optimised images. The section itself is not changed.
+
+        Args:
+            section (SectionResult): The extracted section.
+
+        Returns:
+            SectionResult: The section with optimised images.
+        """
+        if section.tag == "hymn":
+            title, hymn_data = section.data
+            hymn_data = [dict(part, images=[self.optimise(image, "hymn") for image in part["images"]])
+                         for part in hymn_data]
+            return SectionResult(section.tag, section.begin, section.end, (title, hymn_data))
+        if section.tag == "illustration":
+            return SectionResult(section.tag, section.begin, section.end, self.optimise(section.data, "illustration"))
+        return section
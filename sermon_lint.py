@@ -0,0 +1,410 @@
+# sermon_lint.py
+from collections import namedtuple
+from datetime import datetime
+from .sermon_bible import BibleIndex
+from .sermon_document import DocumentView
+from .sermon_fields import FieldScanner, MONTH_NUMBERS
+
+# The levels of a problem: an error stops the rendering or loses content, a warning gives an incomplete slide
+ERROR = "error"
+WARNING = "warning"
+
+# A problem found in a document:
+# - level: ERROR or WARNING
+# - paragraph: the number of the paragraph, from 1 (None for the whole document)
+# - message: the description of the problem
+LintProblem = namedtuple("LintProblem", ["level", "paragraph", "message"])
+
+
+class DocumentLinter:
+    """
+    Checks the structure of a Word document order of service without rendering it.
+
+    The linter scans the paragraphs once and finds the sections and their spans in the same way as the
+    extraction (see SermonExtract.iter_sections and read_section_text), and checks what makes the rendering
+    stop or lose content: missing end tags, sections inside other sections, readings and hymns without a bold
+    title, a date that cannot be read, a missing bank account number, and so on. It only needs the text of
+    the document: the template and python-pptx are not loaded.
+    """
+
+    def __init__(self, settings):
+        """
+        Initializes the DocumentLinter.
+
+        Args:
+            settings (Settings): The settings with the tags and the labels of the fields.
+        """
+        self.settings = settings
+        self.tags = settings.get_tags()
+        self.field_scanner = FieldScanner(settings)
+        # the titles of the readings are checked against the Bible index only if one is configured
+        self.check_references = bool(settings.get_setting("bible-index_filename", ""))
+
+    def get_begin_tag(self, paragraph):
+        """
+        Returns the section that begins in a paragraph.
+
+        Args:
+            paragraph (ParagraphView): The paragraph.
+
+        Returns:
+            str: The section (a key of the tags, e.g. "hymn"), or None.
+        """
+        for tag_type, tag_data in self.tags.items():
+            if tag_data["begin"] in paragraph.text:
+                return tag_type
+        return None
+
+    def has_end_tag(self, tag_type, paragraph):
+        """
+        Checks if a paragraph ends a section (see SermonUtils.check_end_tag).
+
+        Args:
+            tag_type (str): The section, e.g. "hymn".
+            paragraph (ParagraphView): The paragraph.
+
+        Returns:
+            bool: True if one of the end tags of the section is in the paragraph.
+        """
+        text = paragraph.text.lower()
+        return any(end_tag.lower() in text for end_tag in self.tags[tag_type]["end"])
+
+    def lint(self, view, booklet=False):
+        """
+        Checks a document.
+
+        Args:
+            view (DocumentView): The document.
+            booklet (bool, optional): If True, the document may have several services (see BookletRenderer).
+                                      Defaults to False.
+
+        Returns:
+            list: The problems (LintProblem objects), in document order.
+        """
+        problems = []
+        found = set()
+        outro = None
+        # the indexes of the sections after the outro, which are not rendered
+        ignored = []
+        index = 0
+        while index < len(view):
+            tag_type = self.get_begin_tag(view[index])
+            if tag_type is None:
+                index += 1
+                continue
+            if booklet and tag_type == "intro":
+                outro = None
+            if outro is not None and not ignored:
+                problems.append(LintProblem(WARNING, index + 1, f"The sections after the outro (paragraph {outro + 1}) "
+                                                                f"are not rendered. Several services are rendered "
+                                                                f"with --booklet."))
+            if outro is not None:
+                ignored.append(index)
+            found.add(tag_type)
+            end = self.lint_section(view, index, tag_type, problems)
+            if tag_type == "outro" and outro is None:
+                outro = index
+            # the intro ends on its end tag, the other sections continue at their end tag (see iter_sections)
+            index = end + 1 if tag_type == "intro" else max(end, index + 1)
+
+        if not found:
+            problems.append(LintProblem(ERROR, None, "No section tags found: the presentation has no slides."))
+        for tag_type in ("intro", "outro"):
+            if found and tag_type not in found:
+                problems.append(LintProblem(WARNING, None, f"No {tag_type} "
+                                                           f"({self.tags[tag_type]['begin']}) found."))
+        problems.sort(key=lambda problem: problem.paragraph or 0)
+        return problems
+
+    def lint_section(self, view, start, tag_type, problems):
+        """
+        Finds the span of a section (as read_section_text does), and checks it.
+
+        Args:
+            view (DocumentView): The document.
+            start (int): The index of the paragraph with the begin tag.
+            tag_type (str): The section, e.g. "hymn".
+            problems (list): The list to add the problems to.
+
+        Returns:
+            int: The index of the paragraph with the end tag (the length of the document if there is none).
+        """
+        begin_tag = self.tags[tag_type]["begin"]
+        # (index of the paragraph, text) of the lines of the section, starting with the text after the begin tag
+        lines = [(start, view[start].text.split(begin_tag)[-1])]
+        images = 0
+        end = len(view)
+        for index in range(start + 1, len(view)):
+            paragraph = view[index]
+            if begin_tag in paragraph.text:
+                problems.append(LintProblem(ERROR, start + 1,
+                                            f"The {tag_type} has no end tag ({self.tags[tag_type]['end'][0]}) before the "
+                                            f"next {begin_tag} in paragraph {index + 1}: both are rendered as one {tag_type}."))
+                lines.append((index, paragraph.text.split(begin_tag)[-1]))
+                continue
+            if self.has_end_tag(tag_type, paragraph):
+                end = index
+                break
+            other_tag_type = self.get_begin_tag(paragraph)
+            if other_tag_type is not None:
+                problems.append(LintProblem(ERROR, index + 1,
+                                            f"The {other_tag_type} is inside the {tag_type} that begins "
+                                            f"in paragraph {start + 1}, and is not rendered: the {tag_type} has no end tag "
+                                            f"({self.tags[tag_type]['end'][0]}) before it."))
+            lines.append((index, paragraph.text))
+            images += len(paragraph.images)
+        if end == len(view) and tag_type != "outro":
+            problems.append(LintProblem(ERROR, start + 1,
+                                        f"The {tag_type} has no end tag ({self.tags[tag_type]['end'][0]}): it runs to the "
+                                        f"end of the document."))
+
+        checks = {
+            "hymn": self.lint_hymn,
+            "offering": self.lint_offering,
+            "intro": self.lint_intro,
+            "reading": self.lint_reading,
+            "outro": self.lint_outro,
+            "illustration": self.lint_illustration,
+        }
+        if tag_type in checks:
+            checks[tag_type](view, start, lines, images, problems)
+        return end
+
+    @staticmethod
+    def get_text(lines, strip=False):
+        """
+        Joins the lines of a section into its text, and returns the start of every line in the text.
+
+        Args:
+            lines (list): (index of the paragraph, text) tuples.
+            strip (bool, optional): If True, the lines are stripped (as for the intro). Defaults to False.
+
+        Returns:
+            tuple: (text, [(position in the text, index of the paragraph)]).
+        """
+        texts = []
+        positions = []
+        position = 0
+        for index, text in lines:
+            text = text.strip() if strip else text
+            if not text:
+                continue
+            positions.append((position, index))
+            texts.append(text)
+            position += len(text) + 1
+        return "\n".join(texts), positions
+
+    @staticmethod
+    def get_paragraph_number(positions, position, default):
+        """
+        Returns the number of the paragraph of a position in the text of a section.
+
+        Args:
+            positions (list): (position in the text, index of the paragraph) per line (see get_text).
+            position (int): The position.
+            default (int): The index of the paragraph to use if the position is not known.
+
+        Returns:
+            int: The number of the paragraph, from 1.
+        """
+        index = default
+        for line_position, line_index in positions:
+            if line_position > position:
+                break
+            index = line_index
+        return index + 1
+
+    def lint_title(self, view, start, tag_type, problems):
+        """
+        Checks that the paragraph with the begin tag is bold: the bold text is the title of hymns and readings,
+        and the rendering stops without it.
+
+        Args:
+            view (DocumentView): The document.
+            start (int): The index of the paragraph with the begin tag.
+            tag_type (str): The section, "hymn" or "reading".
+            problems (list): The list to add the problems to.
+
+        Returns:
+            bool: True if the section has a title.
+        """
+        if view[start].bold:
+            return True
+        problems.append(LintProblem(ERROR, start + 1, f"The {tag_type} has no title: the paragraph with "
+                                                      f"{self.tags[tag_type]['begin']} must be bold."))
+        return False
+
+    def lint_hymn(self, view, start, lines, images, problems):
+        """
+        Checks a hymn: its title, and that it has text or an image.
+
+        Args:
+            view (DocumentView): The document.
+            start (int): The index of the paragraph with the begin tag.
+            lines (list): (index of the paragraph, text) per line of the section.
+            images (int): The number of images in the section.
+            problems (list): The list to add the problems to.
+        """
+        self.lint_title(view, start, "hymn", problems)
+        if not images and not any(text.strip() for _, text in lines[1:]):
+            problems.append(LintProblem(WARNING, start + 1, "The hymn has no text and no image."))
+
+    def lint_reading(self, view, start, lines, images, problems):
+        """
+        Checks a reading: its title, its text, and (with a Bible index) that the title refers to verses.
+
+        Args:
+            view (DocumentView): The document.
+            start (int): The index of the paragraph with the begin tag.
+            lines (list): (index of the paragraph, text) per line of the section.
+            images (int): The number of images in the section.
+            problems (list): The list to add the problems to.
+        """
+        if not self.lint_title(view, start, "reading", problems):
+            return
+        title = lines[0][1].strip()
+        if self.check_references:
+            if BibleIndex.parse_reference(title) is None:
+                problems.append(LintProblem(WARNING, start + 1, f"The title of the reading ('{title}') does not "
+                                                                f"name a book of the Bible: the pasted text is used."))
+        elif not any(text.strip() for _, text in lines[1:]):
+            problems.append(LintProblem(WARNING, start + 1, "The reading has no text."))
+
+    def lint_intro(self, view, start, lines, images, problems):
+        """
+        Checks the intro: the date (see SermonExtract.read_intro_section), the time and the parson.
+
+        Args:
+            view (DocumentView): The document.
+            start (int): The index of the paragraph with the begin tag.
+            lines (list): (index of the paragraph, text) per line of the section.
+            images (int): The number of images in the section.
+            problems (list): The list to add the problems to.
+        """
+        text, positions = self.get_text(lines, strip=True)
+        fields = self.field_scanner.scan("intro", text)
+        date_label = self.settings.get_setting("word-intro-date_label")
+        if "date" not in fields:
+            problems.append(LintProblem(WARNING, start + 1, f"The intro has no date (a line '{date_label} "
+                                                            f"5 januari 2025'): 25 december 2024 is used."))
+        elif fields["date"].strip():
+            paragraph_number = self.get_paragraph_number(positions, fields.positions["date"], start)
+            date_text = fields["date"].strip()
+            parts = date_text.split()
+            if len(parts) != 3:
+                problems.append(LintProblem(ERROR, paragraph_number, f"The date '{date_text}' is not a day, month "
+                                                                     f"and year (e.g. '5 januari 2025')."))
+            elif parts[1].lower() not in MONTH_NUMBERS:
+                problems.append(LintProblem(WARNING, paragraph_number, f"The month of the date '{date_text}' is not "
+                                                                       f"known: the day of the week is left out."))
+            else:
+                try:
+                    datetime.strptime(f"{parts[0]} {MONTH_NUMBERS[parts[1].lower()]} {parts[2]}", "%d %m %Y")
+                except ValueError:
+                    problems.append(LintProblem(WARNING, paragraph_number, f"The date '{date_text}' does not exist: "
+                                                                           f"the day of the week is left out."))
+        if "time" not in fields:
+            problems.append(LintProblem(WARNING, start + 1, "The intro has no time (e.g. '10.00 uur')."))
+        if "parson" not in fields:
+            parson_text = self.settings.get_setting("word-intro-parson_text")
+            problems.append(LintProblem(WARNING, start + 1, f"The intro has no parson (a line '{parson_text}' "
+                                                            f"followed by the name)."))
+
+    def lint_offering(self, view, start, lines, images, problems):
+        """
+        Checks the offering: the goal and the bank account number (see SermonExtract.extract_bank_account_number).
+
+        Args:
+            view (DocumentView): The document.
+            start (int): The index of the paragraph with the begin tag.
+            lines (list): (index of the paragraph, text) per line of the section.
+            images (int): The number of images in the section.
+            problems (list): The list to add the problems to.
+        """
+        text, _ = self.get_text(lines, strip=True)
+        fields = self.field_scanner.scan("offering", text)
+        blue_bag_text = self.settings.get_setting("word-offering-blue_bag_text")
+        if "bank_account_number" not in fields:
+            problems.append(LintProblem(WARNING, start + 1, "The offering has no bank account number "
+                                                            "(IBAN, e.g. 'NL12 ABCD 0123 4567 89')."))
+        elif "blue_bag" in fields and fields.positions["blue_bag"] < fields.positions["bank_account_number"]:
+            problems.append(LintProblem(WARNING, start + 1, f"The bank account number is after the "
+                                                            f"'{blue_bag_text}', and is not used."))
+        if "offering_goal" not in fields:
+            red_bag_text = self.settings.get_setting("word-offering-red_bag_text")
+            problems.append(LintProblem(WARNING, start + 1, f"The offering has no goal (a line '1ste ({red_bag_text}) "
+                                                            f"{self.settings.get_setting('word-offering-diaconie_text')} "
+                                                            f"...')."))
+
+    def lint_outro(self, view, start, lines, images, problems):
+        """
+        Checks the outro: the line after the next services label must have a date and a parson, separated by tabs
+        (see SermonExtract.read_outro_section).
+
+        Args:
+            view (DocumentView): The document.
+            start (int): The index of the paragraph with the begin tag.
+            lines (list): (index of the paragraph, text) per line of the section.
+            images (int): The number of images in the section.
+            problems (list): The list to add the problems to.
+        """
+        lines = [(index, text) for index, text in lines if text]
+        for (index, text), (next_index, next_text) in zip(lines, lines[1:]):
+            if "next_sermon" not in self.field_scanner.scan("outro", text):
+                continue
+            parts = next_text.split("\t")
+            if len(parts) < 2:
+                problems.append(LintProblem(WARNING, next_index + 1, "The next service has no date and parson "
+                                                                     "separated by a tab (e.g. '12-jan<tab>ds. Jansen')."))
+                continue
+            try:
+                datetime.strptime(parts[0], "%d-%b")
+            except ValueError:
+                problems.append(LintProblem(ERROR, next_index + 1, f"The date of the next service ('{parts[0]}') "
+                                                                   f"is not a day and month (e.g. '12-jan')."))
+
+    def lint_illustration(self, view, start, lines, images, problems):
+        """
+        Checks that an illustration has an image.
+
+        Args:
+            view (DocumentView): The document.
+            start (int): The index of the paragraph with the begin tag.
+            lines (list): (index of the paragraph, text) per line of the section.
+            images (int): The number of images in the section.
+            problems (list): The list to add the problems to.
+        """
+        if not images:
+            problems.append(LintProblem(WARNING, start + 1, "The illustration has no image."))
+
+    def lint_file(self, word_filename, booklet=False):
+        """
+        Reads and checks a Word document.
+
+        Args:
+            word_filename (str): The path of the Word document.
+            booklet (bool, optional): See lint. Defaults to False.
+
+        Returns:
+            list: The problems (LintProblem objects), in document order.
+        """
+        try:
+            view = DocumentView.from_file(word_filename)
+        except Exception as e:
+            return [LintProblem(ERROR, None, f"The Word document cannot be read: {e}")]
+        return self.lint(view, booklet)
+
+    @staticmethod
+    def format_problem(word_filename, problem):
+        """
+        Returns a problem as a line of text, e.g. "orde-van-dienst.docx:9: error: The hymn has no title ...".
+
+        Args:
+            word_filename (str): The path of the Word document.
+            problem (LintProblem): The problem.
+
+        Returns:
+            str: The line.
+        """
+        location = word_filename if problem.paragraph is None else f"{word_filename}:{problem.paragraph}"
+        return f"{location}: {problem.level}: {problem.message}"
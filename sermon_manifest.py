@@ -0,0 +1,82 @@
+# sermon_manifest.py
+import json
+import os
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+
+class SlideManifest:
+    """
+    Describes the content of a deterministic presentation, slide by slide, in a JSON file next to it.
+
+    For every slide the manifest has the part name and SHA-256 of the slide XML, the images it shows,
+    and the section and paragraph range of the Word document the slide was made from. The media have
+    their own SHA-256. Tools that sync or compare presentations can use it to skip unchanged content.
+    """
+
+    def __init__(self, content_hashes):
+        """
+        Initializes the SlideManifest.
+
+        Args:
+            content_hashes (dict): The SHA-256 per member name, from the PackageWriter that wrote the presentation.
+        """
+        self.content_hashes = content_hashes
+
+    @staticmethod
+    def get_filename(powerpoint_filename):
+        """
+        Returns the name of the manifest of a presentation.
+
+        Args:
+            powerpoint_filename (str): The path of the .pptx file.
+
+        Returns:
+            str: The path of the manifest, e.g. "dienst.manifest.json" for "dienst.pptx".
+        """
+        return os.path.splitext(powerpoint_filename)[0] + ".manifest.json"
+
+    def build(self, prs, slide_sources):
+        """
+        Builds the manifest of a presentation.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation that was written.
+            slide_sources (dict): The SlideSource of each slide, by slide id.
+
+        Returns:
+            dict: The manifest.
+        """
+        slides = []
+        media = {}
+        for number, slide in enumerate(prs.slides, start=1):
+            part = slide.part
+            slide_media = []
+            for rel in part.rels.values():
+                if not rel.is_external and rel.reltype == RT.IMAGE:
+                    name = rel.target_part.partname.membername
+                    slide_media.append(name)
+                    media[name] = self.content_hashes.get(name)
+            source = slide_sources.get(slide.slide_id)
+            tag, begin, end = (source.tag, source.begin, source.end) if source is not None else (None, None, None)
+            slides.append({
+                "number": number,
+                "part": part.partname.membername,
+                "sha256": self.content_hashes.get(part.partname.membername),
+                "section": tag,
+                "paragraphs": [begin, end],
+                "media": sorted(slide_media),
+            })
+        return {"slides": slides, "media": dict(sorted(media.items()))}
+
+    def write(self, prs, slide_sources, powerpoint_filename):
+        """
+        Writes the manifest of a presentation next to it.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation that was written.
+            slide_sources (dict): The SlideSource of each slide, by slide id.
+            powerpoint_filename (str): The path of the .pptx file.
+        """
+        with open(self.get_filename(powerpoint_filename), "w", encoding="utf-8") as file:
+            json.dump(self.build(prs, slide_sources), file, indent=2, sort_keys=True)
+            file.write("\n")
@@ -0,0 +1,384 @@
+# sermon_media_store.py
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import time
+import zipfile
+
+# The folder of the images in a .pptx file
+MEDIA_PREFIX = "ppt/media/"
+
+
+class MediaStore:
+    """
+    A folder that keeps images once, by the SHA-256 of their content, for all presentations.
+
+    Layout of the folder:
+        objects/<ab>/<sha256>         the image
+        objects/<ab>/<sha256>.json    its metadata: format, width, height, size and the Word documents it came from
+        variants/<sha256>-<variant>   the SHA-256 of the optimised version of a source image (see ImageOptimiser)
+        decks/<name>.zip, .json       an archived presentation without its images, and its members (the images
+                                      by SHA-256) with their zip header fields
+
+    Files are written to a temporary name and then renamed, so several runs can use the same store.
+    The metadata of an image is changed under a lock, so the threads of one run do not lose each other's changes;
+    runs in other processes that add a document to the same image at the same time can lose one of the documents
+    (the documents are informational, the images themselves are never lost).
+    collect_garbage() removes the images that no archived presentation and no variant refers to, and that were
+    not written or used recently (so it can run while presentations are made).
+    """
+
+    def __init__(self, directory):
+        """
+        Initializes the MediaStore.
+
+        Args:
+            directory (str): The folder of the store. It is created when needed.
+        """
+        self.directory = directory
+        # guards the read-modify-write of the metadata of the images
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def get_digest(data):
+        """
+        Returns the key of some content.
+
+        Args:
+            data (bytes): The content.
+
+        Returns:
+            str: The SHA-256 of the content, as hexadecimal digits.
+        """
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def write_file(path, data):
+        """
+        Writes a file atomically: readers see either the old or the complete new file.
+        The temporary file is named after the process and the thread, so threads do not write to the same one.
+
+        Args:
+            path (str): The path of the file.
+            data (bytes): The content.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+    def get_object_path(self, digest):
+        """
+        Returns the path of an image in the store.
+
+        Args:
+            digest (str): The SHA-256 of the image.
+
+        Returns:
+            str: The path of the image.
+        """
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def put(self, data, document=None):
+        """
+        Adds an image to the store, if it is not there yet.
+
+        Args:
+            data (bytes): The image data.
+            document (str, optional): The Word document the image came from, added to its metadata. Defaults to None.
+
+        Returns:
+            str: The SHA-256 of the image.
+        """
+        digest = self.get_digest(data)
+        path = self.get_object_path(digest)
+        with self.lock:
+            try:
+                os.utime(path)  # the image is used again: collect_garbage keeps it for a while
+                exists = True
+            except FileNotFoundError:
+                exists = False
+            if not exists:
+                self.write_file(path, data)
+                metadata = {"size": len(data), "format": None, "width": None, "height": None, "documents": []}
+                from PIL import Image  # only needed when images are added
+                try:
+                    with Image.open(io.BytesIO(data)) as image:
+                        metadata.update(format=image.format, width=image.width, height=image.height)
+                except Exception as e:
+                    print(f"An error occurred while reading an image for the media store: {e}")
+                self.write_metadata(digest, metadata)
+            if document:
+                self.add_document(digest, document)
+        return digest
+
+    def get(self, digest):
+        """
+        Returns an image from the store.
+
+        Args:
+            digest (str): The SHA-256 of the image.
+
+        Returns:
+            bytes: The image data, or None if the image is not in the store.
+        """
+        try:
+            with open(self.get_object_path(digest), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def get_metadata(self, digest):
+        """
+        Returns the metadata of an image in the store.
+
+        Args:
+            digest (str): The SHA-256 of the image.
+
+        Returns:
+            dict: The metadata, or None if the image is not in the store.
+        """
+        try:
+            with open(self.get_object_path(digest) + ".json", "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def write_metadata(self, digest, metadata):
+        """
+        Writes the metadata of an image in the store.
+
+        Args:
+            digest (str): The SHA-256 of the image.
+            metadata (dict): The metadata.
+        """
+        self.write_file(self.get_object_path(digest) + ".json",
+                        json.dumps(metadata, indent=2, sort_keys=True).encode("utf-8"))
+
+    def add_document(self, digest, document):
+        """
+        Adds a Word document to the documents an image came from.
+
+        Args:
+            digest (str): The SHA-256 of the image.
+            document (str): The name of the Word document.
+        """
+        document = os.path.basename(document)
+        with self.lock:
+            metadata = self.get_metadata(digest)
+            if metadata is not None and document not in metadata["documents"]:
+                metadata["documents"].append(document)
+                self.write_metadata(digest, metadata)
+
+    def get_variant_path(self, source_digest, variant):
+        """
+        Returns the path of the file with the SHA-256 of a variant (e.g. an optimised version) of an image.
+
+        Args:
+            source_digest (str): The SHA-256 of the source image.
+            variant (str): The name of the variant.
+
+        Returns:
+            str: The path of the file.
+        """
+        return os.path.join(self.directory, "variants", f"{source_digest}-{variant}")
+
+    def get_variant(self, source_digest, variant):
+        """
+        Returns the SHA-256 of a variant of an image, if that variant is in the store.
+
+        Args:
+            source_digest (str): The SHA-256 of the source image.
+            variant (str): The name of the variant.
+
+        Returns:
+            str: The SHA-256 of the variant, or None if it is not in the store.
+        """
+        try:
+            with open(self.get_variant_path(source_digest, variant), "r") as file:
+                digest = file.read().strip()
+        except FileNotFoundError:
+            return None
+        return digest if os.path.exists(self.get_object_path(digest)) else None
+
+    def set_variant(self, source_digest, variant, digest):
+        """
+        Remembers the variant of an image.
+
+        Args:
+            source_digest (str): The SHA-256 of the source image.
+            variant (str): The name of the variant.
+            digest (str): The SHA-256 of the variant (already in the store).
+        """
+        self.write_file(self.get_variant_path(source_digest, variant), digest.encode("ascii"))
+
+    def get_deck_path(self, name, extension):
+        """
+        Returns the path of a file of an archived presentation.
+
+        Args:
+            name (str): The name of the presentation in the archive.
+            extension (str): ".zip" (the presentation without its images) or ".json" (its images).
+
+        Returns:
+            str: The path of the file.
+        """
+        return os.path.join(self.directory, "decks", name + extension)
+
+    @staticmethod
+    def read_raw(file, info):
+        """
+        Returns the data of a zip entry as it is in the zip file (compressed, if the entry is compressed).
+
+        Args:
+            file: The zip file, opened for binary reading.
+            info (zipfile.ZipInfo): The entry.
+
+        Returns:
+            bytes: The data.
+        """
+        file.seek(info.header_offset)
+        header = file.read(30)
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        file.seek(info.header_offset + 30 + name_length + extra_length)
+        return file.read(info.compress_size)
+
+    def archive_deck(self, filename, document=None, name=None):
+        """
+        Archives a presentation: its (stored) images are added to the store, the (compressed) data of the other
+        members is kept in a zip file, and the zip header fields of every member in the record of the deck.
+
+        Args:
+            filename (str): The path of the .pptx file.
+            document (str, optional): The Word document the presentation was made from. Defaults to None.
+            name (str, optional): The name in the archive. Defaults to the file name without extension.
+
+        Returns:
+            str: The name of the presentation in the archive.
+        """
+        name = name or os.path.splitext(os.path.basename(filename))[0]
+        members = []
+        skeleton = io.BytesIO()
+        with open(filename, "rb") as file, zipfile.ZipFile(file) as source, \
+                zipfile.ZipFile(skeleton, "w", zipfile.ZIP_STORED) as target:
+            for info in source.infolist():
+                data = self.read_raw(file, info)
+                member = {"name": info.filename, "digest": None, "method": info.compress_type, "crc": info.CRC,
+                          "size": info.file_size, "date_time": list(info.date_time), "flag_bits": info.flag_bits,
+                          "create_system": info.create_system, "create_version": info.create_version,
+                          "extract_version": info.extract_version, "external_attr": info.external_attr}
+                if info.filename.startswith(MEDIA_PREFIX) and info.compress_type == zipfile.ZIP_STORED:
+                    member["digest"] = self.put(data, document)
+                else:
+                    target.writestr(info.filename, data)
+                members.append(member)
+        self.write_file(self.get_deck_path(name, ".zip"), skeleton.getvalue())
+        record = {"document": os.path.basename(document) if document else None, "members": members}
+        self.write_file(self.get_deck_path(name, ".json"), json.dumps(record, indent=2).encode("utf-8"))
+        return name
+
+    def restore_deck(self, name, filename):
+        """
+        Writes an archived presentation to a .pptx file. The members are written with their original data and
+        zip header fields, in their original order, so the file is the same as the archived one (unless that
+        file had extra fields, comments or data descriptors, which are not kept).
+
+        Args:
+            name (str): The name of the presentation in the archive.
+            filename (str): The path of the .pptx file.
+        """
+        from .sermon_writer import ZipStream  # only needed when decks are restored
+        with open(self.get_deck_path(name, ".json"), "r", encoding="utf-8") as file:
+            record = json.load(file)
+        with zipfile.ZipFile(self.get_deck_path(name, ".zip")) as skeleton, open(filename, "wb") as file:
+            zip_stream = ZipStream(file)
+            for member in record["members"]:
+                data = skeleton.read(member["name"]) if member["digest"] is None else self.get(member["digest"])
+                zip_stream.add(member["name"], member["method"], member["crc"], data, member["size"],
+                               date_time=tuple(member["date_time"]), flag_bits=member["flag_bits"] & ~0x08,
+                               create_system=member["create_system"], create_version=member["create_version"],
+                               extract_version=member["extract_version"], external_attr=member["external_attr"])
+            zip_stream.close()
+
+    def remove_deck(self, name):
+        """
+        Removes a presentation from the archive. Its images are removed by the next collect_garbage().
+
+        Args:
+            name (str): The name of the presentation in the archive.
+        """
+        for extension in (".json", ".zip"):
+            try:
+                os.remove(self.get_deck_path(name, extension))
+            except FileNotFoundError:
+                pass
+
+    def get_referenced_digests(self):
+        """
+        Returns the images that the archived presentations and the variants (the optimised images) refer to.
+
+        Returns:
+            set: The SHA-256 of the images.
+        """
+        digests = set()
+        variants_directory = os.path.join(self.directory, "variants")
+        if os.path.isdir(variants_directory):
+            for variant_filename in os.listdir(variants_directory):
+                if not variant_filename.endswith(".tmp"):
+                    with open(os.path.join(variants_directory, variant_filename), "r") as file:
+                        digests.add(file.read().strip())
+        decks_directory = os.path.join(self.directory, "decks")
+        if os.path.isdir(decks_directory):
+            for deck_filename in os.listdir(decks_directory):
+                if deck_filename.endswith(".json"):
+                    with open(os.path.join(decks_directory, deck_filename), "r", encoding="utf-8") as file:
+                        digests.update(member["digest"] for member in json.load(file)["members"] if member["digest"])
+        return digests
+
+    def collect_garbage(self, grace_seconds=3600):
+        """
+        Removes the images that no archived presentation and no variant refers to (and the variants pointing to
+        images that are not in the store anymore).
+
+        Args:
+            grace_seconds (int, optional): Images written or used less than this number of seconds ago are kept,
+                                           as a presentation that is being made may not refer to them yet.
+                                           Defaults to 3600.
+
+        Returns:
+            tuple: (number of removed images, total size of the removed images in bytes).
+        """
+        referenced = self.get_referenced_digests()
+        newest = time.time() - grace_seconds
+        removed_count, removed_bytes = 0, 0
+        objects_directory = os.path.join(self.directory, "objects")
+        if os.path.isdir(objects_directory):
+            for prefix in os.listdir(objects_directory):
+                for object_filename in os.listdir(os.path.join(objects_directory, prefix)):
+                    if object_filename.endswith(".json") or object_filename.endswith(".tmp") \
+                            or object_filename in referenced:
+                        continue
+                    path = os.path.join(objects_directory, prefix, object_filename)
+                    if os.path.getmtime(path) > newest:
+                        continue
+                    removed_count += 1
+                    removed_bytes += os.path.getsize(path)
+                    os.remove(path)
+                    if os.path.exists(path + ".json"):
+                        os.remove(path + ".json")
+
+        variants_directory = os.path.join(self.directory, "variants")
+        if os.path.isdir(variants_directory):
+            for variant_filename in os.listdir(variants_directory):
+                if variant_filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(variants_directory, variant_filename)
+                with open(path, "r") as file:
+                    digest = file.read().strip()
+                if not os.path.exists(self.get_object_path(digest)):
+                    os.remove(path)
+        return removed_count, removed_bytes
@@ -0,0 +1,332 @@
+# sermon_merge.py
+import copy
+import hashlib
+import re
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TARGET_MODE as RTM
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import serialize_part_xml
+from pptx.opc.package import PartFactory, XmlPart, _Relationship
+from pptx.opc.packuri import PackURI
+from pptx.oxml.ns import qn
+from .sermon_writer import PackageWriter
+
+# A numbered part name: the folder and name before the number, the number and the extension
+NUMBERED_PARTNAME_REGEX = re.compile(r"^(.*?)(\d+)(\.[^./]+)$")
+# The relationships that point back up (to a master or a layout) or to notes; they are not part of the content
+# of a part (see get_key)
+BACK_RELATIONSHIP_TYPES = {RT.SLIDE_LAYOUT, RT.SLIDE_MASTER, RT.NOTES_SLIDE, RT.NOTES_MASTER}
+# The folder of the images and other media, which are shared by all slides, layouts and masters with the same media
+MEDIA_FOLDER = "/ppt/media/"
+# The first id of the masters and layouts in a presentation (the ids of slides are below it)
+FIRST_MASTER_ID = 2147483648
+
+
+class DeckMerger:
+    """
+    Merges presentations made by this project (e.g. the decks of a combined service) into one presentation.
+
+    The first presentation is the base; the slides of the others are added after its slides, in the given
+    order. Masters, layouts and media are compared by the SHA-256 of their content (see get_key): a master,
+    layout or image that is already in the merged presentation is reused, so the merged file is about the
+    size of the unique content. Only the layouts (and masters) that the added slides use are copied.
+
+    Every part is copied once, and the ids, relationship ids and part names are counted on instead of being
+    searched, so merging takes time linear in the number of slides. At the end, the part names of each kind
+    are numbered from 1 again (slides in the order of the presentation). Notes are not merged.
+    """
+
+    def __init__(self, settings):
+        """
+        Initializes the DeckMerger.
+
+        Args:
+            settings (Settings): The settings (of the PackageWriter).
+        """
+        self.settings = settings
+        self.prs = None
+        # the content keys of the parts of the presentation that is read, by id of the part (see get_key)
+        self.keys = {}
+        # the parts of the merged presentation, by content key (layouts by the keys of their master and layout)
+        self.media = {}
+        self.masters = {}
+        self.layouts = {}
+        # the parts of the current source presentation that are copied, by id of the source part
+        self.copied = {}
+        # the highest number of the part names of each kind, by (folder and name, extension)
+        self.partname_numbers = {}
+        self.next_slide_id = 256
+        self.next_master_id = FIRST_MASTER_ID
+
+    def get_key(self, part):
+        """
+        Returns the content key of a part: the SHA-256 of its content type, its content and the content of
+        the parts it refers to. The relationships back to masters and layouts are left out, and so is the list
+        of layouts of a master (a presentation only keeps the layouts it uses, see TemplateSlimmer).
+
+        Args:
+            part (pptx.opc.package.Part): The part.
+
+        Returns:
+            str: The key, as hexadecimal digits.
+        """
+        if id(part) in self.keys:
+            return self.keys[id(part)]
+        sha256 = hashlib.sha256(part.content_type.encode("utf-8"))
+        if isinstance(part, XmlPart) and part.content_type.endswith("slideMaster+xml"):
+            element = copy.deepcopy(part._element)
+            if element.sldLayoutIdLst is not None:
+                element.remove(element.sldLayoutIdLst)
+            sha256.update(serialize_part_xml(element))
+        else:
+            sha256.update(part.blob)
+        for rId, rel in sorted(part.rels.items()):
+            if rel.reltype in BACK_RELATIONSHIP_TYPES:
+                continue
+            target = rel.target_ref if rel.is_external else self.get_key(rel.target_part)
+            sha256.update(f"\0{rId}\0{rel.reltype}\0{target}".encode("utf-8"))
+        self.keys[id(part)] = sha256.hexdigest()
+        return self.keys[id(part)]
+
+    def get_partname(self, partname):
+        """
+        Returns a new part name of the same kind as a part name of a source presentation.
+
+        Args:
+            partname (PackURI): The part name in the source presentation, e.g. "/ppt/slides/slide3.xml".
+
+        Returns:
+            PackURI: The next free part name of that kind in the merged presentation, e.g. "/ppt/slides/slide23.xml".
+        """
+        match = NUMBERED_PARTNAME_REGEX.match(partname)
+        kind = (match.group(1), match.group(3)) if match else (partname.rsplit(".", 1)[0], "." + partname.ext)
+        number = self.partname_numbers.get(kind, 0) + 1
+        self.partname_numbers[kind] = number
+        return PackURI(f"{kind[0]}{number}{kind[1]}")
+
+    @staticmethod
+    def add_relationship(part, rId, reltype, target, is_external=False):
+        """
+        Adds a relationship to a part, with a given relationship id.
+
+        Args:
+            part (pptx.opc.package.Part): The part.
+            rId (str): The relationship id, or None for the next free one.
+            reltype (str): The relationship type.
+            target: The target part, or the URL of an external target.
+            is_external (bool, optional): True for an external target. Defaults to False.
+
+        Returns:
+            str: The relationship id.
+        """
+        rId = rId or part.rels._next_rId
+        part.rels._rels[rId] = _Relationship(part.partname.baseURI, rId, reltype,
+                                             RTM.EXTERNAL if is_external else RTM.INTERNAL, target)
+        return rId
+
+    def new_part(self, part):
+        """
+        Adds a copy of a part of a source presentation to the merged presentation, without its relationships.
+
+        Args:
+            part (pptx.opc.package.Part): The part.
+
+        Returns:
+            pptx.opc.package.Part: The copy.
+        """
+        return PartFactory(self.get_partname(part.partname), part.content_type, self.prs.part.package, part.blob)
+
+    def copy_relationships(self, part, new_part, get_target):
+        """
+        Relates a copied part to the copies of the targets of the source part, with the same relationship ids
+        (the XML of the part refers to them).
+
+        Args:
+            part (pptx.opc.package.Part): The source part.
+            new_part (pptx.opc.package.Part): The copy.
+            get_target (callable): Returns the target in the merged presentation of a relationship of the
+                                   source part, or None to leave the relationship out.
+        """
+        for rId, rel in part.rels.items():
+            if rel.is_external:
+                self.add_relationship(new_part, rId, rel.reltype, rel.target_ref, is_external=True)
+                continue
+            target = get_target(rel)
+            if target is not None:
+                self.add_relationship(new_part, rId, rel.reltype, target)
+
+    def copy_part(self, part):
+        """
+        Returns the copy of a part that a slide, layout or master refers to (an image, a theme, a chart, ...).
+        Media are shared by content; other parts (e.g. the theme of a master) are copied once per source
+        presentation.
+
+        Args:
+            part (pptx.opc.package.Part): The part in the source presentation.
+
+        Returns:
+            pptx.opc.package.Part: The part in the merged presentation.
+        """
+        if part.partname.startswith(MEDIA_FOLDER):
+            key = self.get_key(part)
+            if key not in self.media:
+                self.media[key] = self.new_part(part)
+            return self.media[key]
+        if id(part) not in self.copied:
+            new_part = self.copied[id(part)] = self.new_part(part)
+            self.copy_relationships(part, new_part, lambda rel: self.copy_part(rel.target_part))
+        return self.copied[id(part)]
+
+    def copy_master(self, master_part):
+        """
+        Returns the master of the merged presentation with the same content as a master of a source
+        presentation, and copies the master (without layouts) if there is none.
+
+        Args:
+            master_part (pptx.parts.slide.SlideMasterPart): The master in the source presentation.
+
+        Returns:
+            pptx.parts.slide.SlideMasterPart: The master in the merged presentation.
+        """
+        key = self.get_key(master_part)
+        if key not in self.masters:
+            new_part = self.new_part(master_part)
+            sld_layout_id_lst = new_part._element.get_or_add_sldLayoutIdLst()
+            for sld_layout_id in list(sld_layout_id_lst):
+                sld_layout_id_lst.remove(sld_layout_id)
+            self.copy_relationships(master_part, new_part, lambda rel: None if rel.reltype == RT.SLIDE_LAYOUT
+                                    else self.copy_part(rel.target_part))
+            rId = self.add_relationship(self.prs.part, None, RT.SLIDE_MASTER, new_part)
+            sld_master_id = self.prs.part._element.get_or_add_sldMasterIdLst()._add_sldMasterId(rId=rId)
+            sld_master_id.set("id", str(self.next_master_id))
+            self.next_master_id += 1
+            self.masters[key] = new_part
+        return self.masters[key]
+
+    def copy_layout(self, layout_part):
+        """
+        Returns the layout of the merged presentation with the same content (and master) as a layout of a
+        source presentation, and copies the layout if there is none.
+
+        Args:
+            layout_part (pptx.parts.slide.SlideLayoutPart): The layout in the source presentation.
+
+        Returns:
+            pptx.parts.slide.SlideLayoutPart: The layout in the merged presentation.
+        """
+        source_master_part = layout_part.part_related_by(RT.SLIDE_MASTER)
+        master_part = self.copy_master(source_master_part)
+        key = (self.get_key(source_master_part), self.get_key(layout_part))
+        if key not in self.layouts:
+            new_part = self.new_part(layout_part)
+            self.copy_relationships(layout_part, new_part, lambda rel: master_part if rel.reltype == RT.SLIDE_MASTER
+                                    else self.copy_part(rel.target_part))
+            rId = self.add_relationship(master_part, None, RT.SLIDE_LAYOUT, new_part)
+            sld_layout_id = master_part._element.get_or_add_sldLayoutIdLst()._add_sldLayoutId(rId=rId)
+            sld_layout_id.set("id", str(self.next_master_id))
+            self.next_master_id += 1
+            self.layouts[key] = new_part
+        return self.layouts[key]
+
+    def copy_slide(self, slide_part):
+        """
+        Adds a copy of a slide of a source presentation at the end of the merged presentation.
+
+        Args:
+            slide_part (pptx.parts.slide.SlidePart): The slide in the source presentation.
+        """
+        new_part = self.new_part(slide_part)
+        self.copy_relationships(slide_part, new_part, lambda rel: None if rel.reltype == RT.NOTES_SLIDE
+                                else self.copy_layout(rel.target_part) if rel.reltype == RT.SLIDE_LAYOUT
+                                else self.copy_part(rel.target_part))
+        rId = self.add_relationship(self.prs.part, None, RT.SLIDE, new_part)
+        self.prs.slides._sldIdLst._add_sldId(id=self.next_slide_id, rId=rId)
+        self.next_slide_id += 1
+
+    def start(self, filename):
+        """
+        Loads the first presentation as the base of the merged presentation, and indexes its masters,
+        layouts, media, ids and part names.
+
+        Args:
+            filename (str): The path of the presentation.
+        """
+        self.prs = Presentation(filename)
+        package = self.prs.part.package
+        for part in package.iter_parts():
+            match = NUMBERED_PARTNAME_REGEX.match(part.partname)
+            if match:
+                kind = (match.group(1), match.group(3))
+                self.partname_numbers[kind] = max(self.partname_numbers.get(kind, 0), int(match.group(2)))
+            if part.partname.startswith(MEDIA_FOLDER):
+                self.media.setdefault(self.get_key(part), part)
+        for master in self.prs.slide_masters:
+            master_key = self.get_key(master.part)
+            self.masters.setdefault(master_key, master.part)
+            for layout in master.slide_layouts:
+                self.layouts.setdefault((master_key, self.get_key(layout.part)), layout.part)
+        self.keys = {}
+
+        ids = [int(element.get("id")) for element in self.prs.part._element.iter(qn("p:sldMasterId"), qn("p:sldId"))]
+        ids += [int(element.get("id")) for master in self.prs.slide_masters
+                for element in master.part._element.iter(qn("p:sldLayoutId"))]
+        self.next_slide_id = max([id_ for id_ in ids if id_ < FIRST_MASTER_ID], default=255) + 1
+        self.next_master_id = max([id_ for id_ in ids if id_ >= FIRST_MASTER_ID], default=FIRST_MASTER_ID - 1) + 1
+
+    def add(self, filename):
+        """
+        Adds the slides of a presentation at the end of the merged presentation.
+
+        Args:
+            filename (str): The path of the presentation.
+
+        Returns:
+            int: The number of slides added (0 if the slide size differs from the merged presentation).
+        """
+        prs = Presentation(filename)
+        if (prs.slide_width, prs.slide_height) != (self.prs.slide_width, self.prs.slide_height):
+            print(f"Error: the slides of '{filename}' have another size, the presentation is not merged.")
+            return 0
+        slide_parts = [slide.part for slide in prs.slides]
+        for slide_part in slide_parts:
+            self.copy_slide(slide_part)
+        # the parts of this presentation are released, and their ids can be reused
+        self.keys = {}
+        self.copied = {}
+        return len(slide_parts)
+
+    def renumber_parts(self):
+        """
+        Numbers the part names of each kind from 1 again: the slides in the order of the presentation, the other
+        parts in the order of their current number.
+        """
+        kinds = {}
+        for part in self.prs.part.package.iter_parts():
+            match = NUMBERED_PARTNAME_REGEX.match(part.partname)
+            if match:
+                kinds.setdefault((match.group(1), match.group(3)), []).append((int(match.group(2)), part))
+        slide_parts = {id(slide.part): number for number, slide in enumerate(self.prs.slides)}
+        for (name, extension), parts in kinds.items():
+            parts.sort(key=lambda item: (slide_parts.get(id(item[1]), -1), item[0]))
+            for number, (_, part) in enumerate(parts, 1):
+                part.partname = PackURI(f"{name}{number}{extension}")
+
+    def merge(self, filenames, output_filename, deterministic=False):
+        """
+        Merges presentations into one presentation, and saves it.
+
+        Args:
+            filenames (list): The paths of the presentations, in the order of the merged slides.
+            output_filename (str): The path of the merged presentation.
+            deterministic (bool, optional): If True, the file has the same bytes for the same presentations
+                                            (see PackageWriter). Defaults to False.
+
+        Returns:
+            int: The number of slides in the merged presentation.
+        """
+        self.start(filenames[0])
+        for filename in filenames[1:]:
+            self.add(filename)
+        self.renumber_parts()
+        PackageWriter(self.settings, deterministic=deterministic).save(self.prs, output_filename)
+        return len(self.prs.slides)
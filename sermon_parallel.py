@@ -0,0 +1,365 @@
+# sermon_parallel.py
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from .sermon_slide_snapshot import SlideSnapshot
+from .sermon_template import TemplateSnapshot
+
+# The sermon that renders the sections in a worker process (set by _init_worker)
+_worker_sermon = None
+
+# A reference to data in a block of shared memory (see SharedAssets)
+SharedBytes = namedtuple("SharedBytes", ["name", "offset", "length"])
+
+
+def _map_data(value, function):
+    """
+    Returns a copy of the data of a section with function applied to every value that is not a list,
+    tuple or dictionary.
+
+    Args:
+        value: The data (e.g. a SectionResult).
+        function (callable): The function.
+
+    Returns:
+        The new data.
+    """
+    if isinstance(value, SharedBytes):
+        return function(value)
+    if isinstance(value, list):
+        return [_map_data(item, function) for item in value]
+    if isinstance(value, tuple):
+        items = [_map_data(item, function) for item in value]
+        return type(value)(*items) if hasattr(value, "_fields") else tuple(items)
+    if isinstance(value, dict):
+        return {key: _map_data(item, function) for key, item in value.items()}
+    return function(value)
+
+
+def _read_shared_bytes(value):
+    """
+    Returns the data a SharedBytes refers to (other values are returned as they are).
+
+    Args:
+        value: A value of the data of a section.
+
+    Returns:
+        The value, with bytes instead of a SharedBytes.
+    """
+    if not isinstance(value, SharedBytes):
+        return value
+    block = shared_memory.SharedMemory(name=value.name)
+    try:
+        return bytes(block.buf[value.offset:value.offset + value.length])
+    finally:
+        block.close()
+
+
+def _init_worker(settings, template_filename):
+    """
+    Prepares a worker process: creates a Sermon with the settings of the main process,
+    and loads (and prepares) the template once.
+
+    Args:
+        settings (Settings): The settings of the main process.
+        template_filename (str): The PowerPoint template.
+    """
+    global _worker_sermon
+    from .sermon_core import Sermon
+    sermon = Sermon(settings)
+    sermon.powerpoint_template_filename = template_filename
+    sermon.powerpoint_presentation = sermon.load_template(template_filename)
+    sermon.prepare_template()
+    _worker_sermon = sermon
+
+
+def _render_section(section):
+    """
+    Renders the slides of one section in a worker process.
+
+    Args:
+        section (SectionResult): The extracted section.
+
+    Returns:
+        list: The SlideSnapshot objects of the slides of the section, in order.
+    """
+    sermon = _worker_sermon
+    section = _map_data(section, _read_shared_bytes)
+    prs = sermon.powerpoint_presentation
+    first_new_slide = len(prs.slides)
+    sermon.create_section_slides(sermon.image_optimiser.optimise_section(section))
+    slides = list(prs.slides)[first_new_slide:]
+    snapshots = [SlideSnapshot.from_slide(slide) for slide in slides]
+
+    # remove the slides again, so the presentation of the worker does not grow
+    sld_id_lst = prs.slides._sldIdLst
+    for sld_id in list(sld_id_lst)[first_new_slide:]:
+        sld_id_lst.remove(sld_id)
+        prs.part.drop_rel(sld_id.rId)
+    return snapshots
+
+
+def _render_presentation(settings, template_filename, word_filename, powerpoint_filename, sections,
+                         streaming, deterministic):
+    """
+    Creates a presentation from extracted sections (in a worker process, or in the main process).
+
+    Args:
+        settings (Settings): The settings of the presentation.
+        template_filename (str): The PowerPoint template.
+        word_filename (str): The Word document the sections were extracted from.
+        powerpoint_filename (str): The presentation to create.
+        sections (list): The extracted sections, with optimised images.
+        streaming (bool): See Sermon.process_sermon.
+        deterministic (bool): See Sermon.process_sermon.
+
+    Returns:
+        str: The filename of the presentation, or None if it could not be created.
+    """
+    from .sermon_core import Sermon
+    sermon = Sermon(settings)
+    sermon.powerpoint_template_filename = template_filename
+    sermon.word_filename = word_filename
+    sermon.powerpoint_filename = powerpoint_filename
+    sermon.streaming = streaming
+    sermon.deterministic = deterministic
+    sermon.render_sections(_map_data(sections, _read_shared_bytes))
+    return powerpoint_filename if sermon.powerpoint_presentation is not None else None
+
+
+def render_presentations(settings, jobs, workers, streaming, deterministic):
+    """
+    Creates several presentations from extracted sections (e.g. the variants of a presentation, or the
+    services of a booklet), at the same time in worker processes, with the images in shared memory.
+
+    Args:
+        settings (Settings): The settings of the main process (the start method and the shared memory size).
+        jobs (list): (settings, template filename, Word filename, PowerPoint filename, sections) per presentation.
+        workers (int): The number of worker processes (0: one per presentation, at most one per core).
+        streaming (bool): See Sermon.process_sermon.
+        deterministic (bool): See Sermon.process_sermon.
+
+    Returns:
+        list: The filenames of the presentations that were created.
+    """
+    workers = min(workers or len(jobs), len(jobs), os.cpu_count() or 1)
+    if workers < 2:
+        filenames = [_render_presentation(*job, streaming, deterministic) for job in jobs]
+        return [filename for filename in filenames if filename]
+
+    shared_assets = SharedAssets([section for *_, sections in jobs for section in sections],
+                                 settings.get_setting("parallel-shared_memory_min_bytes", 65536))
+    context = WorkerPool.get_context(settings, jobs[0][1])
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_render_presentation, *job[:-1],
+                                   [shared_assets.share(section) for section in job[-1]], streaming, deterministic)
+                       for job in jobs]
+            filenames = [future.result() for future in futures]
+    finally:
+        shared_assets.close()
+    return [filename for filename in filenames if filename]
+
+
+class SharedAssets:
+    """
+    Puts the large values (the images) of the sections for the workers in one block of shared memory,
+    so they are not pickled and sent through a pipe to the worker that renders them. The sections get
+    a SharedBytes reference instead; the worker reads the value with _read_shared_bytes.
+    """
+
+    def __init__(self, sections, min_size):
+        """
+        Initializes the SharedAssets, and copies the large values of the sections into shared memory.
+
+        Args:
+            sections (list): The sections (SectionResult objects) that are sent to the workers.
+            min_size (int): The size in bytes from which a value is put into shared memory.
+        """
+        values = {}
+
+        def collect(value):
+            if isinstance(value, bytes) and len(value) >= min_size:
+                values.setdefault(id(value), value)
+            return value
+
+        for section in sections:
+            _map_data(section, collect)
+        self.block = None
+        self.references = {}
+        size = sum(len(value) for value in values.values())
+        if size:
+            self.block = shared_memory.SharedMemory(create=True, size=size)
+            offset = 0
+            for key, value in values.items():
+                self.block.buf[offset:offset + len(value)] = value
+                self.references[key] = SharedBytes(self.block.name, offset, len(value))
+                offset += len(value)
+        # keep the values alive, so their ids stay valid while sections are shared
+        self.values = values
+
+    def share(self, section):
+        """
+        Returns a copy of a section with references to the shared memory instead of its large values.
+
+        Args:
+            section (SectionResult): The section.
+
+        Returns:
+            SectionResult: The section to send to a worker.
+        """
+        return _map_data(section, lambda value: self.references.get(id(value), value))
+
+    def close(self):
+        """
+        Releases the shared memory (after all workers have read it).
+        """
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+
+class WorkerPool:
+    """
+    The worker processes of the ParallelRenderer, kept for all presentations of a process (a batch of
+    Word documents, or a service), so workers are started once.
+
+    With the "forkserver" start method (the "parallel-start_method" setting), the fork server imports
+    sermon_preload before it starts workers: python-docx, python-pptx, lxml and PIL are imported, and the
+    settings and the template snapshot are loaded once, and every worker is forked from the server with
+    that state (shared copy-on-write). With "fork" the workers are forked from this process and share its
+    template snapshot; with "spawn" (the fallback) every worker starts a new interpreter.
+    Connections (the hymn library) are opened by each worker, as they cannot be shared by processes.
+    """
+
+    # the pools of this process, by number of workers, template and settings
+    pools = {}
+    lock = threading.Lock()
+
+    def __init__(self, settings, template_filename, workers):
+        """
+        Initializes the WorkerPool, and starts the worker processes.
+
+        Args:
+            settings (Settings): The settings of the main process.
+            template_filename (str): The PowerPoint template.
+            workers (int): The number of worker processes.
+        """
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=self.get_context(settings, template_filename),
+                                            initializer=_init_worker, initargs=(settings, template_filename))
+
+    @staticmethod
+    def get_context(settings, template_filename):
+        """
+        Returns the multiprocessing context of the "parallel-start_method" setting, prepared to start workers
+        with the modules and the template already loaded.
+
+        Args:
+            settings (Settings): The settings.
+            template_filename (str): The PowerPoint template.
+
+        Returns:
+            multiprocessing.context.BaseContext: The context.
+        """
+        start_method = settings.get_setting("parallel-start_method", "forkserver")
+        if start_method not in multiprocessing.get_all_start_methods():
+            start_method = "spawn"
+        context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            context.set_forkserver_preload([f"{__package__}.sermon_preload"])
+        elif start_method == "fork":
+            TemplateSnapshot.load(template_filename)
+        return context
+
+    @classmethod
+    def get(cls, settings, template_filename, workers):
+        """
+        Returns the pool for a number of workers, a template and settings, and starts it if needed.
+
+        Args:
+            settings (Settings): The settings of the main process.
+            template_filename (str): The PowerPoint template.
+            workers (int): The number of worker processes.
+
+        Returns:
+            WorkerPool: The pool.
+        """
+        key = (workers, template_filename, json.dumps(settings.settings, sort_keys=True))
+        with cls.lock:
+            if key not in cls.pools:
+                cls.pools[key] = cls(settings, template_filename, workers)
+            return cls.pools[key]
+
+    @classmethod
+    def shutdown_all(cls):
+        """
+        Stops the worker processes of all pools.
+        """
+        with cls.lock:
+            for pool in cls.pools.values():
+                pool.executor.shutdown()
+            cls.pools.clear()
+
+
+atexit.register(WorkerPool.shutdown_all)
+
+
+class ParallelRenderer:
+    """
+    Renders the slides of independent sections (hymns, readings, illustrations) in worker processes.
+
+    The workers return their slides as SlideSnapshot objects. The main process adds all slides to
+    the presentation in document order, so part names, relationship ids and shared images do not
+    depend on the number of workers or on which worker finishes first. The other sections
+    (intro, offering, outro) are cheap, and are rendered in the main process.
+    """
+
+    def __init__(self, sermon, workers=None):
+        """
+        Initializes the ParallelRenderer.
+
+        Args:
+            sermon (Sermon): The sermon with the loaded presentation.
+            workers (int, optional): The number of worker processes. Defaults to the "parallel-workers" setting.
+        """
+        self.sermon = sermon
+        self.workers = workers or sermon.settings.get_setting("parallel-workers", 1)
+        self.section_tags = sermon.settings.get_setting("parallel-section_tags", ["hymn", "reading", "illustration"])
+
+    def run(self, sections):
+        """
+        Creates the slides of the sections in the presentation of the sermon.
+
+        Args:
+            sections (list): The extracted sections (SectionResult objects), in document order.
+        """
+        sermon = self.sermon
+        pool = WorkerPool.get(sermon.settings, sermon.powerpoint_template_filename, self.workers)
+        shared_assets = SharedAssets([section for section in sections if section.tag in self.section_tags],
+                                     sermon.settings.get_setting("parallel-shared_memory_min_bytes", 65536))
+        futures = {}
+        try:
+            futures = {index: pool.executor.submit(_render_section, shared_assets.share(section))
+                       for index, section in enumerate(sections) if section.tag in self.section_tags}
+
+            for index, section in enumerate(sections):
+                if index in futures:
+                    first_new_slide = len(sermon.powerpoint_presentation.slides)
+                    for snapshot in futures[index].result():
+                        snapshot.add_to(sermon.powerpoint_presentation)
+                    sermon.record_slide_sources(first_new_slide, section)
+                    sermon.flush_slides()
+                    sermon.current_tag = section.tag
+                    sermon.current_paragraph_index = section.end
+                else:
+                    sermon.process_section(section)
+        finally:
+            # the workers must have read the shared memory before it is released
+            wait(futures.values())
+            shared_assets.close()
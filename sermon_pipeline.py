@@ -0,0 +1,102 @@
+# sermon_pipeline.py
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Marks the end of the sections in the queue
+END_OF_SECTIONS = object()
+
+
+class SermonPipeline:
+    """
+    Runs the extraction and the creation of the slides of a Sermon at the same time.
+
+    A producer thread loads the Word document and extracts the sections (with the stateless
+    extraction API), and hands the images of each section to a small thread pool for optimisation.
+    The calling thread meanwhile loads the PowerPoint template, and then creates the slides of the
+    sections in document order as soon as they are ready. The queue between the two is bounded,
+    so at most queue_depth sections are waiting in memory.
+    """
+
+    def __init__(self, sermon, queue_depth=None, image_workers=None):
+        """
+        Initializes the SermonPipeline.
+
+        Args:
+            sermon (Sermon): The sermon to process.
+            queue_depth (int, optional): The maximum number of extracted sections waiting for their slides.
+                                         Defaults to the "pipeline-queue_depth" setting.
+            image_workers (int, optional): The number of threads that optimise images.
+                                           Defaults to the "pipeline-image_workers" setting.
+        """
+        self.sermon = sermon
+        self.queue_depth = queue_depth or sermon.settings.get_setting("pipeline-queue_depth", 4)
+        self.image_workers = image_workers or sermon.settings.get_setting("pipeline-image_workers", 2)
+
+    def run(self):
+        """
+        Extracts the sections of the Word document and creates their slides in the presentation of the sermon.
+
+        Returns:
+            bool: True if the slides were created, False if the Word document or the template could not be loaded.
+        """
+        sermon = self.sermon
+        sections = queue.Queue(maxsize=self.queue_depth)
+        error = []
+        # set when the slides of a section could not be created: the producer stops extracting
+        cancelled = threading.Event()
+        failure = None
+
+        with ThreadPoolExecutor(max_workers=self.image_workers) as image_pool:
+            producer = threading.Thread(target=self._produce, args=(sections, image_pool, error, cancelled),
+                                        daemon=True)
+            producer.start()
+
+            # Load the template while the producer reads the Word document
+            sermon.create_powerpoint_presentation()
+            created = sermon.powerpoint_presentation is not None
+
+            while True:
+                item = sections.get()
+                if item is END_OF_SECTIONS:
+                    break
+                # Keep emptying the queue when there is no presentation (or a section failed),
+                # so the producer does not block
+                if created and failure is None:
+                    try:
+                        sermon.process_section(item.result())
+                    except Exception as e:
+                        failure = e
+                        cancelled.set()
+            producer.join()
+
+        if failure is not None:
+            raise failure
+        if error:
+            raise error[0]
+        return created and sermon.word_document is not None
+
+    def _produce(self, sections, image_pool, error, cancelled):
+        """
+        Loads the Word document and puts the sections (as futures of their optimised version) in the queue.
+
+        Args:
+            sections (queue.Queue): The queue to the consumer.
+            image_pool (ThreadPoolExecutor): The pool that optimises the images.
+            error (list): Receives the exception if the producer fails.
+            cancelled (threading.Event): Set when the consumer stops creating slides.
+        """
+        try:
+            sermon = self.sermon
+            sermon.load_word_document()
+            view = sermon.get_document_view()
+            if view is not None:
+                sermon.num_paragraphs = len(view)
+                for section in sermon.iter_sections(view):
+                    if cancelled.is_set():
+                        break
+                    sections.put(image_pool.submit(sermon.image_optimiser.optimise_section, section))
+        except Exception as e:
+            error.append(e)
+        finally:
+            sections.put(END_OF_SECTIONS)
@@ -0,0 +1,275 @@
+# sermon_plan.py
+import hashlib
+import json
+import os
+
+
+class SlidePlanner:
+    """
+    Describes the slides a Word document will get, without making a presentation (a dry run).
+
+    The plan follows create_section_slides: per section the slides with their layout, title, text, number
+    of lines, images and (for readings from the Bible index) the verses. The hymns are divided over slides
+    by plan_hymn_slides and the readings by the extraction (split_text_for_powerpoint), as in the rendering;
+    the template is not loaded and no slides are made. Plans of the same document with other settings can be
+    compared, e.g. to check the number of slides of many documents.
+    """
+
+    def __init__(self, sermon):
+        """
+        Initializes the SlidePlanner.
+
+        Args:
+            sermon (Sermon): The sermon (its settings, hymn library and Bible index are used).
+        """
+        self.sermon = sermon
+        self.settings = sermon.settings
+
+    @staticmethod
+    def get_filename(powerpoint_filename):
+        """
+        Returns the name of the plan of a presentation.
+
+        Args:
+            powerpoint_filename (str): The path of the .pptx file.
+
+        Returns:
+            str: The path of the plan, e.g. "dienst.plan.json" for "dienst.pptx".
+        """
+        return os.path.splitext(powerpoint_filename)[0] + ".plan.json"
+
+    def plan_slide(self, layout_key, title=None, text=None, images=()):
+        """
+        Returns the plan of one slide.
+
+        Args:
+            layout_key (str): The setting with the layout of the slide, e.g. "slide-layout-lied".
+            title (str, optional): The title. Defaults to None.
+            text (str, optional): The text of the body. Defaults to None.
+            images (iterable, optional): The images (bytes). Defaults to ().
+
+        Returns:
+            dict: The layout (key and index), title, text, number of lines and images (SHA-256) of the slide.
+        """
+        return {
+            "layout": layout_key,
+            "layout_index": self.settings.get_setting(layout_key),
+            "title": title,
+            "text": text,
+            "lines": len(text.split("\n")) if text else 0,
+            "images": [hashlib.sha256(image).hexdigest() for image in images],
+        }
+
+    def plan_section(self, section):
+        """
+        Returns the plans of the slides of one section (see SermonCreate.create_section_slides).
+
+        Args:
+            section (SectionResult): The extracted section.
+
+        Returns:
+            list: The plans of the slides (see plan_slide).
+        """
+        planners = {
+            "hymn": self.plan_hymn,
+            "offering": self.plan_offering,
+            "intro": self.plan_intro,
+            "reading": self.plan_reading,
+            "outro": self.plan_outro,
+            "illustration": self.plan_illustration,
+        }
+        return planners[section.tag](section.data) if section.tag in planners else []
+
+    def plan_hymn(self, data):
+        """
+        Returns the plans of the slides of a hymn (see SermonCreate.create_hymn_slides).
+
+        Args:
+            data (tuple): (title, hymn_data) of the section.
+
+        Returns:
+            list: The plans of the slides.
+        """
+        title, hymn_data = data
+        images = [hymn["images"][0] for hymn in hymn_data if hymn["images"]]
+        image = images[0] if images else None
+        hymn_parts = [hymn["text"] for hymn in hymn_data if hymn["text"]]
+        if not image and not hymn_parts:
+            return []
+        slides = []
+        layout_key = "slide-layout-lied-image" if image else "slide-layout-lied"
+        for slide_number, slide_text in enumerate(self.sermon.plan_hymn_slides(hymn_parts, bool(image))):
+            if slide_number == 0:
+                slides.append(self.plan_slide(layout_key, title or None, slide_text, [image] if image else []))
+            else:
+                slides.append(self.plan_slide("slide-layout-lied-no-title", None, slide_text))
+        slides.append(self.plan_slide("slide-layout-empty"))
+        return slides
+
+    def get_reading_verses(self, title, reading_data):
+        """
+        Returns the numbers of the verses that begin on each slide of a reading from the Bible index
+        (every verse begins on a new line with its number, see SermonExtract.split_verses_for_powerpoint).
+
+        Args:
+            title (str): The title of the reading.
+            reading_data (list): The text of each slide of the reading.
+
+        Returns:
+            list: The verse numbers per slide, or None if the reading is not taken from the Bible index.
+        """
+        bible_index = self.sermon.bible_index
+        verses = bible_index.get_verses(title) if bible_index is not None and title else None
+        if not verses:
+            return None
+        numbers = [number for number, _ in verses]
+        position = 0
+        slide_verses = []
+        for reading in reading_data:
+            slide_verses.append([])
+            for line in reading["text"].split("\n"):
+                if position < len(numbers) and line.startswith(f"{numbers[position]} "):
+                    slide_verses[-1].append(numbers[position])
+                    position += 1
+        return slide_verses
+
+    def plan_reading(self, data):
+        """
+        Returns the plans of the slides of a reading (see SermonCreate.create_reading_slides).
+
+        Args:
+            data (tuple): (title, reading_data) of the section.
+
+        Returns:
+            list: The plans of the slides.
+        """
+        title, reading_data = data
+        slide_verses = self.get_reading_verses(title, reading_data)
+        slides = []
+        layout_key = "slide-layout-reading"
+        for number, reading in enumerate(reading_data):
+            slide = self.plan_slide(layout_key, title if number == 0 and title else None, reading["text"])
+            if slide_verses is not None:
+                slide["verses"] = slide_verses[number]
+            slides.append(slide)
+            if title:
+                layout_key = "slide-layout-reading-no-title"
+        slides.append(self.plan_slide("slide-layout-empty"))
+        return slides
+
+    def fill_template(self, template_key, fields, data):
+        """
+        Returns the text of a slide made from a template of the settings (see SermonCreate.fill_template_with_data).
+
+        Args:
+            template_key (str): The setting with the template, e.g. "powerpoint-intro_template".
+            fields (list): The fields of the template.
+            data (dict): The values of the fields.
+
+        Returns:
+            str: The text.
+        """
+        # a copy, as fill_template_with_data changes the list
+        template = list(self.settings.get_setting(template_key))
+        return "\n".join(self.sermon.fill_template_with_data(fields, data, template))
+
+    def plan_intro(self, data):
+        """
+        Returns the plans of the slides of the intro (see SermonCreate.create_intro_slides).
+
+        Args:
+            data (dict): The intro data.
+
+        Returns:
+            list: The plans of the slides.
+        """
+        title = self.settings.get_setting("powerpoint-intro_title")
+        text = self.fill_template("powerpoint-intro_template", ["date", "parson", "theme", "organist"], data)
+        return [
+            self.plan_slide("slide-layout-intro-1", title, text),
+            self.plan_slide("slide-layout-intro-2", title, text),
+            self.plan_slide("slide-layout-intro-2", data.get("performed_piece") or title, text),
+            self.plan_slide("slide-layout-empty"),
+        ]
+
+    def plan_offering(self, data):
+        """
+        Returns the plans of the slides of the offering (see SermonCreate.create_offering_slides).
+
+        Args:
+            data (dict): The offering data.
+
+        Returns:
+            list: The plans of the slides.
+        """
+        text = self.fill_template("powerpoint-offering_template", ["offering_goal", "bank_account_number"], data)
+        return [self.plan_slide("slide-layout-offering", None, text), self.plan_slide("slide-layout-empty")]
+
+    def plan_outro(self, data):
+        """
+        Returns the plans of the slides of the outro (see SermonCreate.create_outro_slides).
+
+        Args:
+            data (tuple): (date, parson, performed_piece) of the section.
+
+        Returns:
+            list: The plans of the slides.
+        """
+        date, parson, performed_piece = data
+        title = self.settings.get_setting("powerpoint-outro_title")
+        text = self.fill_template("powerpoint-outro_template", ["date", "parson"], {"parson": parson, "date": date})
+        return [self.plan_slide("slide-layout-outro-1", performed_piece or title, text),
+                self.plan_slide("slide-layout-outro-2", title, text)]
+
+    def plan_illustration(self, image_data):
+        """
+        Returns the plans of the slides of an illustration (see SermonCreate.create_illustration_slides).
+
+        Args:
+            image_data (bytes): The image, or None.
+
+        Returns:
+            list: The plans of the slides.
+        """
+        if image_data is None:
+            return []
+        return [self.plan_slide("slide-layout-intro-2", None, None, [image_data]),
+                self.plan_slide("slide-layout-empty")]
+
+    def build(self, sections):
+        """
+        Builds the plan of a presentation.
+
+        Args:
+            sections (iterable): The extracted sections (SectionResult objects), in document order.
+
+        Returns:
+            dict: The sections with their paragraph range and slides, and the number of slides.
+        """
+        planned_sections = []
+        number = 0
+        for section in sections:
+            slides = self.plan_section(section)
+            for slide in slides:
+                number += 1
+                slide["number"] = number
+            planned_sections.append({"section": section.tag, "paragraphs": [section.begin, section.end],
+                                     "slide_count": len(slides), "slides": slides})
+        return {"document": self.sermon.word_filename, "slide_count": number, "sections": planned_sections}
+
+    def write(self, sections, powerpoint_filename):
+        """
+        Writes the plan of a presentation as JSON.
+
+        Args:
+            sections (iterable): The extracted sections (SectionResult objects), in document order.
+            powerpoint_filename (str): The path of the .pptx file; the plan is written next to it.
+
+        Returns:
+            dict: The plan.
+        """
+        plan = self.build(sections)
+        with open(self.get_filename(powerpoint_filename), "w", encoding="utf-8") as file:
+            json.dump(plan, file, indent=2, sort_keys=True, ensure_ascii=False)
+            file.write("\n")
+        return plan
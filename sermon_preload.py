@@ -0,0 +1,25 @@
+# sermon_preload.py
+# Imported by the fork server of the worker processes (see WorkerPool) before it forks the workers,
+# so every worker starts with the modules, the settings and the template snapshot already loaded.
+import os
+from .sermon_core import Sermon  # python-docx, python-pptx, lxml and PIL
+from .sermon_template import TemplateSnapshot
+from .settings import Settings
+
+
+def preload():
+    """
+    Loads the settings and the snapshot of the template of the settings.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    settings = Settings(current_dir)
+    template_filename = os.path.join(current_dir, settings.get_setting("powerpoint_template_filename"))
+    if not os.path.exists(template_filename):
+        return  # the workers load the template that is used
+    try:
+        TemplateSnapshot.load(template_filename)
+    except Exception as e:
+        print(f"An error occurred while preloading the PowerPoint template: {e}")
+
+
+preload()
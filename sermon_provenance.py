@@ -0,0 +1,185 @@
+# sermon_provenance.py
+import json
+import os
+import re
+from collections import namedtuple
+
+# Where one slide was made from:
+# - tag, begin, end: the section of the slide (see SectionResult)
+# - first, last: the first and last paragraph of the section with text that is on the slide
+#                (the paragraphs of the whole section if no text of the slide is found in them)
+SlideSource = namedtuple("SlideSource", ["tag", "begin", "end", "first", "last"])
+
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+# The sections whose text is divided over their slides (the other sections show the same data on every slide)
+PAGINATED_SECTION_TAGS = ("hymn", "reading")
+
+
+class SlideProvenance:
+    """
+    Maps the slides of a presentation to the paragraphs of the Word document they were made from, and back.
+
+    The map is kept with the sermon after the presentation is saved (Sermon.slide_provenance), and can be written
+    as JSON next to the presentation ("provenance-write" setting). A slide that looks wrong can be looked up in
+    the Word document with get_source, and the slides of a changed paragraph can be found with get_slides.
+    """
+
+    def __init__(self, sources, document=None):
+        """
+        Initializes the SlideProvenance.
+
+        Args:
+            sources (list): The SlideSource of each slide (or None if the slide was not made from a section),
+                            in presentation order.
+            document (str, optional): The Word document. Defaults to None.
+        """
+        self.sources = list(sources)
+        self.document = document
+        # the numbers of the slides of each paragraph
+        self.paragraph_slides = {}
+        for number, source in enumerate(self.sources, start=1):
+            if source is not None:
+                for paragraph in range(source.first, source.last + 1):
+                    self.paragraph_slides.setdefault(paragraph, []).append(number)
+
+    @classmethod
+    def from_presentation(cls, prs, slide_sources, document=None):
+        """
+        Creates the map of a presentation.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+            slide_sources (dict): The SlideSource of each slide, by slide id (see Sermon.record_slide_sources).
+            document (str, optional): The Word document. Defaults to None.
+
+        Returns:
+            SlideProvenance: The map.
+        """
+        return cls([slide_sources.get(slide.slide_id) for slide in prs.slides], document)
+
+    @staticmethod
+    def get_filename(powerpoint_filename):
+        """
+        Returns the name of the map of a presentation.
+
+        Args:
+            powerpoint_filename (str): The path of the .pptx file.
+
+        Returns:
+            str: The path of the map, e.g. "dienst.sources.json" for "dienst.pptx".
+        """
+        return os.path.splitext(powerpoint_filename)[0] + ".sources.json"
+
+    @staticmethod
+    def get_slide_text(slide):
+        """
+        Returns the text lines of a slide.
+
+        Args:
+            slide (pptx.slide.Slide): The slide.
+
+        Returns:
+            list: The lines of the text frames of the slide, with their white space normalised; no empty lines.
+        """
+        lines = []
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                for line in shape.text_frame.text.split("\n"):
+                    line = WHITESPACE_REGEX.sub(" ", line).strip()
+                    if line:
+                        lines.append(line)
+        return lines
+
+    @staticmethod
+    def match_paragraphs(view, section, slide_lines):
+        """
+        Finds the paragraphs of a section that the text of each of its slides comes from.
+
+        In hymns and readings (PAGINATED_SECTION_TAGS) the text is divided over the slides, so their lines are looked
+        up in order: a line belongs to the first paragraph (from the paragraph of the previous line on, also of the
+        previous slide) that contains it. The other sections show the same data on every slide, in their own order,
+        so each line of their slides is looked up from the beginning of the section. Lines that are not in the
+        section (e.g. text from the settings or the Bible index) are skipped.
+
+        Args:
+            view (DocumentView): The Word document, or None (then every slide gets the whole section).
+            section (SectionResult): The section.
+            slide_lines (list): The text lines of each slide of the section (see get_slide_text).
+
+        Returns:
+            list: (first, last) paragraph per slide.
+        """
+        if view is None:
+            last_paragraph = section.end
+            paragraphs = []
+        else:
+            last_paragraph = min(section.end, len(view) - 1)
+            paragraphs = [WHITESPACE_REGEX.sub(" ", view[index].text)
+                          for index in range(section.begin, last_paragraph + 1)]
+        paginated = section.tag in PAGINATED_SECTION_TAGS
+        position = 0
+        ranges = []
+        for lines in slide_lines:
+            matched = []
+            for line in lines:
+                for index in range(position if paginated else 0, len(paragraphs)):
+                    if line in paragraphs[index]:
+                        matched.append(index)
+                        position = index
+                        break
+            if matched:
+                ranges.append((section.begin + min(matched), section.begin + max(matched)))
+            else:
+                ranges.append((section.begin, last_paragraph))
+        return ranges
+
+    def get_source(self, number):
+        """
+        Returns where a slide was made from.
+
+        Args:
+            number (int): The number of the slide (1 for the first slide).
+
+        Returns:
+            SlideSource: The section and paragraphs of the slide, or None if it is not known.
+        """
+        return self.sources[number - 1] if 1 <= number <= len(self.sources) else None
+
+    def get_slides(self, paragraph):
+        """
+        Returns the slides made from a paragraph.
+
+        Args:
+            paragraph (int): The index of the paragraph in the Word document.
+
+        Returns:
+            list: The numbers of the slides, in presentation order.
+        """
+        return list(self.paragraph_slides.get(paragraph, []))
+
+    def build(self):
+        """
+        Builds the JSON form of the map.
+
+        Returns:
+            dict: The source of each slide, and the slides of each paragraph.
+        """
+        slides = []
+        for number, source in enumerate(self.sources, start=1):
+            tag, begin, end, first, last = source if source is not None else (None,) * 5
+            slides.append({"number": number, "section": tag, "section_paragraphs": [begin, end],
+                           "paragraphs": [first, last]})
+        paragraphs = {str(paragraph): numbers for paragraph, numbers in sorted(self.paragraph_slides.items())}
+        return {"document": self.document, "slides": slides, "paragraphs": paragraphs}
+
+    def write(self, powerpoint_filename):
+        """
+        Writes the map as JSON next to a presentation.
+
+        Args:
+            powerpoint_filename (str): The path of the .pptx file.
+        """
+        with open(self.get_filename(powerpoint_filename), "w", encoding="utf-8") as file:
+            json.dump(self.build(), file, indent=2, sort_keys=True, ensure_ascii=False)
+            file.write("\n")
@@ -0,0 +1,141 @@
+# sermon_slide_snapshot.py
+import io
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import serialize_part_xml
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import qn
+from .sermon_utils import SermonUtils
+
+
+class SlideSnapshot:
+    """
+    A slide taken out of a presentation as plain, picklable data: the slide XML, the position of
+    its layout in the template and the targets of its relationships (image bytes or external URLs).
+
+    A snapshot can be made in one process (or stored) and added to another presentation based on the
+    same template. Adding snapshots one by one gives the same part names, relationship ids and shared
+    image parts as creating the slides in that presentation, no matter where the snapshots were made.
+    """
+
+    __slots__ = ("xml", "layout", "relationships")
+
+    def __init__(self, xml, layout, relationships):
+        """
+        Initializes the SlideSnapshot.
+
+        Args:
+            xml (bytes): The serialized slide XML (p:sld).
+            layout (tuple): (master index, layout index) of the slide layout in the presentation.
+            relationships (tuple): (rId, reltype, is_external, target) per relationship of the slide,
+                                   where target is the image bytes, or the URL for an external relationship.
+        """
+        self.xml = xml
+        self.layout = layout
+        self.relationships = relationships
+
+    def __getstate__(self):
+        return self.xml, self.layout, self.relationships
+
+    def __setstate__(self, state):
+        self.xml, self.layout, self.relationships = state
+
+    @classmethod
+    def from_slide(cls, slide):
+        """
+        Takes a snapshot of a slide.
+
+        Args:
+            slide (pptx.slide.Slide): The slide.
+
+        Returns:
+            SlideSnapshot: The snapshot of the slide.
+
+        Raises:
+            ValueError: If the slide refers to a part that is not an image (e.g. a chart or a video).
+        """
+        prs = slide.part.package.presentation_part.presentation
+        layout = None
+        for master_index, master in enumerate(prs.slide_masters):
+            for layout_index, slide_layout in enumerate(master.slide_layouts):
+                if slide_layout == slide.slide_layout:
+                    layout = (master_index, layout_index)
+
+        relationships = []
+        for rId, rel in sorted(slide.part.rels.items()):
+            if rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+                continue
+            if rel.is_external:
+                relationships.append((rId, rel.reltype, True, rel.target_ref))
+            elif rel.reltype == RT.IMAGE:
+                relationships.append((rId, rel.reltype, False, rel.target_part.blob))
+            else:
+                raise ValueError(f"Unsupported relationship {rel.reltype} on slide {slide.slide_id}")
+        return cls(serialize_part_xml(slide.element), layout, tuple(relationships))
+
+    def add_to(self, prs):
+        """
+        Adds the slide of the snapshot at the end of a presentation.
+        Images that are already in the presentation (with the same content) are reused.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation, based on the same template.
+
+        Returns:
+            pptx.slide.Slide: The new slide.
+        """
+        master_index, layout_index = self.layout
+        slide = prs.slides.add_slide(prs.slide_masters[master_index].slide_layouts[layout_index])
+        element = parse_xml(self.xml)
+
+        # Relate the new slide to the (shared) targets, and renumber the relationship ids in the XML
+        rId_map = {}
+        for rId, reltype, is_external, target in self.relationships:
+            if is_external:
+                rId_map[rId] = slide.part.relate_to(target, reltype, is_external=True)
+            else:
+                image_part = prs.part.package.get_or_add_image_part(io.BytesIO(target))
+                rId_map[rId] = slide.part.relate_to(image_part, reltype)
+        SermonUtils.replace_relationship_ids(element, rId_map.get)
+
+        self.replace_slide_content(slide, element)
+        return slide
+
+    @staticmethod
+    def replace_slide_content(slide, element):
+        """
+        Replaces the content of a slide by the content of a p:sld element.
+        The shape tree element of the slide is kept (and refilled), so the slide object stays usable.
+
+        Args:
+            slide (pptx.slide.Slide): The slide to change.
+            element: The p:sld element with the new content.
+        """
+        slide_element = slide.element
+        for attribute, value in element.attrib.items():
+            slide_element.set(attribute, value)
+
+        # the common slide data: background and shape tree
+        c_sld, new_c_sld = slide_element.cSld, element.cSld
+        for attribute, value in new_c_sld.attrib.items():
+            c_sld.set(attribute, value)
+        sp_tree = c_sld.spTree
+        for child in list(c_sld):
+            if child is not sp_tree:
+                c_sld.remove(child)
+        for child in list(sp_tree):
+            sp_tree.remove(child)
+        for child in list(new_c_sld):
+            if child.tag == qn("p:spTree"):
+                sp_tree.extend(list(child))
+            elif child.tag == qn("p:bg"):
+                sp_tree.addprevious(child)
+            else:
+                c_sld.append(child)
+
+        # the other slide data (color map override, transition, timing, ...)
+        for child in list(slide_element):
+            if child is not c_sld:
+                slide_element.remove(child)
+        for child in list(element):
+            if child.tag != qn("p:cSld"):
+                slide_element.append(child)
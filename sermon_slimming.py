@@ -0,0 +1,95 @@
+# sermon_slimming.py
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+
+
+class TemplateSlimmer:
+    """
+    Removes the parts of the template that the slides of a presentation do not use.
+
+    A presentation keeps everything of its template: all slide layouts and masters with their media,
+    the notes and handout masters, and the thumbnail of the template. Parts are only written when
+    they can be reached from the package relationships, so dropping the relationships to unused
+    layouts, masters, and so on removes them (and everything only they refer to) from the saved
+    presentation. The slides, and the layouts and masters they use, are not changed.
+    """
+
+    def slim(self, prs):
+        """
+        Removes the unused layouts, masters, notes and handout masters and the thumbnail of a presentation.
+        A presentation without slides is not changed.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+
+        Returns:
+            tuple: (number of removed parts, total size of the removed parts in bytes).
+        """
+        slides = list(prs.slides)
+        if not slides:
+            return 0, 0
+        package = prs.part.package
+        parts_before = set(package.iter_parts())
+
+        used_layouts = {slide.part.part_related_by(RT.SLIDE_LAYOUT) for slide in slides}
+        self.remove_unused_layouts(prs, used_layouts)
+        self.remove_unused_masters(prs)
+        if not any(slide.has_notes_slide for slide in slides):
+            self.remove_master_list(prs, "p:notesMasterIdLst", "p:notesMasterId")
+        self.remove_master_list(prs, "p:handoutMasterIdLst", "p:handoutMasterId")
+        for rId, rel in list(package._rels.items()):
+            if rel.reltype == RT.THUMBNAIL:
+                # the thumbnail shows the template, not the created presentation
+                package._rels.pop(rId)
+
+        removed_parts = parts_before - set(package.iter_parts())
+        return len(removed_parts), sum(len(part.blob) for part in removed_parts)
+
+    def remove_unused_layouts(self, prs, used_layouts):
+        """
+        Removes the slide layouts that are not used by a slide from their masters.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+            used_layouts (set): The parts of the slide layouts that are used.
+        """
+        for master in prs.slide_masters:
+            master_part = master.part
+            sld_layout_id_lst = master_part._element.get_or_add_sldLayoutIdLst()
+            for sld_layout_id in list(sld_layout_id_lst.sldLayoutId_lst):
+                if master_part.related_part(sld_layout_id.rId) not in used_layouts:
+                    sld_layout_id_lst.remove(sld_layout_id)
+                    master_part.drop_rel(sld_layout_id.rId)
+
+    def remove_unused_masters(self, prs):
+        """
+        Removes the slide masters that have no slide layouts left from the presentation.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+        """
+        presentation_part = prs.part
+        sld_master_id_lst = presentation_part._element.get_or_add_sldMasterIdLst()
+        for sld_master_id in list(sld_master_id_lst.sldMasterId_lst):
+            master_part = presentation_part.related_part(sld_master_id.rId)
+            if not master_part._element.get_or_add_sldLayoutIdLst().sldLayoutId_lst:
+                sld_master_id_lst.remove(sld_master_id)
+                presentation_part.drop_rel(sld_master_id.rId)
+
+    def remove_master_list(self, prs, list_tag, id_tag):
+        """
+        Removes a notes or handout master from the presentation.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+            list_tag (str): The tag of the list element in presentation.xml, e.g. "p:notesMasterIdLst".
+            id_tag (str): The tag of the master id elements in the list, e.g. "p:notesMasterId".
+        """
+        presentation_part = prs.part
+        id_list = presentation_part._element.find(qn(list_tag))
+        if id_list is None:
+            return
+        rIds = [master_id.get(qn("r:id")) for master_id in id_list.findall(qn(id_tag))]
+        presentation_part._element.remove(id_list)
+        for rId in rIds:
+            presentation_part.drop_rel(rId)
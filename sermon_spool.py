@@ -0,0 +1,314 @@
+# sermon_spool.py
+import copy
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+
+# The folders of a spool directory
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+RECORDS = "records"
+WORK = "work"
+
+
+class WorkQueue:
+    """
+    A queue of Word documents to render, in a directory that several machines (or processes) share.
+
+    Layout of the spool directory:
+        pending/<job>.docx    jobs that wait for a worker
+        claimed/<worker>/<job>.docx
+                              jobs that a worker is rendering; the modification time is the last heartbeat
+        done/<job>.*          the Word document, the presentation (and its manifest) of finished jobs
+        failed/<job>.docx     jobs that failed "spool-max_attempts" times
+        records/<job>.json    the status record of a job: its state, attempts and the workers that ran it
+        work/<worker>/        the files a worker is writing
+
+    A worker claims a job by renaming it from pending to its own folder in claimed: a rename is atomic, so only
+    one worker gets it. While rendering, the worker touches its claimed file every "spool-heartbeat_seconds".
+    A claimed job without a heartbeat for "spool-lease_seconds" belongs to a worker that stopped; any worker
+    moves it back to pending, so it is retried. A slow worker that lost its lease notices it when its heartbeat
+    or the final rename of its claimed file fails; its result is then not used, so only the worker that holds
+    a job moves its results and writes its record.
+    """
+
+    def __init__(self, settings, directory, worker_id=None):
+        """
+        Initializes the WorkQueue, and creates the folders of the spool directory if needed.
+
+        Args:
+            settings (Settings): The settings (the lease, heartbeat, poll and attempt settings, and for the Sermon).
+            directory (str): The spool directory.
+            worker_id (str, optional): The name of this worker. Defaults to the host name and process id.
+        """
+        self.settings = settings
+        self.directory = directory
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = settings.get_setting("spool-lease_seconds", 300)
+        self.heartbeat_seconds = settings.get_setting("spool-heartbeat_seconds", 30)
+        self.poll_seconds = settings.get_setting("spool-poll_seconds", 5)
+        self.max_attempts = settings.get_setting("spool-max_attempts", 3)
+        for folder in (PENDING, CLAIMED, DONE, FAILED, RECORDS, WORK):
+            os.makedirs(os.path.join(directory, folder), exist_ok=True)
+
+    def get_path(self, folder, filename):
+        """
+        Returns the path of a file in a folder of the spool directory.
+
+        Args:
+            folder (str): The folder, e.g. PENDING.
+            filename (str): The name of the file.
+
+        Returns:
+            str: The path.
+        """
+        return os.path.join(self.directory, folder, filename)
+
+    def write_file(self, path, data):
+        """
+        Writes a file atomically: readers (on any machine) see either the old or the complete new file.
+
+        Args:
+            path (str): The path of the file.
+            data (bytes): The content.
+        """
+        temporary_path = f"{path}.{self.worker_id}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+    def read_record(self, job):
+        """
+        Returns the status record of a job.
+
+        Args:
+            job (str): The name of the job.
+
+        Returns:
+            dict: The record (a new record if the job has none yet).
+        """
+        try:
+            with open(self.get_path(RECORDS, job + ".json"), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"job": job, "state": PENDING, "attempts": 0, "history": []}
+
+    def write_record(self, job, record, state, **details):
+        """
+        Updates the status record of a job. Only the worker that holds the job writes its record.
+
+        Args:
+            job (str): The name of the job.
+            record (dict): The record.
+            state (str): The new state of the job.
+            **details: Values to add to the history entry.
+        """
+        record["state"] = state
+        record["history"].append(dict(details, state=state, worker=self.worker_id, time=time.time()))
+        self.write_file(self.get_path(RECORDS, job + ".json"),
+                        json.dumps(record, indent=2, sort_keys=True).encode("utf-8"))
+
+    def submit(self, word_filename, job=None):
+        """
+        Adds a Word document to the queue.
+
+        Args:
+            word_filename (str): The path of the Word document.
+            job (str, optional): The name of the job. Defaults to the file name without extension.
+
+        Returns:
+            str: The name of the job.
+        """
+        job = job or os.path.splitext(os.path.basename(word_filename))[0]
+        with open(word_filename, "rb") as file:
+            self.write_file(self.get_path(PENDING, job + ".docx"), file.read())
+        self.write_record(job, self.read_record(job), PENDING, source=os.path.basename(word_filename))
+        return job
+
+    def get_claimed_path(self, job, worker_id=None):
+        """
+        Returns the path of a job claimed by a worker.
+
+        Args:
+            job (str): The name of the job.
+            worker_id (str, optional): The worker. Defaults to this worker.
+
+        Returns:
+            str: The path of the claimed file.
+        """
+        return os.path.join(self.directory, CLAIMED, worker_id or self.worker_id, job + ".docx")
+
+    def list_claimed(self):
+        """
+        Returns the claimed jobs of all workers.
+
+        Returns:
+            list: (worker, job) tuples.
+        """
+        claimed = []
+        for worker_id in os.listdir(os.path.join(self.directory, CLAIMED)):
+            try:
+                filenames = os.listdir(os.path.join(self.directory, CLAIMED, worker_id))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            claimed.extend((worker_id, os.path.splitext(filename)[0])
+                           for filename in filenames if filename.endswith(".docx"))
+        return claimed
+
+    def claim(self):
+        """
+        Claims the oldest pending job.
+
+        Returns:
+            str: The name of the job, or None if no job is pending.
+        """
+        pending = []
+        for filename in os.listdir(os.path.join(self.directory, PENDING)):
+            if filename.endswith(".docx"):
+                try:
+                    pending.append((os.path.getmtime(self.get_path(PENDING, filename)), filename))
+                except FileNotFoundError:
+                    continue  # claimed by another worker
+        os.makedirs(os.path.join(self.directory, CLAIMED, self.worker_id), exist_ok=True)
+        for _, filename in sorted(pending):
+            claimed_path = self.get_claimed_path(os.path.splitext(filename)[0])
+            try:
+                os.rename(self.get_path(PENDING, filename), claimed_path)
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            os.utime(claimed_path)  # the first heartbeat
+            return os.path.splitext(filename)[0]
+        return None
+
+    def requeue_expired(self):
+        """
+        Moves the claimed jobs whose lease expired back to pending (or to failed after too many attempts).
+
+        Returns:
+            list: The names of the jobs that were moved.
+        """
+        moved = []
+        now = time.time()
+        for worker_id, job in self.list_claimed():
+            claimed_path = self.get_claimed_path(job, worker_id)
+            try:
+                if os.path.getmtime(claimed_path) + self.lease_seconds > now:
+                    continue
+            except FileNotFoundError:
+                continue
+            record = self.read_record(job)
+            folder = PENDING if record["attempts"] < self.max_attempts else FAILED
+            try:
+                os.rename(claimed_path, self.get_path(folder, job + ".docx"))
+            except FileNotFoundError:
+                continue  # finished, or moved by another worker
+            self.write_record(job, record, folder, reason="lease expired")
+            moved.append(job)
+        return moved
+
+    def heartbeat(self, job, stop, lost):
+        """
+        Touches the claimed file of a job until stop is set (runs in a thread). Sets lost when the job
+        is not claimed by this worker anymore (the lease expired and another worker moved it).
+
+        Args:
+            job (str): The name of the job.
+            stop (threading.Event): Set when the job is finished.
+            lost (threading.Event): Set when the lease is lost.
+        """
+        while not stop.wait(self.heartbeat_seconds):
+            try:
+                os.utime(self.get_claimed_path(job))
+            except FileNotFoundError:
+                lost.set()
+                return
+
+    def render(self, job, **options):
+        """
+        Renders a claimed job with a Sermon, and moves the results to done (or the job back to pending,
+        or to failed after "spool-max_attempts" attempts).
+
+        Args:
+            job (str): The name of the job.
+            **options: The options of Sermon.process_sermon (e.g. workers, deterministic).
+
+        Returns:
+            bool: True if the presentation was made.
+        """
+        from .sermon_core import Sermon
+        record = self.read_record(job)
+        record["attempts"] += 1
+        self.write_record(job, record, CLAIMED)
+
+        work_directory = os.path.join(self.directory, WORK, self.worker_id)
+        shutil.rmtree(work_directory, ignore_errors=True)
+        os.makedirs(work_directory)
+        word_filename = os.path.join(work_directory, job + ".docx")
+        shutil.copyfile(self.get_claimed_path(job), word_filename)
+
+        stop, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(job, stop, lost), daemon=True)
+        heartbeat.start()
+        try:
+            # every job gets its own settings, so nothing of an earlier job is left in them
+            sermon = Sermon(copy.deepcopy(self.settings))
+            sermon.set_word_filename(word_filename)
+            sermon.process_sermon(**options)
+            succeeded = sermon.powerpoint_presentation is not None and os.path.exists(sermon.powerpoint_filename)
+        except Exception as e:
+            print(f"An error occurred while rendering job '{job}': {e}")
+            succeeded = False
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if succeeded:
+            folder = DONE
+        else:
+            folder = PENDING if record["attempts"] < self.max_attempts else FAILED
+        # the rename of the claimed file of this worker is atomic: after it, no other worker can take the job
+        if not lost.is_set():
+            try:
+                os.rename(self.get_claimed_path(job), self.get_path(folder, job + ".docx"))
+            except FileNotFoundError:
+                lost.set()  # the lease expired just now
+        if lost.is_set():
+            print(f"Job '{job}' was given to another worker, its result is not used.")
+            shutil.rmtree(work_directory, ignore_errors=True)
+            return False
+        if succeeded:
+            for filename in os.listdir(work_directory):
+                if filename != job + ".docx" and not filename.endswith(".tmp"):
+                    os.replace(os.path.join(work_directory, filename), self.get_path(DONE, filename))
+        self.write_record(job, record, folder)
+        shutil.rmtree(work_directory, ignore_errors=True)
+        return succeeded
+
+    def work(self, follow=False, **options):
+        """
+        Renders jobs until the queue is empty (or, with follow, until the process is stopped).
+
+        Args:
+            follow (bool, optional): If True, waits for new jobs when the queue is empty. Defaults to False.
+            **options: The options of Sermon.process_sermon.
+
+        Returns:
+            int: The number of jobs that were rendered.
+        """
+        rendered = 0
+        while True:
+            self.requeue_expired()
+            job = self.claim()
+            if job is None:
+                if not follow and not self.list_claimed():
+                    return rendered
+                # wait for new jobs, or for the leases of other workers to expire
+                time.sleep(self.poll_seconds)
+                continue
+            if self.render(job, **options):
+                rendered += 1
@@ -0,0 +1,148 @@
+# sermon_styles.py
+from pptx.dml.color import RGBColor
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.oxml.ns import qn
+from pptx.text.text import Font
+from pptx.util import Pt
+
+# Placeholders that get the title style, and placeholders that get the content style
+TITLE_PLACEHOLDER_TYPES = (PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE)
+CONTENT_PLACEHOLDER_TYPES = (PP_PLACEHOLDER.BODY, PP_PLACEHOLDER.SUBTITLE, PP_PLACEHOLDER.OBJECT)
+
+# The children of a:lstStyle and of a:lvl1pPr that come after the elements that are added
+LIST_STYLE_SUCCESSORS = ("a:lvl2pPr", "a:lvl3pPr", "a:lvl4pPr", "a:lvl5pPr", "a:lvl6pPr", "a:lvl7pPr",
+                         "a:lvl8pPr", "a:lvl9pPr", "a:extLst")
+BULLET_SUCCESSORS = ("a:tabLst", "a:defRPr", "a:extLst")
+BULLET_TAGS = ("a:buNone", "a:buAutoNum", "a:buChar", "a:buBlip")
+
+
+class TemplateStyles:
+    """
+    Writes the text styles of settings.json into the slide layouts of a presentation.
+
+    The title and content placeholders of every layout get the font, size, color, bold/italic and
+    "no bullet" of the settings as the first level of their list style (a:lstStyle/a:lvl1pPr).
+    Slides inherit these from their layout, so the paragraphs on the slides do not need the same
+    properties each; only exceptions (alignment, a different size on some lines, ...) are set there.
+    """
+
+    def __init__(self, settings):
+        """
+        Initializes the TemplateStyles.
+
+        Args:
+            settings (Settings): The settings with the fonts and colors.
+        """
+        self.settings = settings
+
+    def apply(self, prs):
+        """
+        Writes the title and content styles into all slide layouts of a presentation.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation (usually the template just loaded).
+        """
+        for master in prs.slide_masters:
+            for slide_layout in master.slide_layouts:
+                for placeholder in slide_layout.placeholders:
+                    placeholder_type = placeholder.placeholder_format.type
+                    if placeholder_type in TITLE_PLACEHOLDER_TYPES:
+                        self.set_title_style(self.get_level_properties(placeholder))
+                    elif placeholder_type in CONTENT_PLACEHOLDER_TYPES:
+                        self.set_content_style(self.get_level_properties(placeholder))
+
+    def set_title_style(self, level_properties):
+        """
+        Sets the title style (see SermonUtils.set_title) on the first level of a list style.
+
+        Args:
+            level_properties: The a:lvl1pPr element.
+        """
+        font = self.get_font(level_properties)
+        self.set_color(font)
+        font.size = Pt(self.settings.get_setting("powerpoint-title_font_size"))
+        font.name = self.settings.get_setting("powerpoint-title_font_type")
+        font.italic = True
+        font.bold = True
+
+    def set_content_style(self, level_properties):
+        """
+        Sets the content style (see SermonUtils.set_text_appearance) on the first level of a list style.
+
+        Args:
+            level_properties: The a:lvl1pPr element.
+        """
+        for bullet in level_properties.findall("*"):
+            if bullet.tag in [qn(tag) for tag in BULLET_TAGS]:
+                level_properties.remove(bullet)
+        self.insert_before(level_properties, level_properties.makeelement(qn("a:buNone")), BULLET_SUCCESSORS)
+
+        font = self.get_font(level_properties)
+        self.set_color(font)
+        font.size = Pt(self.settings.get_setting("powerpoint-content_font_size"))
+        font.name = self.settings.get_setting("powerpoint-content_font_type")
+        font.bold = True
+
+    def set_color(self, font):
+        """
+        Sets the text color of the settings on a font.
+
+        Args:
+            font (pptx.text.text.Font): The font.
+        """
+        color = self.settings.get_setting("powerpoint-content_font_color")
+        font.color.rgb = RGBColor(color["red"], color["green"], color["blue"])
+
+    def get_level_properties(self, placeholder):
+        """
+        Returns the first level of the list style of a layout placeholder, and adds it if it is missing.
+
+        Args:
+            placeholder: The placeholder of the slide layout.
+
+        Returns:
+            The a:lvl1pPr element.
+        """
+        tx_body = placeholder.element.get_or_add_txBody()
+        list_style = tx_body.find(qn("a:lstStyle"))
+        if list_style is None:
+            list_style = tx_body.makeelement(qn("a:lstStyle"))
+            tx_body.find(qn("a:bodyPr")).addnext(list_style)
+        level_properties = list_style.find(qn("a:lvl1pPr"))
+        if level_properties is None:
+            level_properties = list_style.makeelement(qn("a:lvl1pPr"))
+            self.insert_before(list_style, level_properties, LIST_STYLE_SUCCESSORS)
+        return level_properties
+
+    def get_font(self, level_properties):
+        """
+        Returns the font of the default run properties of a list style level, and adds them if they are missing.
+
+        Args:
+            level_properties: The a:lvl1pPr element.
+
+        Returns:
+            pptx.text.text.Font: The font.
+        """
+        default_run_properties = level_properties.find(qn("a:defRPr"))
+        if default_run_properties is None:
+            default_run_properties = level_properties.makeelement(qn("a:defRPr"))
+            self.insert_before(level_properties, default_run_properties, ("a:extLst",))
+        return Font(default_run_properties)
+
+    @staticmethod
+    def insert_before(parent, element, successors):
+        """
+        Inserts an element before the first child of a parent that has one of the successor tags,
+        or at the end when there is no such child.
+
+        Args:
+            parent: The parent element.
+            element: The element to insert.
+            successors (tuple): The tags of the children that must come after the element.
+        """
+        for child in parent:
+            if child.tag in [qn(tag) for tag in successors]:
+                child.addprevious(element)
+                return
+        parent.append(element)
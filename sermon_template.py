@@ -0,0 +1,112 @@
+# sermon_template.py
+import copy
+import hashlib
+import threading
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TARGET_MODE as RTM
+from pptx.opc.package import XmlPart, _Relationship
+from pptx.opc.packuri import PACKAGE_URI
+from pptx.package import Package
+
+
+class TemplateSnapshot:
+    """
+    A PowerPoint template, parsed once, from which new presentations are made without reading the zip again.
+
+    The snapshot keeps every part of the template (presentation, masters, layouts, theme, the slides of the
+    template and its media) with its relationships: XML parts as parsed lxml trees, other parts as bytes.
+    A new presentation gets a deep copy of the XML trees (the placeholders of the layouts are in those trees);
+    the bytes of the media are shared, as python-pptx never changes them in place.
+
+    Snapshots are kept per process by the SHA-256 of the template file (see load), so all presentations of a
+    batch, and all sections of a worker process, use the same snapshot.
+    """
+
+    # the snapshots of this process, by SHA-256 of the template file
+    snapshots = {}
+    lock = threading.Lock()
+
+    def __init__(self, prs):
+        """
+        Initializes the TemplateSnapshot from a loaded presentation.
+
+        Args:
+            prs (pptx.presentation.Presentation): The template, as loaded by python-pptx. It is not changed.
+        """
+        package = prs.part.package
+        self.parts = []
+        for part in package.iter_parts():
+            payload = part._element if isinstance(part, XmlPart) else part.blob
+            self.parts.append((part.partname, part.content_type, type(part), payload, self.get_rels(part.rels)))
+        self.package_rels = self.get_rels(package._rels)
+
+    @staticmethod
+    def get_rels(rels):
+        """
+        Returns the relationships of a part (or of the package) by part name.
+
+        Args:
+            rels (pptx.opc.package._Relationships): The relationships.
+
+        Returns:
+            list: (rId, relationship type, target mode, part name or external target) tuples.
+        """
+        return [(rel.rId, rel.reltype, RTM.EXTERNAL if rel.is_external else RTM.INTERNAL,
+                 rel.target_ref if rel.is_external else rel.target_part.partname)
+                for rel in rels.values()]
+
+    @staticmethod
+    def get_hash(template_filename):
+        """
+        Returns the key of a template file.
+
+        Args:
+            template_filename (str): The path of the template.
+
+        Returns:
+            str: The SHA-256 of the file, as hexadecimal digits.
+        """
+        with open(template_filename, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    @classmethod
+    def load(cls, template_filename):
+        """
+        Returns the snapshot of a template, and parses the template if this process has no snapshot of it yet.
+
+        Args:
+            template_filename (str): The path of the template.
+
+        Returns:
+            TemplateSnapshot: The snapshot.
+        """
+        key = cls.get_hash(template_filename)
+        with cls.lock:
+            if key not in cls.snapshots:
+                cls.snapshots[key] = cls(Presentation(template_filename))
+            return cls.snapshots[key]
+
+    def new_presentation(self):
+        """
+        Makes a new presentation with the content of the template.
+
+        Returns:
+            pptx.presentation.Presentation: The presentation.
+        """
+        package = Package(None)
+        parts = {}
+        for partname, content_type, part_class, payload, _ in self.parts:
+            if isinstance(payload, bytes):
+                parts[partname] = part_class(partname, content_type, package, payload)
+            else:
+                parts[partname] = part_class(partname, content_type, package, copy.deepcopy(payload))
+
+        def add_rels(rels, base_uri, snapshot_rels):
+            for rId, reltype, target_mode, target in snapshot_rels:
+                target = target if target_mode == RTM.EXTERNAL else parts[target]
+                rels._rels[rId] = _Relationship(base_uri, rId, reltype, target_mode, target)
+
+        for partname, _, _, _, snapshot_rels in self.parts:
+            add_rels(parts[partname].rels, partname.baseURI, snapshot_rels)
+        add_rels(package._rels, PACKAGE_URI.baseURI, self.package_rels)
+        return package.main_document_part.presentation
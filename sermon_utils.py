@@ -5,7 +5,9 @@ from pptx.dml.color import RGBColor
 from pptx.enum.shapes import PP_PLACEHOLDER
 from pptx.enum.dml import MSO_THEME_COLOR, MSO_LINE
 from pptx.enum.shapes import MSO_SHAPE
-from pptx.oxml.ns import qn
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+import copy
 import io
 import re
 
@@ -13,6 +15,8 @@ class SermonUtils:
     """
     Contains utility methods for the Sermon class.
     """
+    # Prefix of the relationship-id attributes (r:embed, r:link, r:id) in slide XML
+    RELATIONSHIP_NAMESPACE = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
 
     def format_date(self, date_text):
         """
@@ -86,7 +90,7 @@ class SermonUtils:
             self: The instance of the class.
             index (int): The current index in the list of paragraphs.
                          This may be updated if the title spans multiple paragraphs.
-            paragraphs (list): A list of paragraphs (docx.paragraph.Paragraph objects)
+            paragraphs (list): A list of paragraphs (ParagraphView objects)
                                representing the potential hymn section.
 
         Returns:
@@ -101,7 +105,7 @@ class SermonUtils:
         first_paragraph = paragraphs[0]  # Get the first paragraph of the potential hymn section
 
         # Check if the first paragraph contains a title (indicated by bold text)
-        if first_paragraph.runs and first_paragraph.runs[0].bold:
+        if first_paragraph.bold:
             title = first_paragraph.text  # Extract the text of the first paragraph as the potential title
 
             # Check if the title contains the hymn section start tag
@@ -114,7 +118,7 @@ class SermonUtils:
                 second_paragraph = paragraphs[1]  # Get the second paragraph
 
                 # Check if the second paragraph is also part of the title (indicated by bold text)
-                if second_paragraph.runs and second_paragraph.runs[0].bold:
+                if second_paragraph.bold:
                     title = title + "\n" + second_paragraph.text  # Append the text of the second paragraph to the title, separated by a newline
                     index += 1  # Increment the index because we've processed an extra paragraph
 
@@ -132,7 +136,7 @@ class SermonUtils:
             self: The instance of the class.
             index (int): The current index in the list of paragraphs.
                          This may be updated if the title spans multiple paragraphs or if empty paragraphs are skipped.
-            paragraphs (list): A list of paragraphs (docx.paragraph.Paragraph objects)
+            paragraphs (list): A list of paragraphs (ParagraphView objects)
                                representing the potential reading section.
 
         Returns:
@@ -147,7 +151,7 @@ class SermonUtils:
         start_check_empty_paragraphs = 1  # Initialize the variable that indicates which empty paragraph must be checked.
 
         # Check if the first paragraph contains a title (indicated by bold text)
-        if first_paragraph.runs and first_paragraph.runs[0].bold:
+        if first_paragraph.bold:
             title = first_paragraph.text  # Extract the text of the first paragraph as the potential title
 
             # Check if the title contains the reading section start tag
@@ -163,14 +167,14 @@ class SermonUtils:
                 second_paragraph = paragraphs[1]  # Get the second paragraph
 
                 # Check if the second paragraph is also part of the title (indicated by bold text)
-                if second_paragraph.runs and second_paragraph.runs[0].bold:
+                if second_paragraph.bold:
                     title = title + "\n" + second_paragraph.text.strip()  # Append the text of the second paragraph to the title, separated by a newline (also strip this paragraph)
                     index += 1  # Increment the index because we've processed an extra paragraph
                     start_check_empty_paragraphs = 2  # set the index to the right value
 
         # Skip empty paragraphs at the top of the reading section (if there is no title or two-line title)
         while (start_check_empty_paragraphs < len(paragraphs) and paragraphs[start_check_empty_paragraphs].text == ""
-               and not self.paragraph_content_contains_image(paragraphs[start_check_empty_paragraphs])):
+               and not paragraphs[start_check_empty_paragraphs].images):
             start_check_empty_paragraphs += 1  # Move to the next paragraph
             index += 1  # Increment the index because we've skipped a paragraph
 
@@ -251,6 +255,9 @@ class SermonUtils:
         copying title and content (text and pictures) to the corresponding placeholders.
         Uses the provided extra_layout_func to apply formatting.
 
+        Pictures are not re-inserted from their bytes: the picture XML is cloned and its
+        relationship is pointed at the image part that the original slide already uses.
+
         Args:
             slide: The slide to duplicate.
             layout_number (int): The index of the slide layout to apply (0-based).
@@ -271,82 +278,133 @@ class SermonUtils:
 
         # Create a new slide with the desired layout
         new_slide = prs.slides.add_slide(desired_layout)
-        # for shp1 in new_slide.placeholders:
-        #     print("new ph", shp1.name)
         content_placeholder_id = self.settings.get_setting("placeholder-content-name")
 
-        # Dictionary to map placeholder types
-        placeholder_map = {
-            "title": 0,  # Placeholder id for title in the default layout
-            "body": 1   # Placeholder id for content in the default layout
-        }
-
-        # Copy content from the original slide to the new slide
-        # print("search", content_placeholder_id)
+        # Copy the text content from the original slide to the new slide
         for shp in slide.placeholders:
             if shp.name.startswith("Title"):
                 # Found title placeholder in original slide
                 try:
                     # Copy title text to the new slide using extra_layout_func
-                    title_text = shp.text
-                    self.set_title(new_slide, title_text, extra_layout_func)
-
+                    self.set_title(new_slide, shp.text, extra_layout_func)
                 except Exception as e:
                     print(f"An error occurred copying the title: {e}")
-                    pass
 
-            if shp.name.startswith(content_placeholder_id):
-                # print(shp.name)
-                # print("tekst:")
-                # print(shp.text)
+            if shp.name.startswith(content_placeholder_id) and shp.has_text_frame:
                 # Found content placeholder in original slide
-
                 try:
-                    # Get the body text frame in the new slide
-                    # print("1")
                     self.format_placeholder_text(1, shp.text, new_slide)
-
-                    # Copy pictures from original slide to new slide
-                    for inner_shp in shp.shapes:
-                        try:
-                            if inner_shp.has_picture:
-                                picture = inner_shp.picture
-                                left, top, width, height = picture.left, picture.top, picture.width, picture.height
-                                new_slide.shapes.add_picture(picture.image.blob, left, top, width, height)
-                        except Exception as e:
-                            #print(f"An error occurred copying the picture: {e}")
-                            pass
-
                 except Exception as e:
                     print(f"An error occurred copying the content: {e}")
-                    pass
-            try:
-                if shp.has_table:
-                    tbl = shp.table
-                    print(f"table: {tbl}")
-            except Exception as e:
-                print(f"An error occurred: {e}")
-                pass
-            try:
-                if shp.has_chart:
-                    chart = shp.chart
-                    print(f"chart: {chart}")
-            except Exception as e:
-                print(f"An error occurred: {e}")
-                pass
-            try:
-                if shp.has_picture:
-                    picture = shp.picture
-                    print(f"picture: {picture}")
-                    # Add picture to new slide
-                    left, top, width, height = picture.left, picture.top, picture.width, picture.height
-                    new_slide.shapes.add_picture(picture.image.blob, left, top, width, height)
-            except Exception as e:
-                # print(f"An error occurred: {e}")
-                pass
+
+        # Copy the pictures, sharing the image parts of the original slide
+        rId_map = {}
+        for shp in slide.shapes:
+            if shp.element.tag != qn("p:pic"):
+                continue
+            picture_element = copy.deepcopy(shp.element)
+            ph = picture_element.find(qn("p:nvPicPr") + "/" + qn("p:nvPr") + "/" + qn("p:ph"))
+            if ph is not None:
+                # A filled picture placeholder inherits its position from the old layout,
+                # so it becomes a free picture with an explicit position on the new slide
+                ph.getparent().remove(ph)
+                picture_element.spPr.get_or_add_xfrm()
+                picture_element.x, picture_element.y = shp.left, shp.top
+                picture_element.cx, picture_element.cy = shp.width, shp.height
+            self._relink_element(picture_element, slide, new_slide, rId_map)
+            new_slide.shapes._spTree.append(picture_element)
 
         return new_slide
 
+    def duplicate_slides(self, slides, copies=1, insert_index=None):
+        """
+        Duplicates slides by cloning their XML, without copying any media bytes.
+
+        Every relationship of a source slide (images, media, hyperlinks) is re-pointed from
+        the new slide to the part the source slide already uses, so all copies share the
+        same image parts in the saved presentation. The slide layout stays the same.
+        This makes it cheap to repeat a whole section, e.g. a hymn that is sung both
+        before and after the sermon.
+
+        Args:
+            slides (list): The slides (pptx.slide.Slide) to duplicate, in the desired order.
+            copies (int, optional): How many times the sequence of slides is repeated. Defaults to 1.
+            insert_index (int, optional): The position in the presentation where the copies are
+                                          inserted. Defaults to None (append at the end).
+
+        Returns:
+            list: The new slides, in presentation order.
+        """
+        new_slides = []
+        if not slides:
+            return new_slides
+        prs = slides[0].part.package.presentation_part.presentation
+
+        for _ in range(copies):
+            for slide in slides:
+                new_slide = prs.slides.add_slide(slide.slide_layout)
+
+                # Replace the placeholders of the layout by a copy of the complete slide content
+                rId_map = {}
+                c_sld = copy.deepcopy(slide.element.cSld)
+                self._relink_element(c_sld, slide, new_slide, rId_map)
+                new_slide.element.replace(new_slide.element.cSld, c_sld)
+                new_slides.append(new_slide)
+
+        if insert_index is not None:
+            # add_slide always appends; move the new entries of the slide list into place
+            sld_id_lst = prs.slides._sldIdLst
+            new_ids = list(sld_id_lst)[-len(new_slides):]
+            for offset, sld_id in enumerate(new_ids):
+                sld_id_lst.remove(sld_id)
+                sld_id_lst.insert(insert_index + offset, sld_id)
+
+        return new_slides
+
+    def _relink_element(self, element, source_slide, target_slide, rId_map):
+        """
+        Re-points the relationship ids used in a cloned element to the target slide.
+
+        For every r:embed, r:link or r:id attribute in the element, the target slide gets a
+        relationship to the same part (or external target) as the source slide has, and the
+        attribute is rewritten to the new relationship id.
+
+        Args:
+            element: The cloned lxml element (modified in place).
+            source_slide (pptx.slide.Slide): The slide the element was cloned from.
+            target_slide (pptx.slide.Slide): The slide the element will be added to.
+            rId_map (dict): A mapping of source rIds to target rIds, shared between calls for the same slide pair.
+        """
+        source_rels = source_slide.part.rels
+
+        def relink(rId):
+            if rId not in source_rels:
+                return None
+            if rId not in rId_map:
+                rel = source_rels[rId]
+                if rel.is_external:
+                    rId_map[rId] = target_slide.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+                else:
+                    rId_map[rId] = target_slide.part.relate_to(rel.target_part, rel.reltype)
+            return rId_map[rId]
+        self.replace_relationship_ids(element, relink)
+
+    @classmethod
+    def replace_relationship_ids(cls, element, get_new_rId):
+        """
+        Rewrites the relationship ids (r:embed, r:link and r:id attributes) in an element and its descendants.
+
+        Args:
+            element: The lxml element (modified in place).
+            get_new_rId (callable): Returns the new id for an old id, or None to keep the old id.
+        """
+        for child in element.iter():
+            for attribute, rId in child.attrib.items():
+                if attribute.startswith(cls.RELATIONSHIP_NAMESPACE):
+                    new_rId = get_new_rId(rId)
+                    if new_rId is not None:
+                        child.set(attribute, new_rId)
+
     def _add_image_to_slide(self, image_data, slide, setting_id = "hymn"):
         """Adds an image to a slide with border and shadow.
 
@@ -373,8 +431,12 @@ class SermonUtils:
             # Add the image to the slide using the specified dimensions and position
             picture = slide.shapes.add_picture(image_stream, left=image_left, top=image_top, width=image_width, height=image_height)
 
-            # Add a rectangle shape behind the picture to create a border and shadow effect
-            self.add_border_and_shadow(slide, picture)
+            if self.settings.get_setting("lean-enabled", False):
+                # Give the picture itself the border and shadow
+                self.set_picture_border(picture)
+            else:
+                # Add a rectangle shape behind the picture to create a border and shadow effect
+                self.add_border_and_shadow(slide, picture)
             return picture
 
         except Exception as e:
@@ -424,6 +486,43 @@ class SermonUtils:
 
         # shadow.visible
 
+    def set_picture_border(self, picture):
+        """Gives a picture the border and shadow of add_border_and_shadow, without an extra shape.
+
+        The border color and width are set on the outline of the picture, and the shadow is taken
+        from the same effect style of the theme as the rectangle of add_border_and_shadow.
+
+        Args:
+            picture: The picture object to which the border and shadow will be added.
+        """
+        color = self.settings.get_setting("powerpoint-image-border_color")
+        picture.line.color.rgb = RGBColor(color["red"], color["green"], color["blue"])
+        picture.line.width = 12700  # 1 pt (1pt = 12700 emu)
+
+        style = parse_xml(
+            f'<p:style {nsdecls("a", "p")}>'
+            '<a:lnRef idx="1"><a:schemeClr val="accent1"/></a:lnRef>'
+            '<a:fillRef idx="0"><a:schemeClr val="accent1"/></a:fillRef>'
+            '<a:effectRef idx="2"><a:schemeClr val="accent1"/></a:effectRef>'
+            '<a:fontRef idx="minor"><a:schemeClr val="lt1"/></a:fontRef>'
+            '</p:style>'
+        )
+        picture.element.spPr.addnext(style)
+
+    def remove_empty_placeholders(self, slide):
+        """Removes the placeholders without text from a slide (empty titles, bodies and picture placeholders).
+
+        Empty placeholders are not shown in a slide show, so the slide looks the same.
+        Placeholders that were filled with a picture are kept.
+
+        Args:
+            slide (pptx.slide.Slide): The slide.
+        """
+        for placeholder in list(slide.placeholders):
+            element = placeholder.element
+            if element.tag == qn("p:sp") and not placeholder.text_frame.text.strip():
+                element.getparent().remove(element)
+
     def replace_image_in_placeholder(self, slide, image_data):
         """Replaces the content of an image placeholder on a slide with a new image.
 
@@ -469,6 +568,11 @@ class SermonUtils:
 
             # Loop through each paragraph in the title's text frame
             for line_number, paragraph in enumerate(title_placeholder.text_frame.paragraphs):
+                if self.styles_baked:
+                    # the title style is inherited from the layout, only apply the custom formatting
+                    if custom_formatter:
+                        custom_formatter(paragraph, line_number)
+                    continue
                 self.set_color_text_line(paragraph) #Set the color of the text.
                 # Set the font size of the paragraph
                 paragraph.font.size = Pt(self.settings.get_setting("powerpoint-title_font_size")) # Set the font size based on the settings
@@ -491,6 +595,10 @@ class SermonUtils:
         Args:
             paragraph: The paragraph object (pptx.text.text._Paragraph) to format.
         """
+        if self.styles_baked:
+            # the content style is inherited from the layout (see TemplateStyles)
+            return
+
         # Set the text color of the paragraph
         self.set_color_text_line(paragraph)
 
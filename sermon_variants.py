@@ -0,0 +1,146 @@
+# sermon_variants.py
+import copy
+import json
+import os
+from .sermon_extract import EXTRACTION_SETTINGS
+from .sermon_images import ImageOptimiser
+from .sermon_parallel import render_presentations
+
+
+class VariantRenderer:
+    """
+    Creates several variants of a presentation (e.g. a 16:9 deck for the beamer, a 4:3 deck for the side
+    screen and a large-print deck) from one reading of the Word document.
+
+    A variant is a name and the settings that differ from the current settings, e.g. another
+    "powerpoint_template_filename" and other fonts and sizes. The presentation of a variant is named after
+    the variant ("orde-van-dienst-beamer.pptx"). The images are optimised once for every box size, so
+    variants with the same image geometry share them; the variants are rendered in worker processes at the
+    same time, with the images in shared memory (see SharedAssets). A variant that overrides settings of the
+    extraction (EXTRACTION_SETTINGS, e.g. the line length of the readings for large print) gets its own
+    extraction of the document; variants with the same such overrides share it.
+    """
+
+    def __init__(self, sermon, variants=None):
+        """
+        Initializes the VariantRenderer.
+
+        Args:
+            sermon (Sermon): The sermon with the Word document (and the settings the variants start from).
+            variants (dict, optional): The settings of each variant, by name. Defaults to the "variants" setting.
+        """
+        self.sermon = sermon
+        self.variants = variants if variants is not None else sermon.settings.get_setting("variants", {})
+
+    def get_settings(self, overrides):
+        """
+        Returns the settings of a variant.
+
+        Args:
+            overrides (dict): The settings that differ from the settings of the sermon.
+
+        Returns:
+            Settings: A copy of the settings of the sermon, with the overrides.
+        """
+        settings = copy.deepcopy(self.sermon.settings)
+        settings.settings.update(overrides)
+        return settings
+
+    def get_template_filename(self, overrides):
+        """
+        Returns the PowerPoint template of a variant.
+
+        Args:
+            overrides (dict): The settings that differ from the settings of the sermon.
+
+        Returns:
+            str: The "powerpoint_template_filename" of the variant (next to this module if it is relative),
+                 or the template of the sermon.
+        """
+        if "powerpoint_template_filename" not in overrides:
+            return self.sermon.powerpoint_template_filename
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), overrides["powerpoint_template_filename"])
+
+    def get_extraction_overrides(self, overrides):
+        """
+        Returns the overrides of a variant that change the extraction of the Word document.
+
+        Args:
+            overrides (dict): The settings that differ from the settings of the sermon.
+
+        Returns:
+            dict: The overrides of the EXTRACTION_SETTINGS that differ from the settings of the sermon.
+        """
+        settings = self.sermon.settings
+        return {key: value for key, value in overrides.items()
+                if key.startswith(EXTRACTION_SETTINGS) and value != settings.get_setting(key)}
+
+    def extract_sections(self, settings, extraction_overrides, extractions):
+        """
+        Returns the sections of the Word document for a variant, extracted with its settings if it overrides
+        settings of the extraction.
+
+        Args:
+            settings (Settings): The settings of the variant.
+            extraction_overrides (dict): The overrides of the variant that change the extraction.
+            extractions (dict): The sections of each extraction so far, by its overrides (as JSON).
+
+        Returns:
+            list: The extracted sections (SectionResult objects), in document order.
+        """
+        key = json.dumps(extraction_overrides, sort_keys=True)
+        if key not in extractions:
+            from .sermon_core import Sermon
+            sermon = Sermon(settings)
+            sermon.word_filename = self.sermon.word_filename
+            extractions[key] = sermon.extract_document(self.sermon.get_document_view())
+        return extractions[key]
+
+    def get_filename(self, name):
+        """
+        Returns the filename of the presentation of a variant.
+
+        Args:
+            name (str): The name of the variant.
+
+        Returns:
+            str: The filename, e.g. "orde-van-dienst-beamer.pptx".
+        """
+        base, extension = os.path.splitext(self.sermon.powerpoint_filename)
+        return f"{base}-{name}{extension}"
+
+    def run(self, workers=None, streaming=False, deterministic=False):
+        """
+        Reads the Word document, and creates the presentations of the variants.
+
+        Args:
+            workers (int, optional): The number of processes that render variants at the same time.
+                                     Defaults to the "variants-workers" setting (0: one per variant).
+            streaming (bool, optional): See Sermon.process_sermon. Defaults to False.
+            deterministic (bool, optional): See Sermon.process_sermon. Defaults to False.
+
+        Returns:
+            list: The filenames of the presentations that were created.
+        """
+        sermon = self.sermon
+        if not self.variants:
+            print("Error: no variants are configured (variants).")
+            return []
+        sermon.load_word_document()
+        if sermon.word_document is None:
+            return []
+        extractions = {json.dumps({}): sermon.extract_document(sermon.get_document_view())}
+
+        # optimise the images for every variant, once per box size
+        results = {}
+        jobs = []
+        for name, overrides in self.variants.items():
+            settings = self.get_settings(overrides)
+            sections = self.extract_sections(settings, self.get_extraction_overrides(overrides), extractions)
+            optimiser = ImageOptimiser(settings, sermon.media_store, results)
+            jobs.append((settings, self.get_template_filename(overrides), sermon.word_filename,
+                         self.get_filename(name), [optimiser.optimise_section(section) for section in sections]))
+
+        if workers is None:
+            workers = sermon.settings.get_setting("variants-workers", 0)
+        return render_presentations(sermon.settings, jobs, workers, streaming, deterministic)
@@ -0,0 +1,347 @@
+# sermon_writer.py
+import hashlib
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pptx.opc.constants import CONTENT_TYPE as CT
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import serialize_part_xml
+from pptx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from pptx.opc.serialized import _ContentTypesItem
+from pptx.parts.image import ImagePart
+from pptx.oxml.slide import CT_Slide
+
+# Zip compression methods
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Content types that are already compressed: deflating them again only costs time
+DEFAULT_STORED_CONTENT_TYPES = ["image/jpeg", "image/png", "image/gif", "video/mp4", "audio/mpeg"]
+
+# The timestamp of all zip entries of deterministic output (the earliest date a zip file can hold)
+DETERMINISTIC_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class ZipStream:
+    """
+    Writes a zip file entry by entry, with data that is already compressed.
+
+    The local headers and data are written sequentially as the entries are added; the central
+    directory is kept in memory (a few dozen bytes per entry) and written by close().
+    """
+
+    def __init__(self, file, date_time=None):
+        """
+        Initializes the ZipStream.
+
+        Args:
+            file: A binary file object, opened for writing.
+            date_time (tuple, optional): (year, month, day, hour, minute, second) of all entries.
+                                         Defaults to None (the current local time).
+        """
+        self.file = file
+        self.dos_time, self.dos_date = self.get_dos_time(date_time or time.localtime())
+        self.central_directory = []
+        self.offset = 0
+
+    @staticmethod
+    def get_dos_time(date_time):
+        """
+        Returns a timestamp in the form of a zip entry.
+
+        Args:
+            date_time (tuple): (year, month, day, hour, minute, second, ...).
+
+        Returns:
+            tuple: (DOS time, DOS date).
+        """
+        year, month, day, hour, minute, second = date_time[:6]
+        return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+    def add(self, name, method, crc, data, size, date_time=None, flag_bits=0x800, create_system=0,
+            create_version=20, extract_version=20, external_attr=0):
+        """
+        Writes one entry. The optional arguments are the header fields of an entry copied from another
+        zip file (see zipfile.ZipInfo); by default the entry gets the timestamp of the stream and a UTF-8 name.
+
+        Args:
+            name (str): The name of the entry in the zip file.
+            method (int): ZIP_STORED or ZIP_DEFLATED.
+            crc (int): The CRC-32 of the uncompressed data.
+            data (bytes): The (compressed) data.
+            size (int): The size of the uncompressed data.
+            date_time (tuple, optional): The timestamp of the entry. Defaults to None (the timestamp of the stream).
+            flag_bits (int, optional): The general purpose flags. Defaults to 0x800 (UTF-8 name).
+            create_system (int, optional): The system that made the entry. Defaults to 0.
+            create_version (int, optional): The zip version that made the entry. Defaults to 20.
+            extract_version (int, optional): The zip version needed to extract the entry. Defaults to 20.
+            external_attr (int, optional): The external file attributes. Defaults to 0.
+
+        Returns:
+            int: The position of the data in the file.
+        """
+        encoded_name = name.encode("utf-8" if flag_bits & 0x800 else "cp437")
+        if size > 0xFFFFFFFF or self.offset > 0xFFFFFFFF:
+            raise ValueError(f"The zip entry '{name}' is too large (zip64 is not supported)")
+        dos_time, dos_date = self.get_dos_time(date_time) if date_time else (self.dos_time, self.dos_date)
+        header = struct.pack("<IHHHHHIIIHH", 0x04034B50, extract_version, flag_bits, method, dos_time, dos_date,
+                             crc, len(data), size, len(encoded_name), 0)
+        self.file.write(header)
+        self.file.write(encoded_name)
+        self.file.write(data)
+        self.central_directory.append(struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, (create_system << 8) | create_version, extract_version, flag_bits,
+            method, dos_time, dos_date, crc, len(data), size, len(encoded_name), 0, 0, 0, 0, external_attr,
+            self.offset) + encoded_name)
+        data_offset = self.offset + len(header) + len(encoded_name)
+        self.offset = data_offset + len(data)
+        return data_offset
+
+    def close(self):
+        """
+        Writes the central directory. The file itself is not closed.
+        """
+        if len(self.central_directory) > 0xFFFF:
+            raise ValueError("Too many zip entries (zip64 is not supported)")
+        directory = b"".join(self.central_directory)
+        self.file.write(directory)
+        self.file.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(self.central_directory),
+                                    len(self.central_directory), len(directory), self.offset, 0))
+
+
+class PackageWriter:
+    """
+    Saves a presentation as a .pptx file, with a compression policy per content type.
+
+    Parts with a content type in "writer-stored_content_types" (JPEG and PNG images, ...) are stored,
+    all other parts (the XML) are deflated. The compression runs on a thread pool (zlib releases the GIL);
+    the zip file is then written in one sequential pass.
+
+    Deterministic output has a fixed timestamp on all entries and the members sorted by name
+    ([Content_Types].xml first), so the same presentation always gives the same bytes. The SHA-256
+    of the content of every member is then kept in content_hashes (see SlideManifest).
+    """
+
+    def __init__(self, settings, date_time=None, deterministic=False):
+        """
+        Initializes the PackageWriter.
+
+        Args:
+            settings (Settings): The settings with the compression policy.
+            date_time (tuple, optional): The timestamp of all zip entries. Defaults to None (the current time).
+            deterministic (bool, optional): If True, write deterministic output. Defaults to False.
+        """
+        self.stored_content_types = set(settings.get_setting("writer-stored_content_types",
+                                                             DEFAULT_STORED_CONTENT_TYPES))
+        self.compression_level = settings.get_setting("writer-compression_level", 6)
+        self.threads = settings.get_setting("writer-threads", 4)
+        self.deterministic = deterministic
+        self.date_time = DETERMINISTIC_DATE_TIME if deterministic else date_time
+        # member name -> SHA-256 of the content, for deterministic output
+        self.content_hashes = {} if deterministic else None
+
+    def get_members(self, prs, exclude=()):
+        """
+        Returns the members of the package of a presentation, in the order python-pptx writes them.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+            exclude (set, optional): The names of parts that are left out (with their relationships),
+                                     e.g. because they are already written. Defaults to ().
+
+        Returns:
+            list: (member name, blob, content type) per member of the zip file.
+        """
+        package = prs.part.package
+        parts = tuple(package.iter_parts())
+        members = [
+            (CONTENT_TYPES_URI.membername, serialize_part_xml(_ContentTypesItem.xml_for(parts)), CT.XML),
+            (PACKAGE_URI.rels_uri.membername, package._rels.xml, CT.OPC_RELATIONSHIPS),
+        ]
+        for part in parts:
+            if part.partname.membername in exclude:
+                continue
+            members.append((part.partname.membername, part.blob, part.content_type))
+            if part._rels:
+                members.append((part.partname.rels_uri.membername, part.rels.xml, CT.OPC_RELATIONSHIPS))
+        return members
+
+    def compress(self, member):
+        """
+        Compresses one member according to the compression policy.
+
+        Args:
+            member (tuple): (member name, blob, content type).
+
+        Returns:
+            tuple: (member name, method, crc, data, size), the arguments of ZipStream.add.
+        """
+        name, blob, content_type = member
+        if self.content_hashes is not None:
+            self.content_hashes[name] = hashlib.sha256(blob).hexdigest()
+        crc = zlib.crc32(blob)
+        if content_type in self.stored_content_types:
+            return name, ZIP_STORED, crc, blob, len(blob)
+        compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return name, ZIP_DEFLATED, crc, compressor.compress(blob) + compressor.flush(), len(blob)
+
+    def write(self, file, members):
+        """
+        Compresses the members on the thread pool and writes them to a zip file.
+
+        Args:
+            file: A binary file object, opened for writing.
+            members (list): (member name, blob, content type) per member.
+        """
+        zip_stream = ZipStream(file, self.date_time)
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            for compressed in pool.map(self.compress, members):
+                zip_stream.add(*compressed)
+        zip_stream.close()
+
+    def save(self, prs, filename):
+        """
+        Saves a presentation.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+            filename (str): The path of the .pptx file.
+        """
+        members = self.get_members(prs)
+        if self.deterministic:
+            # the content types first, as in every .pptx file, then the other members by name
+            members.sort(key=lambda member: (member[0] != CONTENT_TYPES_URI.membername, member[0]))
+        with open(filename, "wb") as file:
+            self.write(file, members)
+
+
+class _FlushedImagePart(ImagePart):
+    """
+    An image part that is already written (stored) by a StreamingPackageWriter. Its bytes are not
+    kept in memory, but read back from the .pptx file when they are needed again, e.g. when the
+    same image is added to a later slide.
+    """
+
+    @property
+    def _blob(self):
+        return self._streaming_writer.read_back(self.partname.membername)
+
+
+class StreamingPackageWriter(PackageWriter):
+    """
+    Writes a presentation to its .pptx file while the slides are created.
+
+    flush_slides() writes the slides that were added since the previous call, with their relationships
+    and new images, to the zip file, and then empties them in memory: the slide XML is replaced by an
+    empty slide and the bytes of stored images are released (they are read back from the file if the
+    same image is used again).
+    close() writes the remaining parts (presentation.xml, the layouts and masters of the template, the
+    relationships and the content types) and the zip directory. Memory use therefore hardly depends
+    on the number of slides. Slides that are flushed must not be changed or removed afterwards.
+    """
+
+    def __init__(self, settings, filename, date_time=None, deterministic=False):
+        """
+        Initializes the StreamingPackageWriter.
+
+        Args:
+            settings (Settings): The settings with the compression policy.
+            filename (str): The path of the .pptx file.
+            date_time (tuple, optional): The timestamp of all zip entries. Defaults to None (the current time).
+            deterministic (bool, optional): If True, write deterministic output. The members are written
+                                            in the (fixed) order in which they are flushed. Defaults to False.
+        """
+        super().__init__(settings, date_time, deterministic)
+        self.filename = filename
+        self.file = None
+        self.zip_stream = None
+        self.written = set()
+        # member name -> (position, size) of the stored images in the file
+        self.stored_images = {}
+        self.flushed_slide_count = 0
+
+    def open(self, prs):
+        """
+        Opens the .pptx file. The slides that are already in the presentation (the slides of the template)
+        are not flushed, they are written by close().
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+
+        Returns:
+            StreamingPackageWriter: self.
+        """
+        self.file = open(self.filename, "w+b")
+        self.zip_stream = ZipStream(self.file, self.date_time)
+        self.flushed_slide_count = len(prs.slides)
+        return self
+
+    def flush_slides(self, prs):
+        """
+        Writes the new slides of the presentation, with their relationships and new images.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+        """
+        slides = list(prs.slides)[self.flushed_slide_count:]
+        members = []
+        image_parts = []
+        for slide in slides:
+            part = slide.part
+            members.append((part.partname.membername, part.blob, part.content_type))
+            members.append((part.partname.rels_uri.membername, part.rels.xml, CT.OPC_RELATIONSHIPS))
+            for rel in part.rels.values():
+                if rel.is_external or rel.reltype != RT.IMAGE:
+                    continue
+                image_part = rel.target_part
+                if image_part.partname.membername not in self.written:
+                    self.written.add(image_part.partname.membername)
+                    members.append((image_part.partname.membername, image_part.blob, image_part.content_type))
+                    image_parts.append(image_part)
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            for name, method, crc, data, size in pool.map(self.compress, members):
+                offset = self.zip_stream.add(name, method, crc, data, size)
+                if method == ZIP_STORED:
+                    self.stored_images[name] = (offset, size)
+
+        # release the written content
+        for slide in slides:
+            self.written.add(slide.part.partname.membername)
+            slide.part._element = CT_Slide.new()
+        for image_part in image_parts:
+            if image_part.partname.membername in self.stored_images:
+                image_part.sha1  # the SHA1 (used to share images) is computed and cached first
+                del image_part.__dict__["_blob"]
+                image_part.__class__ = _FlushedImagePart
+                image_part._streaming_writer = self
+        self.flushed_slide_count += len(slides)
+
+    def read_back(self, name):
+        """
+        Reads the bytes of a stored image back from the file.
+
+        Args:
+            name (str): The member name of the image.
+
+        Returns:
+            bytes: The image data.
+        """
+        offset, size = self.stored_images[name]
+        self.file.seek(offset)
+        data = self.file.read(size)
+        self.file.seek(0, 2)
+        return data
+
+    def close(self, prs):
+        """
+        Writes the parts that are not written yet and the zip directory, and closes the file.
+
+        Args:
+            prs (pptx.presentation.Presentation): The presentation.
+        """
+        for compressed in map(self.compress, self.get_members(prs, exclude=self.written)):
+            self.zip_stream.add(*compressed)
+        self.zip_stream.close()
+        self.file.close()